@@ -0,0 +1,55 @@
+# benchmarks/ast_memory.py
+#
+# Bytes per AST node for the object tree versus the ASTArena encoding.
+# Run from the repository root:  python -m benchmarks.ast_memory [repeat]
+
+import sys
+
+from compiler2.arena import ASTArena
+from compiler2.ast1 import ASTNode
+from compiler2.parser1 import Parser
+from compiler2.scanner import Scanner
+
+from .lexer_bench import make_source
+
+
+def tree_bytes(root):
+    # Node objects plus the lists they own; identifiers and literals are
+    # shared with the token stream and left out on both sides.
+    seen = set()
+    total = 0
+    count = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, list):
+            total += sys.getsizeof(obj)
+            stack.extend(obj)
+        elif isinstance(obj, ASTNode):
+            count += 1
+            total += sys.getsizeof(obj)
+            attrs = getattr(obj, '__dict__', None)
+            if attrs is not None:
+                total += sys.getsizeof(attrs)
+                stack.extend(attrs.values())
+            for cls in type(obj).__mro__:
+                for slot in cls.__dict__.get('__slots__', ()):
+                    stack.append(getattr(obj, slot))
+    return total, count
+
+
+def main(repeat=2000):
+    ast = Parser(Scanner(make_source(repeat))).parse()
+    tree_total, count = tree_bytes(ast)
+    arena, _ = ASTArena.from_tree(ast)
+
+    print(f"nodes: {count}")
+    print(f"object tree: {tree_total:,} bytes  {tree_total / count:.1f} bytes/node")
+    print(f"arena:       {arena.nbytes():,} bytes  {arena.nbytes() / len(arena):.1f} bytes/node")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
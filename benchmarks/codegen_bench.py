@@ -0,0 +1,97 @@
+# benchmarks/codegen_bench.py
+#
+# Size of the code CodeGen emits: instructions and memory operations
+# (anything with a memory operand, plus push/pop) per source statement,
+# before and after the peephole pass, and the same for the IR pipeline
+# (Lowering -> IROptimizer -> X86Emitter -> peephole).
+# Run from the repository root:  python -m benchmarks.codegen_bench
+
+from compiler2.ast1 import *
+from compiler2.dataflow import IROptimizer
+from compiler2.emitter import X86Emitter
+from compiler2.generator import CodeGen
+from compiler2.ir import Lowering
+from compiler2.parser1 import Parser
+from compiler2.peephole import PeepholeOptimizer
+from compiler2.scanner import Scanner
+
+PROGRAMS = {
+    'call': """
+def add(a, b):
+    return a + b
+
+x = add(5, 10)
+
+if x > 5:
+    print(x)
+""",
+    'arithmetic': """
+def poly(a, b, c):
+    s = a * a + b * b - c
+    t = s / 3 + a * (b - c)
+    while t > 0:
+        t = t - a
+        s = s + t * 2
+    return s + t
+
+y = poly(3, 4, 5)
+""",
+    'loops': """
+def count(n):
+    total = 0
+    i = 0
+    while i < n:
+        j = 0
+        while j < i:
+            total = total + i * j
+            j = j + 1
+        i = i + 1
+    return total
+
+print(count(100))
+""",
+    'counted': """
+def scale(n, k, w):
+    total = 0
+    for i in range(0, n):
+        for j in range(0, 10):
+            total = total + i * k + j * w + k * w
+    return total
+
+print(scale(100, 3, 7))
+""",
+}
+
+
+def count_statements(node):
+    if isinstance(node, Block):
+        return sum(count_statements(stmt) for stmt in node.body)
+    if isinstance(node, (FunctionDef, If, While, For)):
+        return 1 + count_statements(node.body)
+    return 1
+
+
+def asm_stats(asm_code):
+    instructions = [line.split() for line in asm_code if line.startswith("    ")]
+    memory = [ins for ins in instructions if ins[0] in ('push', 'pop') or any('[' in part for part in ins[1:])]
+    return len(instructions), len(memory)
+
+
+def main():
+    print(f"{'program':<12} {'stmts':>6} {'instrs':>7} {'mem ops':>8} {'mem/stmt':>9} {'peephole':>9} {'mem/stmt':>9}"
+          f" {'ir':>6} {'mem/stmt':>9}")
+    for name, source in PROGRAMS.items():
+        ast = Parser(Scanner(source)).parse()
+        codegen = CodeGen()
+        codegen.generate(ast)
+        statements = count_statements(ast)
+        instructions, memory = asm_stats(codegen.asm_code)
+        optimized, optimized_memory = asm_stats(PeepholeOptimizer().optimize(codegen.asm_code))
+        program = IROptimizer().optimize(Lowering().lower(ast))
+        ir, ir_memory = asm_stats(PeepholeOptimizer().optimize(X86Emitter().generate(program)))
+        print(f"{name:<12} {statements:>6} {instructions:>7} {memory:>8} {memory / statements:>9.2f}"
+              f" {optimized:>9} {optimized_memory / statements:>9.2f} {ir:>6} {ir_memory / statements:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
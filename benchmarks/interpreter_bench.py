@@ -0,0 +1,92 @@
+# benchmarks/interpreter_bench.py
+#
+# Tree-walking Interpreter versus the other execution engines on a
+# loop-heavy program. Every engine first has to agree with Interpreter on
+# SCOPING_PROGRAM, where functions read locals before assigning them.
+# Run from the repository root:  python -m benchmarks.interpreter_bench [n]
+
+import sys
+import time
+
+from compiler2.closures import ClosureInterpreter, SlotInterpreter
+from compiler2.interpreter import Interpreter
+from compiler2.parser1 import Parser
+from compiler2.scanner import Scanner
+from compiler2.stackinterp import StackInterpreter
+from compiler2.tiering import NativeTier
+from compiler2.vm import VM
+
+LOOP_PROGRAM = """
+def scale(a, b):
+    return a * b + a
+
+total = 0
+for i in range(0, {n}):
+    total = total + scale(i, 3) - i / 2
+    if total > 1000000:
+        total = total - 1000000
+"""
+
+# A local read before its function assigns it sees the global (or 0)
+SCOPING_PROGRAM = """
+n = 5
+t = 100
+
+def f(a):
+    b = n + a
+    n = 1
+    return b + n
+
+def g(k):
+    s = 0
+    for i in range(0, k):
+        s = s + t + u
+        t = i
+        u = 2
+    return s
+
+total = f(1) + g(3)
+"""
+
+
+ENGINES = [
+    ('Interpreter', lambda: Interpreter(None)),
+    ('StackInterpreter', lambda: StackInterpreter(None)),
+    ('ClosureInterpreter', lambda: ClosureInterpreter(None)),
+    ('SlotInterpreter', lambda: SlotInterpreter(None)),
+    ('VM', VM),
+    ('Interpreter+NativeTier', lambda: Interpreter(None, tier=NativeTier())),
+]
+
+
+def run(make_engine, ast):
+    interpreter = make_engine()
+    start = time.perf_counter()
+    interpreter.visit(ast)
+    return interpreter.symbol_table['total'], time.perf_counter() - start
+
+
+def check_scoping():
+    ast = Parser(Scanner(SCOPING_PROGRAM)).parse()
+    expected, _ = run(ENGINES[0][1], ast)
+    for name, make_engine in ENGINES[1:]:
+        result, _ = run(make_engine, ast)
+        if result != expected:
+            raise SystemExit(f"{name} disagrees on scoping: {expected} != {result}")
+
+
+def main(n=100000):
+    check_scoping()
+    ast = Parser(Scanner(LOOP_PROGRAM.format(n=n))).parse()
+    expected, baseline = run(ENGINES[0][1], ast)
+    print(f"iterations: {n}, total = {expected}")
+    print(f"{ENGINES[0][0]:<24} {baseline:.3f}s")
+    for name, make_engine in ENGINES[1:]:
+        result, elapsed = run(make_engine, ast)
+        if result != expected:
+            raise SystemExit(f"{name} disagrees: {expected} != {result}")
+        print(f"{name:<24} {elapsed:.3f}s  {baseline / elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,94 @@
+# benchmarks/lexer_bench.py
+#
+# Compares the character-by-character Lexer with the master-pattern Scanner
+# and the compact TokenArray. Scanner.tokenize() is required to lex at
+# least REQUIRED_SPEEDUP times as many tokens/s as Lexer; below that the
+# benchmark exits with an error. Both Scanner.tokenize() and TokenArray
+# make Token objects only when asked, so the time to make all of them
+# from Scanner's result is shown as well.
+# Run from the repository root:  python -m benchmarks.lexer_bench [repeat]
+
+import gc
+import sys
+import time
+
+from compiler2.lexer import Lexer, TOKEN_TYPES
+from compiler2.scanner import Scanner
+from compiler2.tokenarray import TokenArray
+
+SAMPLE = """
+def add(a, b):
+    return a + b
+
+x = add(5, 10)
+
+if x > 5:
+    print(x)
+
+for i in range(0, 5):
+    print(i)
+    if i == 2:
+        print(i + 100)
+"""
+
+REQUIRED_SPEEDUP = 10.0
+
+
+def make_source(repeat):
+    return SAMPLE * repeat
+
+
+def lex_all(lexer):
+    tokens = []
+    while True:
+        token = lexer.get_next_token()
+        tokens.append(token)
+        if token.type == TOKEN_TYPES['EOF']:
+            return tokens
+
+
+def as_tuples(tokens):
+    return [(t.type, t.value, t.line) for t in tokens]
+
+
+def timed(fn, rounds=3):
+    # Best of several rounds, each starting from a clean heap
+    best = None
+    for _ in range(rounds):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return result, best
+
+
+def main(repeat=2000):
+    source = make_source(repeat)
+
+    old_tokens, old_time = timed(lambda: lex_all(Lexer(source)))
+    new_tokens, new_time = timed(lambda: Scanner(source).tokenize())
+    compact, compact_time = timed(lambda: TokenArray.scan(source))
+    _, objects_time = timed(lambda: list(new_tokens))
+
+    if as_tuples(old_tokens) != as_tuples(new_tokens):
+        raise SystemExit("Token streams differ between Lexer and Scanner")
+    if as_tuples(compact) != as_tuples(new_tokens):
+        raise SystemExit("Token streams differ between Scanner and TokenArray")
+
+    count = len(new_tokens)
+    print(f"source: {len(source)} chars, {count} tokens")
+    print(f"Lexer:   {old_time:.3f}s  {count / old_time:,.0f} tokens/s")
+    print(f"Scanner: {new_time:.3f}s  {count / new_time:,.0f} tokens/s")
+    print(f"  + Token objects: {objects_time:.3f}s")
+    print(f"TokenArray: {compact_time:.3f}s  {count / compact_time:,.0f} tokens/s")
+    speedup = old_time / new_time
+    print(f"speedup: {speedup:.1f}x")
+    if speedup < REQUIRED_SPEEDUP:
+        raise SystemExit(f"Scanner is {speedup:.1f}x as fast as Lexer, below the required {REQUIRED_SPEEDUP:.0f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
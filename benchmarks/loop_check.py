@@ -0,0 +1,225 @@
+# benchmarks/loop_check.py
+#
+# Differential check for LoopOptimizer: every program must print the same
+# output and leave the same globals with and without the pass, and print
+# the same through the whole tree pipeline (Inliner -> Optimizer ->
+# LoopOptimizer). A program that raises must still raise after the pass,
+# though possibly earlier and with another error, so only part of its
+# output may be printed. Runs the fixed CASES, then [n] random programs of nested
+# range() loops, ifs, prints and calls; one that takes more than a second
+# in Interpreter is skipped.
+# Run from the repository root:  python -m benchmarks.loop_check [n]
+
+import contextlib
+import io
+import random
+import re
+import signal
+import sys
+
+from compiler2.inliner import Inliner
+from compiler2.interpreter import Interpreter
+from compiler2.loops import LoopOptimizer
+from compiler2.optimizer import Optimizer
+from compiler2.parser1 import Parser
+from compiler2.scanner import Scanner
+
+CASES = {
+    # Arithmetic on a function only happens if the loop runs
+    'zero-trip': """
+def f(a):
+    return a
+
+g = f
+n = 0
+for i in range(0, n):
+    y = g + 1
+print(7)
+""",
+    'untaken-if': """
+def f(a):
+    return a
+
+g = f
+for i in range(0, 3):
+    if i > 5:
+        y = g * 2 + i * g
+print(8)
+""",
+    'after-return': """
+def f(a):
+    return a
+
+def h(k, g):
+    for i in range(0, k):
+        return i
+        y = g + 1
+    return 0
+
+print(h(3, f))
+""",
+    'negative-step': """
+def f(a):
+    return a
+
+g = f
+for i in range(0, 5, 0 - 1):
+    y = g * 3
+print(9)
+""",
+    'reduced': """
+def h(n, a, b):
+    s = 0
+    for i in range(1, n * 2):
+        s = s + i * a + a * b
+        if s > 3:
+            s = s - i * 3
+    return s
+
+print(h(4, 2, 3))
+print(h(0, 2, 3))
+""",
+}
+
+
+class Slow(BaseException):
+    pass  # Not an Exception, so run() doesn't take it for the program's error
+
+
+def expression(r, names, loop_vars, depth=0):
+    c = r.random()
+    if depth > 2 or c < 0.3:
+        pool = names + loop_vars * 3
+        return str(r.randint(0, 9)) if r.random() < 0.3 or not pool else r.choice(pool)
+    if c < 0.45 and loop_vars:
+        return f"({r.choice(loop_vars)} * {r.choice(names + [str(r.randint(1, 5))])})"
+    if c < 0.5:
+        return f"f({expression(r, names, loop_vars, depth + 1)})"
+    op = '/' if r.random() < 0.05 else r.choice(['+', '-', '*', '>', '<', '==', '+', '*'])
+    if op == '*':
+        # Multiply by small numbers only, so values don't grow without bound
+        return f"({expression(r, names, loop_vars, depth + 1)} * {r.randint(0, 4)})"
+    return f"({expression(r, names, loop_vars, depth + 1)} {op} {expression(r, names, loop_vars, depth + 1)})"
+
+
+def block(r, names, loop_vars, indent, depth):
+    lines = []
+    pad = " " * indent
+    for _ in range(r.randint(1, 3)):
+        c = r.random()
+        if c < 0.25 and depth < 3:
+            var = r.choice(['i', 'j', 'k'])
+            args = r.choice([
+                expression(r, names, loop_vars),
+                f"{r.randint(0, 3)}, {expression(r, names, loop_vars)}",
+                f"{r.randint(0, 3)}, {r.randint(4, 9)}, {r.choice([1, 2, 3])}",
+                f"{r.randint(5, 9)}, {r.randint(0, 3)}, (0 - {r.choice([1, 2])})",
+            ])
+            lines.append(f"{pad}for {var} in range({args}):")
+            lines += block(r, names, loop_vars + [var], indent + 4, depth + 1)
+        elif c < 0.35 and depth < 3:
+            lines.append(f"{pad}if {expression(r, names, loop_vars)}:")
+            lines += block(r, names, loop_vars, indent + 4, depth + 1)
+        elif c < 0.45:
+            lines.append(f"{pad}print({expression(r, names, loop_vars)})")
+        elif c < 0.5 and loop_vars and r.random() < 0.3:
+            lines.append(f"{pad}{r.choice(loop_vars)} = {expression(r, names, loop_vars)}")
+        else:
+            lines.append(f"{pad}{r.choice(names)} = {expression(r, names, loop_vars)}")
+    return lines
+
+
+def random_program(seed):
+    r = random.Random(seed)
+    lines = ["def f(a):", "    return a + 1", "a = 2", "b = 3", "s = 0"]
+    if r.random() < 0.2:
+        lines.append(f"{r.choice(['a', 'b'])} = f")  # arithmetic on it raises
+    if r.random() < 0.5:
+        lines += ["def g(n, m):", "    t = 0"] + block(r, ['n', 'm', 't'], [], 4, 0) + ["    return t"]
+        lines += block(r, ['a', 'b', 's'], [], 0, 0)
+        lines.append(f"print(g({r.randint(0, 9)}, {r.randint(0, 9)}))")
+    else:
+        lines += block(r, ['a', 'b', 's'], [], 0, 0)
+    lines.append("print(s)")
+    return "\n".join(lines) + "\n"
+
+
+def run(ast):
+    # (printed output, error type, non-function globals)
+    interpreter = Interpreter(None)
+    output = io.StringIO()
+    error = None
+    with contextlib.redirect_stdout(output):
+        try:
+            interpreter.visit(ast)
+        except Exception as e:
+            error = type(e).__name__
+    values = {name: value for name, value in interpreter.globals.items() if not hasattr(value, 'params')}
+    # A printed function shows its address, which differs between trees
+    return re.sub(r" at 0x[0-9a-f]+", "", output.getvalue()), error, values
+
+
+def agrees(expected, result):
+    output, error, values = result
+    if (error is None) != (expected[1] is None):
+        return False
+    if error is not None:
+        # Hoisted code may raise first, before the iteration that would have
+        return expected[0].startswith(output)
+    # The pass adds names of its own; compare the program's
+    values = {key: value for key, value in values.items() if key in expected[2]}
+    return (output, values) == (expected[0], expected[2])
+
+
+def timed_run(ast, seconds):
+    def expire(signum, frame):
+        raise Slow()
+
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.alarm(seconds)
+    try:
+        return run(ast)
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def check(name, source, seconds=None):
+    # Returns the LoopOptimizer stats, or None if the program was too slow
+    ast = Parser(Scanner(source)).parse()
+    try:
+        expected = run(ast) if seconds is None else timed_run(ast, seconds)
+    except Slow:
+        return None
+    loops = LoopOptimizer()
+    result = run(loops.optimize(ast))
+    if not agrees(expected, result):
+        raise SystemExit(f"LoopOptimizer changes {name}:\n{source}\n{expected}\n{result}")
+    # Optimizer drops unused arithmetic as if it couldn't raise, so the
+    # pipeline only has to agree on programs that run without an error
+    pipeline = LoopOptimizer().optimize(Optimizer().optimize(Inliner().inline(ast)))
+    if expected[1] is None and run(pipeline)[:2] != expected[:2]:
+        raise SystemExit(f"Inliner -> Optimizer -> LoopOptimizer changes {name}:\n{source}")
+    return loops.stats
+
+
+def main(n=1000):
+    totals = {'programs': 0, 'skipped': 0}
+    for name, source in CASES.items():
+        check(name, source)
+    for seed in range(n):
+        stats = check(f"random program {seed}", random_program(seed), seconds=1)
+        if stats is None:
+            totals['skipped'] += 1
+            continue
+        totals['programs'] += 1
+        for key, value in stats.items():
+            totals[key] = totals.get(key, 0) + value
+    print(f"{len(CASES)} cases and {totals.pop('programs')} random programs agree "
+          f"({totals.pop('skipped')} too slow, skipped)")
+    for key, value in totals.items():
+        print(f"  {key}: {value}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,110 @@
+# benchmarks/memo_bench.py
+#
+# Interpreter with and without a MemoCache on a program that calls a pure
+# recursive function. Each program in CASES must first print the same with
+# the cache as without it; they read globals through locals that may not
+# be assigned yet, so a function that does must not be memoized.
+# Run from the repository root:  python -m benchmarks.memo_bench [n]
+
+import contextlib
+import io
+import sys
+import time
+
+from compiler2.interpreter import Interpreter
+from compiler2.memo import MemoCache, PurityAnalysis
+from compiler2.parser1 import Parser
+from compiler2.scanner import Scanner
+
+FIB_PROGRAM = """
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+total = fib({n})
+"""
+
+CASES = {
+    # y is only assigned when a > 0; otherwise f reads the global y
+    'branch': """
+def f(a):
+    if a > 0:
+        y = 1
+    return y + a
+
+y = 5
+print(f(0))
+y = 7
+print(f(0))
+""",
+    'loop': """
+def f(a):
+    for i in range(0, a):
+        y = i
+    return y
+
+y = 5
+print(f(0))
+y = 7
+print(f(0))
+""",
+    'before': """
+def f(a):
+    b = y + a
+    y = 1
+    return b + y
+
+y = 5
+print(f(1))
+y = 7
+print(f(1))
+""",
+    # Assigned on every path before the read: pure
+    'assigned': """
+def f(a):
+    y = 2
+    if a > 0:
+        y = 1
+    return y + a
+
+print(f(0))
+print(f(0))
+""",
+}
+
+
+def run(ast, memo=None):
+    interpreter = Interpreter(None, memo=memo)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        interpreter.visit(ast)
+    return output.getvalue(), interpreter.symbol_table.get('total'), time.perf_counter() - start
+
+
+def check_cases():
+    for name, source in CASES.items():
+        ast = Parser(Scanner(source)).parse()
+        expected = run(ast)[0]
+        result = run(ast, MemoCache(PurityAnalysis(ast).pure))[0]
+        if result != expected:
+            raise SystemExit(f"MemoCache changes the output of {name}: {expected!r} != {result!r}")
+
+
+def main(n=22):
+    check_cases()
+    ast = Parser(Scanner(FIB_PROGRAM.format(n=n))).parse()
+    _, expected, baseline = run(ast)
+    memo = MemoCache(PurityAnalysis(ast).pure)
+    _, result, elapsed = run(ast, memo)
+    if result != expected:
+        raise SystemExit(f"MemoCache disagrees: {expected} != {result}")
+    print(f"fib({n}) = {expected}")
+    print(f"Interpreter            {baseline:.3f}s")
+    print(f"Interpreter+MemoCache  {elapsed:.3f}s  {baseline / elapsed:.1f}x")
+    print(memo.stats())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 22)
@@ -0,0 +1,103 @@
+# benchmarks/programs.py
+#
+# Synthetic programs of a chosen shape and size for the benchmark suite.
+#
+#     source = generate('nesting', size=200, depth=40)
+#
+# Every shape scales linearly with `size` and stresses one part of the
+# compiler:
+#
+#   nesting      `size` assignments, each an expression nested `depth`
+#                parentheses deep (recursive descent in Parser, deep trees)
+#   functions    `size` FunctionDefs, each calling the one before it
+#                in chains of 50
+#                (many small bodies, call overhead in Interpreter)
+#   loops        one For loop of `size` iterations, plus a short body
+#                (statement dispatch in Interpreter; almost nothing to lex)
+#   indentation  `size` if/while towers nested `depth` levels deep
+#                (INDENT/DEDENT handling, nested Blocks)
+#
+# Programs only use +, -, * and comparisons, so they run under every
+# backend and never divide by zero. The same arguments always give the
+# same text.
+
+import random
+
+SHAPES = ('nesting', 'functions', 'loops', 'indentation')
+
+DEFAULT_DEPTH = {'nesting': 40, 'indentation': 20}
+
+
+def nested_expression(rng, depth):
+    # ((((a + 1) * 2) - b) + ...), built inside out
+    expression = "a"
+    for level in range(depth):
+        op = rng.choice("+-*")
+        operand = rng.choice(("a", "b", str(level % 7 + 1)))
+        if op == "*":
+            operand = "1"  # Keep values small
+        expression = f"({expression} {op} {operand})"
+    return expression
+
+
+def nesting(rng, size, depth):
+    lines = ["a = 1", "b = 2"]
+    for index in range(size):
+        lines.append(f"v{index} = {nested_expression(rng, depth)}")
+    return lines
+
+
+def functions(rng, size, depth):
+    lines = ["def f0(x):", "    return x + 1", ""]
+    for index in range(1, size):
+        lines.append(f"def f{index}(x):")
+        lines.append(f"    y = x * 2 + {rng.randint(0, 9)}")
+        lines.append("    while y > 1000:")
+        lines.append("        y = y - 997")
+        # Chains of 50 calls stay well inside Python's recursion limit
+        lines.append("    return y" if index % 50 == 0 else f"    return f{index - 1}(y)")
+        lines.append("")
+    for start in range(min(size, 50) - 1, size, 50):
+        lines.append(f"r{start} = f{start}({rng.randint(1, 9)})")
+    return lines
+
+
+def loops(rng, size, depth):
+    return [
+        "total = 0",
+        f"for i in range(0, {size}):",
+        f"    total = total + i * {rng.randint(2, 9)} - i",
+        "    if total > 1000000:",
+        "        total = total - 1000000",
+    ]
+
+
+def indentation(rng, size, depth):
+    lines = ["x = 1"]
+    for index in range(size):
+        for level in range(depth):
+            keyword = "if" if level % 2 == 0 else "while"
+            condition = "x > 0" if keyword == "if" else f"x < {level + 2}"
+            lines.append(f"{'    ' * level}{keyword} {condition}:")
+            if keyword == "while":
+                lines.append(f"{'    ' * (level + 1)}x = x + 1")
+        lines.append(f"{'    ' * depth}y{index} = x * {rng.randint(1, 9)}")
+        lines.append("x = 1")
+    return lines
+
+
+GENERATORS = {
+    'nesting': nesting,
+    'functions': functions,
+    'loops': loops,
+    'indentation': indentation,
+}
+
+
+def generate(shape, size, depth=None, seed=0):
+    if shape not in GENERATORS:
+        raise Exception(f"Unknown program shape: {shape} (expected one of {', '.join(SHAPES)})")
+    if depth is None:
+        depth = DEFAULT_DEPTH.get(shape, 0)
+    rng = random.Random(f"{shape}-{size}-{depth}-{seed}")
+    return "\n".join(GENERATORS[shape](rng, size, depth)) + "\n"
@@ -0,0 +1,210 @@
+# benchmarks/suite.py
+#
+# Times each compiler stage separately on generated programs (see
+# programs.py) and writes the results as JSON, so two revisions can be
+# compared.
+#
+# Run from the repository root:
+#
+#     python -m benchmarks.suite --json before.json
+#     ... change something ...
+#     python -m benchmarks.suite --json after.json --compare before.json
+#
+# Stages: Lexer and Scanner (tokens/s), Parser.parse over a pre-lexed token
+# list, Interpreter.visit and CodeGen.generate (nodes/s). Parse and codegen
+# count the nodes in the tree; interpret counts nodes visited. Every stage
+# runs `--repeat` times for mean, stdev and coefficient of variation, plus
+# once more under tracemalloc for peak memory, which isn't timed. With
+# --compare, stages are matched by shape and compared on best time per
+# token or node, so runs at different --scale still line up; one that got
+# slower by more than --threshold is a regression and the exit status is 1.
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from compiler2.ast1 import ASTNode
+from compiler2.generator import CodeGen
+from compiler2.interpreter import Interpreter
+from compiler2.lexer import Lexer
+from compiler2.parser1 import Parser
+from compiler2.scanner import Scanner
+from compiler2.trace import CounterSink, Tracer
+
+from .programs import DEFAULT_DEPTH, SHAPES, generate
+
+# Sizes that take a fraction of a second per stage at the default scale
+SIZES = {'nesting': 400, 'functions': 400, 'loops': 20000, 'indentation': 100}
+
+
+def count_nodes(root):
+    count = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if isinstance(obj, list):
+            stack.extend(obj)
+        elif isinstance(obj, ASTNode):
+            count += 1
+            stack.extend(getattr(obj, slot) for slot in type(obj).__slots__)
+    return count
+
+
+def count_visits(ast):
+    sink = CounterSink()
+    Interpreter(None, tracer=Tracer(sink)).visit(ast)
+    return sink.counts[('interpret', 'visit')]
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return times, peak
+
+
+def summarize(times, work, unit, peak):
+    mean = statistics.mean(times)
+    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+    best = min(times)
+    return {
+        'times': times,
+        'min': best,
+        'max': max(times),
+        'mean': mean,
+        'stdev': stdev,
+        'cv': stdev / mean if mean else 0.0,
+        'work': work,
+        'unit': unit,
+        'throughput': work / best if best else 0.0,
+        'peak_bytes': peak,
+    }
+
+
+def run_shape(shape, size, depth, repeat):
+    if depth is None:
+        depth = DEFAULT_DEPTH.get(shape, 0)
+    source = generate(shape, size, depth)
+    tokens = list(Scanner(source))  # Token objects, so Parser.parse times only parsing
+    ast = Parser(tokens).parse()
+    nodes = count_nodes(ast)
+    # Everything the timed calls need is built up front
+    stages = [
+        ('Lexer', lambda: list(Lexer(source)), len(tokens), 'tokens'),
+        ('Scanner', lambda: Scanner(source).tokenize(), len(tokens), 'tokens'),
+        ('Parser.parse', lambda: Parser(tokens).parse(), nodes, 'nodes'),
+        ('Interpreter.visit', lambda: Interpreter(None).visit(ast), count_visits(ast), 'nodes'),
+        ('CodeGen.generate', lambda: CodeGen().generate(ast), nodes, 'nodes'),
+    ]
+    results = {}
+    for name, fn, work, unit in stages:
+        times, peak = measure(fn, repeat)
+        results[name] = summarize(times, work, unit, peak)
+    return {
+        'shape': shape,
+        'size': size,
+        'depth': depth,
+        'source_bytes': len(source),
+        'tokens': len(tokens),
+        'nodes': nodes,
+        'stages': results,
+    }
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_suite(shapes=SHAPES, scale=1.0, depth=None, repeat=5):
+    return {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'repeat': repeat,
+        'scale': scale,
+        'results': [run_shape(shape, max(1, int(SIZES[shape] * scale)), depth, repeat) for shape in shapes],
+    }
+
+
+def compare(report, baseline, threshold):
+    # Returns (shape, stage, old best, new best, ratio) for every stage in
+    # both reports; the ratio is of seconds per unit of work
+    old = {(result['shape'], name): stage
+           for result in baseline['results'] for name, stage in result['stages'].items()}
+    rows = []
+    for result in report['results']:
+        for name, stage in result['stages'].items():
+            previous = old.get((result['shape'], name))
+            if previous is not None:
+                ratio = (stage['min'] / stage['work']) / (previous['min'] / previous['work'])
+                rows.append((result['shape'], name, previous['min'], stage['min'], ratio))
+    regressions = [row for row in rows if row[4] > 1 + threshold]
+    return rows, regressions
+
+
+def print_report(report):
+    print(f"revision {report['revision']}, Python {report['python']}, best of {report['repeat']}")
+    print(f"{'shape':<12} {'stage':<18} {'best':>9} {'cv':>6} {'throughput':>16} {'peak':>10}")
+    for result in report['results']:
+        for name, stage in result['stages'].items():
+            print(f"{result['shape']:<12} {name:<18} {stage['min'] * 1000:>7.2f}ms {stage['cv']:>6.1%}"
+                  f" {stage['throughput']:>10,.0f} {stage['unit']:<5} {stage['peak_bytes'] / 1024:>8,.0f}KB")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Time each compiler stage on generated programs.")
+    arg_parser.add_argument("--shape", action="append", choices=SHAPES, help="shapes to run (default: all)")
+    arg_parser.add_argument("--scale", type=float, default=1.0, help="multiply every program size")
+    arg_parser.add_argument("--depth", type=int, help="nesting/indentation depth (default: per shape)")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--json", help="write the results to this file ('-' for stdout)")
+    arg_parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    arg_parser.add_argument("--threshold", type=float, default=0.10, help="slowdown that counts as a regression")
+    args = arg_parser.parse_args(argv)
+
+    report = run_suite(args.shape or SHAPES, args.scale, args.depth, args.repeat)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report, baseline, args.threshold)
+        out = sys.stderr if args.json == "-" else sys.stdout
+        print(f"\ncompared with {baseline.get('revision')}:", file=out)
+        for shape, name, old, new, ratio in rows:
+            flag = "  REGRESSION" if ratio > 1 + args.threshold else ""
+            print(f"{shape:<12} {name:<18} {old * 1000:>8.2f}ms -> {new * 1000:>8.2f}ms  {ratio:>5.2f}x{flag}", file=out)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
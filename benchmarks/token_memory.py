@@ -0,0 +1,38 @@
+# benchmarks/token_memory.py
+#
+# Bytes per token for Scanner's Token list versus the TokenArray encoding.
+# Run from the repository root:  python -m benchmarks.token_memory [repeat]
+
+import sys
+
+from compiler2.scanner import Scanner
+from compiler2.tokenarray import TokenArray
+
+from .lexer_bench import make_source
+
+
+def token_list_bytes(tokens):
+    # The list, each Token and its attribute dict. Types, identifiers and
+    # small numbers are shared between tokens and left out; TokenArray
+    # doesn't hold them either.
+    total = sys.getsizeof(tokens)
+    for token in tokens:
+        total += sys.getsizeof(token) + sys.getsizeof(token.__dict__)
+    return total
+
+
+def main(repeat=2000):
+    source = make_source(repeat)
+    tokens = list(Scanner(source))
+    compact = TokenArray.scan(source)
+    count = len(tokens)
+    listed = token_list_bytes(tokens)
+
+    print(f"tokens: {count}")
+    print(f"Token list: {listed:,} bytes  {listed / count:.1f} bytes/token")
+    print(f"TokenArray: {compact.nbytes():,} bytes  {compact.nbytes() / count:.1f} bytes/token")
+    print(f"ratio:      {compact.nbytes() / listed:.1%}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,48 @@
+# benchmarks/vector_bench.py
+#
+# Interpreter with and without LoopVectorizer on reduction loops.
+# Run from the repository root:  python -m benchmarks.vector_bench [n]
+# Needs NumPy for the vectorized side.
+
+import sys
+import time
+
+from compiler2.interpreter import Interpreter
+from compiler2.parser1 import Parser
+from compiler2.scanner import Scanner
+from compiler2.vectorize import LoopVectorizer
+
+REDUCTION_PROGRAM = """
+total = 0
+squares = 0
+hits = 0
+for i in range(0, {n}):
+    t = i * i / 7
+    total = total + t - i
+    squares = squares + i * i
+    hits = hits + (t > 1000)
+"""
+
+
+def run(ast, **options):
+    interpreter = Interpreter(None, **options)
+    start = time.perf_counter()
+    interpreter.visit(ast)
+    return interpreter.symbol_table, time.perf_counter() - start
+
+
+def main(n=200000):
+    ast = Parser(Scanner(REDUCTION_PROGRAM.format(n=n))).parse()
+    expected, baseline = run(ast)
+    vectorizer = LoopVectorizer()
+    result, elapsed = run(ast, vectorizer=vectorizer)
+    if result != expected:
+        raise SystemExit(f"LoopVectorizer disagrees: {expected} != {result}")
+    print(f"iterations: {n}, total = {expected['total']}")
+    print(f"{'Interpreter':<28} {baseline:.3f}s")
+    print(f"{'Interpreter+LoopVectorizer':<28} {elapsed:.3f}s  {baseline / elapsed:.1f}x")
+    print(vectorizer.stats())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
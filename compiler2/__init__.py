@@ -2,20 +2,55 @@
 
 # Expose key classes at the package level
 from .lexer import Lexer
+from .scanner import Scanner
+from .tokenarray import TokenArray
 from .parser1 import Parser
+from .incremental import IncrementalParser
 from .ast1 import (
     Num, Var, BinOp, Assign, Compound, If, While, For, FunctionDef,
     FunctionCall, Return, Block
 )
+from .arena import ASTArena
 from .generator import CodeGen
+from .regalloc import ProgramLayout
+from .peephole import PeepholeOptimizer
+from .ir import Lowering, IRProgram, format_ir
+from .dataflow import IROptimizer
+from .emitter import X86Emitter
 from .interpreter import Interpreter
+from .stackinterp import StackInterpreter
+from .profiler import Profiler
+from .tiering import NativeTier
+from .vectorize import LoopVectorizer
+from .closures import ClosureInterpreter, SlotInterpreter
+from .resolver import Resolver
+from .memo import PurityAnalysis, MemoCache
+from .inliner import Inliner
+from .optimizer import Optimizer
+from .loops import LoopOptimizer
+from .cache import CompileCache
+from .batch import compile_batch
+from .bytecode import BytecodeCompiler, CodeObject, disassemble
+from .vm import VM
+from .trace import Tracer, CounterSink, JSONLinesSink, PrintSink, set_tracer, get_tracer
 
 # Optionally: define what gets imported if someone does "from compiler import *"
 __all__ = [
     'Lexer',
+    'Scanner',
+    'TokenArray',
     'Parser',
+    'IncrementalParser',
     'Num', 'Var', 'BinOp', 'Assign', 'Compound', 'If', 'While', 'For', 
     'FunctionDef', 'FunctionCall', 'Return', 'Block',
-    'CodeGenerator',
-    'Interpreter',
+    'ASTArena',
+    'CodeGen', 'ProgramLayout', 'PeepholeOptimizer',
+    'Lowering', 'IRProgram', 'format_ir', 'IROptimizer', 'X86Emitter',
+    'Interpreter', 'StackInterpreter', 'Profiler', 'NativeTier', 'LoopVectorizer',
+    'ClosureInterpreter', 'SlotInterpreter', 'Resolver',
+    'PurityAnalysis', 'MemoCache',
+    'Inliner', 'Optimizer', 'LoopOptimizer',
+    'CompileCache', 'compile_batch',
+    'BytecodeCompiler', 'CodeObject', 'disassemble', 'VM',
+    'Tracer', 'CounterSink', 'JSONLinesSink', 'PrintSink', 'set_tracer', 'get_tracer',
 ]
@@ -0,0 +1,280 @@
+# compiler/arena.py
+#
+# Struct-of-arrays storage for an AST. Every node is one row across a few
+# `array` buffers instead of a Python object per node:
+#
+#     kinds[i]            node kind (one byte, see KIND_OF)
+#     op0[i], op1[i], op2[i]
+#                         child node indices, or indices into the name /
+#                         constant pools, or offsets into `lists`, depending
+#                         on the kind (see ASTArena.add)
+#     lists               variable-length children (Block bodies, call
+#                         arguments, parameters) stored as [length, items...]
+#
+# ASTArena.view() hands out lightweight view objects that subclass the
+# regular node classes, so Interpreter, CodeGen and print_ast accept them
+# unchanged. Views are created on access and hold no child references.
+
+from array import array
+
+from .ast1 import *
+
+NUM, VAR, BINOP, ASSIGN, IF, WHILE, FOR, FUNCTION_DEF, FUNCTION_CALL, RETURN, BLOCK, STR, COMPOUND = range(13)
+
+KIND_OF = {
+    Num: NUM,
+    Var: VAR,
+    BinOp: BINOP,
+    Assign: ASSIGN,
+    If: IF,
+    While: WHILE,
+    For: FOR,
+    FunctionDef: FUNCTION_DEF,
+    FunctionCall: FUNCTION_CALL,
+    Return: RETURN,
+    Block: BLOCK,
+    Str: STR,
+    Compound: COMPOUND,
+}
+
+
+class ASTArena:
+    def __init__(self):
+        self.kinds = array('B')
+        self.op0 = array('i')
+        self.op1 = array('i')
+        self.op2 = array('i')
+        self.lists = array('i')
+        self.names = []  # Identifiers and operator names
+        self.name_index = {}
+        self.constants = []  # Num/Str values
+        self.constant_index = {}
+
+    @classmethod
+    def from_tree(cls, node):
+        arena = cls()
+        root = arena.add(node)
+        return arena, root
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def intern_name(self, name):
+        index = self.name_index.get(name)
+        if index is None:
+            index = self.name_index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def intern_constant(self, value):
+        key = (type(value), value)  # Keep 1 and True apart
+        index = self.constant_index.get(key)
+        if index is None:
+            index = self.constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def add_list(self, items):
+        offset = len(self.lists)
+        self.lists.append(len(items))
+        self.lists.extend(items)
+        return offset
+
+    def new_node(self, kind, a=0, b=0, c=0):
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.op0.append(a)
+        self.op1.append(b)
+        self.op2.append(c)
+        return index
+
+    def add(self, node):
+        # Children are added before their parent, so indices always point
+        # backwards and a tree is laid out in post-order.
+        kind = KIND_OF.get(type(node))
+        if kind is None:
+            raise Exception(f"Unknown node type: {type(node)}")
+        if kind == NUM or kind == STR:
+            return self.new_node(kind, self.intern_constant(node.value))
+        if kind == VAR:
+            return self.new_node(kind, self.intern_name(node.name))
+        if kind == BINOP:
+            left = self.add(node.left)
+            right = self.add(node.right)
+            return self.new_node(kind, left, self.intern_name(node.op), right)
+        if kind == ASSIGN:
+            return self.new_node(kind, self.intern_name(node.target), self.add(node.value))
+        if kind == IF or kind == WHILE:
+            return self.new_node(kind, self.add(node.condition), self.add(node.body))
+        if kind == FOR:
+            return self.new_node(kind, self.add(node.var), self.add(node.iterable), self.add(node.body))
+        if kind == FUNCTION_DEF:
+            params = self.add_list([self.intern_name(param) for param in node.params])
+            return self.new_node(kind, self.intern_name(node.name), params, self.add(node.body))
+        if kind == FUNCTION_CALL:
+            args = self.add_list([self.add(arg) for arg in node.args])
+            return self.new_node(kind, self.intern_name(node.name), args)
+        if kind == RETURN:
+            return self.new_node(kind, self.add(node.value))
+        if kind == BLOCK:
+            return self.new_node(kind, self.add_list([self.add(stmt) for stmt in node.body]))
+        return self.new_node(kind, self.add_list([self.add(stmt) for stmt in node.statements]))
+
+    def list_at(self, offset):
+        length = self.lists[offset]
+        return self.lists[offset + 1:offset + 1 + length]
+
+    def view(self, index):
+        return VIEW_CLASSES[self.kinds[index]](self, index)
+
+    def to_tree(self, index):
+        # Materialize a regular object tree, e.g. for passes that rewrite it
+        view = self.view(index)
+        kind = self.kinds[index]
+        if kind == NUM:
+            return Num(view.value)
+        if kind == STR:
+            return Str(view.value)
+        if kind == VAR:
+            return Var(view.name)
+        if kind == BINOP:
+            return BinOp(self.to_tree(self.op0[index]), view.op, self.to_tree(self.op2[index]))
+        if kind == ASSIGN:
+            return Assign(view.target, self.to_tree(self.op1[index]))
+        if kind == IF:
+            return If(self.to_tree(self.op0[index]), self.to_tree(self.op1[index]))
+        if kind == WHILE:
+            return While(self.to_tree(self.op0[index]), self.to_tree(self.op1[index]))
+        if kind == FOR:
+            return For(self.to_tree(self.op0[index]), self.to_tree(self.op1[index]), self.to_tree(self.op2[index]))
+        if kind == FUNCTION_DEF:
+            return FunctionDef(view.name, view.params, self.to_tree(self.op2[index]))
+        if kind == FUNCTION_CALL:
+            return FunctionCall(view.name, [self.to_tree(arg) for arg in self.list_at(self.op1[index])])
+        if kind == RETURN:
+            return Return(self.to_tree(self.op0[index]))
+        if kind == BLOCK:
+            return Block([self.to_tree(stmt) for stmt in self.list_at(self.op0[index])])
+        return Compound([self.to_tree(stmt) for stmt in self.list_at(self.op0[index])])
+
+    def nbytes(self):
+        # Bytes held by the node buffers (pools are shared with the source
+        # program's identifiers and literals and are reported separately)
+        buffers = (self.kinds, self.op0, self.op1, self.op2, self.lists)
+        return sum(len(buf) * buf.itemsize for buf in buffers)
+
+
+def _name(field):
+    return property(lambda self: self.arena.names[getattr(self.arena, field)[self.index]])
+
+
+def _constant(field):
+    return property(lambda self: self.arena.constants[getattr(self.arena, field)[self.index]])
+
+
+def _child(field):
+    return property(lambda self: self.arena.view(getattr(self.arena, field)[self.index]))
+
+
+def _children(field):
+    return property(lambda self: [self.arena.view(child) for child in self.arena.list_at(getattr(self.arena, field)[self.index])])
+
+
+def _names(field):
+    return property(lambda self: [self.arena.names[name] for name in self.arena.list_at(getattr(self.arena, field)[self.index])])
+
+
+class NodeView:
+    # Mixin; each view class declares its own ('arena', 'index') slots
+    # because the node class it derives from already has a slot layout.
+    __slots__ = ()
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, NodeView) and other.arena is self.arena and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+
+class NumView(NodeView, Num):
+    __slots__ = ('arena', 'index')
+    value = _constant('op0')
+
+class StrView(NodeView, Str):
+    __slots__ = ('arena', 'index')
+    value = _constant('op0')
+
+class VarView(NodeView, Var):
+    __slots__ = ('arena', 'index')
+    name = _name('op0')
+
+class BinOpView(NodeView, BinOp):
+    __slots__ = ('arena', 'index')
+    left = _child('op0')
+    op = _name('op1')
+    right = _child('op2')
+
+class AssignView(NodeView, Assign):
+    __slots__ = ('arena', 'index')
+    target = _name('op0')
+    value = _child('op1')
+
+class IfView(NodeView, If):
+    __slots__ = ('arena', 'index')
+    condition = _child('op0')
+    body = _child('op1')
+
+class WhileView(NodeView, While):
+    __slots__ = ('arena', 'index')
+    condition = _child('op0')
+    body = _child('op1')
+
+class ForView(NodeView, For):
+    __slots__ = ('arena', 'index')
+    var = _child('op0')
+    iterable = _child('op1')
+    body = _child('op2')
+
+class FunctionDefView(NodeView, FunctionDef):
+    __slots__ = ('arena', 'index')
+    name = _name('op0')
+    params = _names('op1')
+    body = _child('op2')
+
+class FunctionCallView(NodeView, FunctionCall):
+    __slots__ = ('arena', 'index')
+    name = _name('op0')
+    args = _children('op1')
+
+class ReturnView(NodeView, Return):
+    __slots__ = ('arena', 'index')
+    value = _child('op0')
+
+class BlockView(NodeView, Block):
+    __slots__ = ('arena', 'index')
+    body = _children('op0')
+
+class CompoundView(NodeView, Compound):
+    __slots__ = ('arena', 'index')
+    statements = _children('op0')
+
+
+VIEW_CLASSES = {
+    NUM: NumView,
+    STR: StrView,
+    VAR: VarView,
+    BINOP: BinOpView,
+    ASSIGN: AssignView,
+    IF: IfView,
+    WHILE: WhileView,
+    FOR: ForView,
+    FUNCTION_DEF: FunctionDefView,
+    FUNCTION_CALL: FunctionCallView,
+    RETURN: ReturnView,
+    BLOCK: BlockView,
+    COMPOUND: CompoundView,
+}
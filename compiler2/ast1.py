@@ -1,62 +1,86 @@
 class ASTNode:
-    pass
+    __slots__ = ()
 
 class Num(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
 class Var(ASTNode):
+    __slots__ = ('name',)
+
     def __init__(self, name):
         self.name = name
 
 class BinOp(ASTNode):
+    __slots__ = ('left', 'op', 'right')
+
     def __init__(self, left, op, right):
         self.left = left
         self.op = op
         self.right = right
 
 class FunctionDef(ASTNode):
+    __slots__ = ('name', 'params', 'body')
+
     def __init__(self, name, params, body):
         self.name = name
         self.params = params
         self.body = body
 
 class FunctionCall(ASTNode):
+    __slots__ = ('name', 'args')
+
     def __init__(self, name, args):
         self.name = name
         self.args = args
 
 class Return(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value  # The value being returned
 
 
-class Assign:
+class Assign(ASTNode):
+    __slots__ = ('target', 'value')
+
     def __init__(self, target, value):
         self.target = target
         self.value = value
 
-class Compound:
+class Compound(ASTNode):
+    __slots__ = ('statements',)
+
     def __init__(self, statements):
         self.statements = statements
 
-class If:
+class If(ASTNode):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
-class While:
+class While(ASTNode):
+    __slots__ = ('condition', 'body')
+
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
 
-class For:
+class For(ASTNode):
+    __slots__ = ('var', 'iterable', 'body')
+
     def __init__(self, var, iterable, body):
         self.var = var
         self.iterable = iterable
         self.body = body
 
-class Block:
+class Block(ASTNode):
+    __slots__ = ('body',)
+
     def __init__(self, statements):
         self.body = statements  # Store the list of statements in the block
 
@@ -68,5 +92,7 @@ class Block:
         print(f"Body: {self.body}")
 
 class Str(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
-        self.value = value
\ No newline at end of file
+        self.value = value
@@ -0,0 +1,133 @@
+# compiler/batch.py
+#
+# Compiles many source files to .asm across a process pool.
+#
+#     paths = find_sources(["examples/", "extra.py"])
+#     report = compile_batch(paths, output_dir="build", workers=8)
+#     print(format_summary(report))
+#
+# Each worker lexes (through MappedScanner), parses and generates one file
+# and writes the .asm itself, so only a small result tuple crosses the
+# process boundary.
+# Lexer and Parser errors are caught per file and reported at the end
+# instead of stopping the batch.
+#
+# With cache_dir, each worker keeps a CompileCache on that directory and
+# looks every file up by its text and the pipeline options before lexing,
+# so an unchanged file is written from the cached assembly. Entries are
+# unpickled, so only point cache_dir at a directory you trust.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .cache import CompileCache
+from .mapped import MappedScanner
+from .pipeline import compile_source, compile_tokens  # compile_source is re-exported
+
+_caches = {}  # cache directory -> this process's CompileCache on it
+
+
+def find_sources(paths, suffix=".py"):
+    """Expands directories into the `suffix` files under them, in sorted order."""
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                sources.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(suffix))
+        else:
+            sources.append(path)
+    return sources
+
+
+def output_path(path, output_dir=None, base=None):
+    # foo/bar.py -> foo/bar.asm, or <output_dir>/<path relative to base>.asm
+    stem = os.path.splitext(path)[0]
+    if output_dir is None:
+        return stem + ".asm"
+    relative = os.path.relpath(os.path.abspath(stem), base) if base else os.path.basename(stem)
+    return os.path.join(output_dir, relative + ".asm")
+
+
+def worker_cache(directory):
+    cache = _caches.get(directory)
+    if cache is None:
+        cache = _caches[directory] = CompileCache(directory)
+    return cache
+
+
+def compile_file(job):
+    """Worker: compiles one file. Returns (path, lines, error or None, CPU seconds, cache hit)."""
+    path, target, optimize, use_ir, cache_dir = job
+    start = time.process_time()
+    lines = 0
+    hit = False
+    try:
+        if cache_dir is not None:
+            with open(path, encoding="utf-8") as f:
+                source = f.read()
+            cache = worker_cache(cache_dir)
+            misses = cache.misses
+            asm_code = cache.compile(source, optimize, use_ir).asm_code
+            hit = cache.misses == misses  # Served from memory or disk
+            lines = source.count("\n") + 1
+        else:
+            # Lexed straight from the mapped file, never read into a str
+            with MappedScanner(path) as scanner:
+                try:
+                    asm_code = compile_tokens(scanner, optimize, use_ir)
+                finally:
+                    lines = scanner.line
+        directory = os.path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(target, "w") as f:
+            f.write("\n".join(asm_code))
+            f.write("\n")
+        error = None
+    except Exception as e:  # Lexer errors are plain Exceptions, Parser's are SyntaxErrors
+        error = f"{type(e).__name__}: {e}"
+    return path, lines, error, time.process_time() - start, hit
+
+
+def compile_batch(paths, output_dir=None, workers=None, optimize=True, use_ir=False, cache_dir=None):
+    base = None
+    if output_dir is not None and paths:
+        # Mirror the input tree below the deepest directory holding every file
+        base = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    jobs = [(path, output_path(path, output_dir, base), optimize, use_ir, cache_dir) for path in paths]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1:
+        results = [compile_file(job) for job in jobs]
+    else:
+        # Hand out files in chunks so thousands of small files don't pay
+        # one round trip each
+        chunksize = max(1, len(jobs) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(compile_file, jobs, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
+    return {
+        'files': len(results),
+        'compiled': sum(1 for _, _, error, _, _ in results if error is None),
+        'errors': [(path, error) for path, _, error, _, _ in results if error is not None],
+        'lines': sum(lines for _, lines, _, _, _ in results),
+        'cpu_seconds': sum(seconds for _, _, _, seconds, _ in results),
+        'cached': sum(1 for _, _, _, _, hit in results if hit),
+        'seconds': elapsed,
+        'workers': workers,
+    }
+
+
+def format_summary(report):
+    seconds = report['seconds'] or 1e-9
+    lines = [f"{path}: {error}" for path, error in report['errors']]
+    lines.append(
+        f"{report['compiled']}/{report['files']} files compiled ({report['cached']} from cache), "
+        f"{len(report['errors'])} failed, "
+        f"{report['workers']} workers, {report['seconds']:.2f}s "
+        f"({report['files'] / seconds:.1f} files/s, {report['lines'] / seconds:.0f} lines/s, "
+        f"{report['cpu_seconds'] / seconds:.1f}x parallel)"
+    )
+    return "\n".join(lines)
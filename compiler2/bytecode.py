@@ -0,0 +1,224 @@
+# compiler/bytecode.py
+#
+# Stack-machine bytecode for compiler2 programs. A CodeObject is a flat
+# `array` of (opcode, argument) pairs plus a constant pool and a name pool;
+# every FunctionDef gets its own CodeObject, stored in the enclosing
+# constant pool. Programs are executed by compiler2.vm.VM.
+#
+# Statements follow Interpreter.visit: an expression or `return` statement
+# whose value is not None leaves the current function (or ends the
+# program) with that value, which is what RETURN_IF_VALUE implements.
+
+from array import array
+
+from .ast1 import *
+
+(LOAD_CONST,         # push constants[arg]
+ LOAD_NAME,          # push local names[arg], else global, else 0
+ STORE_NAME,         # pop into local names[arg]
+ BINARY_ADD,
+ BINARY_SUB,
+ BINARY_MUL,
+ BINARY_FLOORDIV,
+ COMPARE_GT,
+ COMPARE_LT,
+ COMPARE_EQ,
+ BINARY_NONE,        # pop two operands, push None (operator with no meaning)
+ JUMP,               # jump to instruction arg
+ POP_JUMP_IF_FALSE,
+ GET_ITER,
+ FOR_ITER,           # push next(TOS), or pop the iterator and jump to arg
+ MAKE_FUNCTION,      # push a Function for the CodeObject in constants[arg]
+ LOAD_FUNCTION,      # push the user function called names[arg]
+ CALL_FUNCTION,      # call the function under arg arguments
+ CALL_PRINT,         # print arg values, push None
+ CALL_RANGE,         # build a lazy range from arg values
+ RETURN_IF_VALUE,    # return TOS unless it is None, else pop it
+ RETURN_NONE,
+ ) = range(22)
+
+OPCODE_NAMES = [
+    'LOAD_CONST', 'LOAD_NAME', 'STORE_NAME',
+    'BINARY_ADD', 'BINARY_SUB', 'BINARY_MUL', 'BINARY_FLOORDIV',
+    'COMPARE_GT', 'COMPARE_LT', 'COMPARE_EQ', 'BINARY_NONE',
+    'JUMP', 'POP_JUMP_IF_FALSE', 'GET_ITER', 'FOR_ITER',
+    'MAKE_FUNCTION', 'LOAD_FUNCTION', 'CALL_FUNCTION', 'CALL_PRINT', 'CALL_RANGE',
+    'RETURN_IF_VALUE', 'RETURN_NONE',
+]
+
+BINARY_OPCODES = {
+    'PLUS': BINARY_ADD,
+    'MINUS': BINARY_SUB,
+    'MUL': BINARY_MUL,
+    'DIV': BINARY_FLOORDIV,
+    'GT': COMPARE_GT,
+    'LT': COMPARE_LT,
+    'EQEQ': COMPARE_EQ,
+}
+
+HAS_NAME = {LOAD_NAME, STORE_NAME, LOAD_FUNCTION}
+HAS_CONST = {LOAD_CONST, MAKE_FUNCTION}
+HAS_JUMP = {JUMP, POP_JUMP_IF_FALSE, FOR_ITER}
+
+
+class CodeObject:
+    def __init__(self, name, params=()):
+        self.name = name
+        self.params = list(params)
+        self.code = array('i')  # opcode, argument, opcode, argument, ...
+        self.constants = []
+        self.names = []
+        self._constant_index = {}
+        self._name_index = {}
+
+    def __len__(self):
+        return len(self.code) // 2
+
+    def __repr__(self):
+        return f"<code {self.name}, {len(self)} instructions>"
+
+
+class Function:
+    def __init__(self, code):
+        self.code = code
+        self.name = code.name
+        self.params = code.params
+
+    def __repr__(self):
+        return f"<function {self.name}>"
+
+
+class BytecodeCompiler:
+    def compile(self, node, name='<module>', params=()):
+        self.code = CodeObject(name, params)
+        self.visit(node)
+        self.emit(RETURN_NONE)
+        return self.code
+
+    def emit(self, opcode, arg=0):
+        self.code.code.append(opcode)
+        self.code.code.append(arg)
+        return len(self.code) - 1
+
+    def patch(self, index, target):
+        self.code.code[2 * index + 1] = target
+
+    def here(self):
+        return len(self.code)
+
+    def constant(self, value):
+        key = (type(value), value) if not isinstance(value, CodeObject) else id(value)
+        index = self.code._constant_index.get(key)
+        if index is None:
+            index = self.code._constant_index[key] = len(self.code.constants)
+            self.code.constants.append(value)
+        return index
+
+    def name(self, name):
+        index = self.code._name_index.get(name)
+        if index is None:
+            index = self.code._name_index[name] = len(self.code.names)
+            self.code.names.append(name)
+        return index
+
+    def visit(self, node):
+        # Statement position: leaves nothing on the stack
+        if isinstance(node, Block):
+            for stmt in node.body:
+                self.visit(stmt)
+
+        elif isinstance(node, FunctionDef):
+            function_code = BytecodeCompiler().compile(node.body, node.name, node.params)
+            self.emit(MAKE_FUNCTION, self.constant(function_code))
+            self.emit(STORE_NAME, self.name(node.name))
+
+        elif isinstance(node, Assign):
+            self.expression(node.value)
+            self.emit(STORE_NAME, self.name(node.target))
+
+        elif isinstance(node, If):
+            self.expression(node.condition)
+            jump = self.emit(POP_JUMP_IF_FALSE)
+            self.visit(node.body)
+            self.patch(jump, self.here())
+
+        elif isinstance(node, While):
+            loop = self.here()
+            self.expression(node.condition)
+            jump = self.emit(POP_JUMP_IF_FALSE)
+            self.visit(node.body)
+            self.emit(JUMP, loop)
+            self.patch(jump, self.here())
+
+        elif isinstance(node, For):
+            self.expression(node.iterable)
+            self.emit(GET_ITER)
+            loop = self.emit(FOR_ITER)
+            self.emit(STORE_NAME, self.name(node.var.name))
+            self.visit(node.body)
+            self.emit(JUMP, loop)
+            self.patch(loop, self.here())
+
+        elif isinstance(node, Return):
+            self.expression(node.value)
+            self.emit(RETURN_IF_VALUE)
+
+        else:
+            # Expression statement
+            self.expression(node)
+            self.emit(RETURN_IF_VALUE)
+
+    def expression(self, node):
+        # Expression position: leaves exactly one value on the stack
+        if isinstance(node, Num):
+            self.emit(LOAD_CONST, self.constant(node.value))
+
+        elif isinstance(node, Var):
+            self.emit(LOAD_NAME, self.name(node.name))
+
+        elif isinstance(node, BinOp):
+            self.expression(node.left)
+            self.expression(node.right)
+            self.emit(BINARY_OPCODES.get(node.op, BINARY_NONE))
+
+        elif isinstance(node, FunctionCall):
+            if node.name == "print":
+                for arg in node.args:
+                    self.expression(arg)
+                self.emit(CALL_PRINT, len(node.args))
+            elif node.name == "range":
+                for arg in node.args:
+                    self.expression(arg)
+                self.emit(CALL_RANGE, len(node.args))
+            else:
+                # Look the function up before evaluating arguments, like Interpreter
+                self.emit(LOAD_FUNCTION, self.name(node.name))
+                for arg in node.args:
+                    self.expression(arg)
+                self.emit(CALL_FUNCTION, len(node.args))
+
+        else:
+            raise Exception(f"Unknown node type: {type(node)}")
+
+
+def disassemble(code, indent=0):
+    prefix = " " * indent
+    lines = [f"{prefix}Disassembly of {code.name}({', '.join(code.params)}):"]
+    for index in range(len(code)):
+        opcode = code.code[2 * index]
+        arg = code.code[2 * index + 1]
+        line = f"{prefix}{index:>6}  {OPCODE_NAMES[opcode]:<18}"
+        if opcode in HAS_NAME:
+            line += f"{arg:<5} ({code.names[arg]})"
+        elif opcode in HAS_CONST:
+            line += f"{arg:<5} ({code.constants[arg]!r})"
+        elif opcode in HAS_JUMP:
+            line += f"{arg:<5} (to {arg})"
+        elif opcode in (CALL_FUNCTION, CALL_PRINT, CALL_RANGE):
+            line += f"{arg}"
+        lines.append(line.rstrip())
+    for constant in code.constants:
+        if isinstance(constant, CodeObject):
+            lines.append("")
+            lines.append(disassemble(constant, indent))
+    return "\n".join(lines)
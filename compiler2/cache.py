@@ -0,0 +1,237 @@
+# compiler/cache.py
+#
+# Content-addressed cache of compiler output.
+#
+#     cache = CompileCache(".compile-cache", max_bytes=64 * 1024 * 1024)
+#     entry = cache.compile(source, optimize=True, use_ir=False)  # compiles only on a miss
+#     entry.tokens, entry.ast, entry.asm_code
+#     print(cache.stats())
+#     cache.invalidate()              # drop everything (or pass a source)
+#
+# The key is a SHA-256 of the compiler version, the pipeline options and
+# the source text, so an unchanged script hits no matter where it lives,
+# and editing any module of the compiler invalidates every entry it
+# produced. An entry holds the token stream, the AST as parsed and the
+# final assembly from pipeline.compile_ast, pickled together. Entries are
+# kept in memory and, if a directory is given, on disk as <key>.pickle;
+# both tiers are LRU and bounded by total size in bytes. On disk,
+# "recently used" is the file's mtime, which hits refresh.
+#
+# A disk hit is pickle.loads() of whatever file has the key's name, and
+# unpickling runs arbitrary code, so only give a directory that nobody
+# you don't trust can write to.
+
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+from .lexer import Token
+from .parser1 import Parser
+from .pipeline import compile_ast
+from .scanner import Scanner
+
+_compiler_version = None
+
+
+def compiler_version():
+    # Hash of the compiler's own source, so any change to it counts as a
+    # new version without anyone having to bump a number
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256()
+        package = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(package)):
+            if name.endswith(".py"):
+                digest.update(name.encode())
+                with open(os.path.join(package, name), "rb") as f:
+                    digest.update(f.read())
+        _compiler_version = digest.hexdigest()[:16]
+    return _compiler_version
+
+
+def cache_key(source, version=None, optimize=True, use_ir=False):
+    digest = hashlib.sha256()
+    digest.update((version or compiler_version()).encode())
+    digest.update(f"\0optimize={optimize:d} use_ir={use_ir:d}\0".encode())
+    digest.update(source.encode())
+    return digest.hexdigest()
+
+
+class CacheEntry:
+    __slots__ = ('key', 'tokens', 'ast', 'asm_code')
+
+    def __init__(self, key, tokens, ast, asm_code):
+        self.key = key
+        self.tokens = tokens
+        self.ast = ast
+        self.asm_code = asm_code
+
+    def dumps(self):
+        tokens = [(token.type, token.value, token.line) for token in self.tokens]
+        return pickle.dumps((tokens, self.ast, self.asm_code), protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def loads(cls, key, data):
+        tokens, ast, asm_code = pickle.loads(data)
+        return cls(key, [Token(*token) for token in tokens], ast, asm_code)
+
+
+class CompileCache:
+    def __init__(self, directory=None, max_bytes=16 * 1024 * 1024, max_disk_bytes=256 * 1024 * 1024,
+                 version=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.version = version or compiler_version()
+        self.entries = OrderedDict()  # key -> pickled entry, least recently used first
+        self.size = 0
+        self.hits = 0  # Served from memory
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, source, optimize=True, use_ir=False):
+        return cache_key(source, self.version, optimize, use_ir)
+
+    def compile(self, source, optimize=True, use_ir=False):
+        key = self.key(source, optimize, use_ir)
+        entry = self.lookup(key)
+        if entry is not None:
+            return entry
+        self.misses += 1
+        tokens = list(Scanner(source))
+        ast = Parser(tokens).parse()
+        entry = CacheEntry(key, tokens, ast, compile_ast(ast, optimize, use_ir))
+        self.store(entry)
+        return entry
+
+    def lookup(self, key):
+        # Every hit unpickles a fresh entry, so callers may change the AST
+        # (the Optimizer does) without touching the cached copy
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return CacheEntry.loads(key, data)
+        data = self.read(key)
+        if data is None:
+            return None
+        self.disk_hits += 1
+        self.remember(key, data)
+        return CacheEntry.loads(key, data)
+
+    def store(self, entry):
+        data = entry.dumps()
+        self.remember(entry.key, data)
+        self.write(entry.key, data)
+
+    def remember(self, key, data):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        if len(data) > self.max_bytes:
+            return
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    # On-disk tier
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def read(self, key):
+        if self.directory is None:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            return None
+        return data
+
+    def write(self, key, data):
+        if self.directory is None:
+            return
+        # Write under a temporary name and rename, so a concurrent reader
+        # never sees half a file
+        temporary = f"{self.path(key)}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, self.path(key))
+        self.trim_disk()
+
+    def disk_files(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle"):
+                continue
+            try:
+                status = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue  # Removed by another process
+            files.append((status.st_mtime, status.st_size, name))
+        return files
+
+    def trim_disk(self):
+        files = sorted(self.disk_files())
+        total = sum(size for _, size, _ in files)
+        for _, size, name in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+                self.disk_evictions += 1
+            except OSError:
+                pass
+            total -= size
+
+    def invalidate(self, source=None):
+        """Drops the entries for `source` (under any options), or every entry when no source is given."""
+        if source is None:
+            keys = list(self.entries)
+        else:
+            keys = [self.key(source, optimize, use_ir) for optimize in (True, False) for use_ir in (True, False)]
+        for key in keys:
+            data = self.entries.pop(key, None)
+            if data is not None:
+                self.size -= len(data)
+        if self.directory is None:
+            return
+        if source is None:
+            names = [name for _, _, name in self.disk_files()]
+        else:
+            names = [f"{key}.pickle" for key in keys]
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+        }
+        if self.directory is not None:
+            files = self.disk_files()
+            stats['disk_entries'] = len(files)
+            stats['disk_bytes'] = sum(size for _, size, _ in files)
+            stats['disk_evictions'] = self.disk_evictions
+        return stats
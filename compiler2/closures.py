@@ -0,0 +1,332 @@
+# compiler/closures.py
+#
+# Closure-compiling execution mode. Instead of re-dispatching through
+# Interpreter.visit on every evaluation, the tree is translated once into
+# nested Python closures, one per node, and those are called directly.
+# Every closure takes the current symbol table (`env`) and follows the
+# same conventions as Interpreter.visit: a statement that produces a value
+# other than None ends the enclosing Block and passes the value up.
+
+import operator
+
+from .ast1 import *
+from .interpreter import Interpreter
+from .memo import MISSING
+from .resolver import Resolver, LOCAL, GLOBAL, BUILTINS
+
+UNSET = object()  # Frame slot of a local the call hasn't assigned yet
+
+BINARY_OPS = {
+    'PLUS': operator.add,
+    'MINUS': operator.sub,
+    'MUL': operator.mul,
+    'DIV': operator.floordiv,
+    'GT': operator.gt,
+    'LT': operator.lt,
+    'EQEQ': operator.eq,
+}
+
+
+class ClosureInterpreter(Interpreter):
+    """Drop-in Interpreter that compiles the tree to closures before running it."""
+
+    def __init__(self, parser, tracer=None, memo=None):
+        super().__init__(parser, tracer, memo)
+        self.bodies = {}  # FunctionDef node -> compiled body
+        self.compilers = {
+            Block: self.compile_block,
+            FunctionDef: self.compile_function_def,
+            Assign: self.compile_assign,
+            If: self.compile_if,
+            For: self.compile_for,
+            While: self.compile_while,
+            FunctionCall: self.compile_function_call,
+            Return: self.compile_return,
+            Num: self.compile_num,
+            Var: self.compile_var,
+            BinOp: self.compile_binop,
+        }
+
+    def visit(self, node):
+        return self.compile(node)(self.symbol_table)
+
+    def compile(self, node):
+        for cls in type(node).__mro__:
+            compiler = self.compilers.get(cls)
+            if compiler is not None:
+                return compiler(node)
+        raise Exception(f"Unknown node type: {type(node)}")
+
+    def compile_block(self, node):
+        statements = [self.compile(stmt) for stmt in node.body]
+        if len(statements) == 1:
+            return statements[0]
+
+        def block(env):
+            for stmt in statements:
+                result = stmt(env)
+                if result is not None:  # Handle return values
+                    return result
+        return block
+
+    def compile_function_def(self, node):
+        name = node.name
+        self.bodies[node] = self.compile(node.body)
+
+        def function_def(env):
+            env[name] = node
+        return function_def
+
+    def compile_assign(self, node):
+        target = node.target
+        value = self.compile(node.value)
+
+        def assign(env):
+            env[target] = value(env)
+        return assign
+
+    def compile_if(self, node):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+
+        def if_(env):
+            if condition(env):
+                return body(env)
+        return if_
+
+    def compile_for(self, node):
+        name = node.var.name
+        iterable = self.compile(node.iterable)
+        body = self.compile(node.body)
+
+        def for_(env):
+            for value in iterable(env):
+                env[name] = value
+                result = body(env)
+                if result is not None:  # Handle return values inside loops
+                    return result
+        return for_
+
+    def compile_while(self, node):
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+
+        def while_(env):
+            while condition(env):
+                result = body(env)
+                if result is not None:  # Handle return values inside loops
+                    return result
+        return while_
+
+    def compile_function_call(self, node):
+        name = node.name
+        args = [self.compile(arg) for arg in node.args]
+
+        if name == "print":
+            def call_print(env):
+                print(*[arg(env) for arg in args])
+            return call_print
+
+        if name == "range":
+            if not 1 <= len(args) <= 3:
+                count = len(args)
+
+                def bad_range(env):
+                    raise Exception(f"range() expects 1 to 3 arguments, got {count}")
+                return bad_range
+            if len(args) == 2:
+                start, end = args
+
+                def call_range(env):
+                    return range(start(env), end(env))
+                return call_range
+
+            def call_range_n(env):
+                return range(*[arg(env) for arg in args])
+            return call_range_n
+
+        globals_ = self.globals
+        bodies = self.bodies
+        tracer = self.tracer
+        memo = self.memo
+
+        def call(env):
+            func = env.get(name) or globals_.get(name)
+            if not func:
+                raise Exception(f"Function {name} is not defined")
+            arg_values = [arg(env) for arg in args]
+            if tracer is not None:
+                tracer.emit('interpret', 'call', name=name, args=arg_values)
+            if memo is not None:
+                result = memo.get(func, arg_values)
+                if result is MISSING:
+                    result = bodies[func](dict(zip(func.params, arg_values)))
+                    memo.store(func, arg_values, result)
+                return result
+            return bodies[func](dict(zip(func.params, arg_values)))
+        return call
+
+    def compile_return(self, node):
+        value = self.compile(node.value)
+
+        def return_(env):
+            return value(env)
+        return return_
+
+    def compile_num(self, node):
+        value = node.value
+        return lambda env: value
+
+    def compile_var(self, node):
+        name = node.name
+        globals_ = self.globals
+
+        def var(env):
+            # Locals first, then globals
+            if name in env:
+                return env[name]
+            return globals_.get(name, 0)
+        return var
+
+    def compile_binop(self, node):
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        op = BINARY_OPS.get(node.op)
+        if op is None:
+            # Interpreter evaluates both sides and yields None
+            def unknown_op(env):
+                left(env)
+                right(env)
+            return unknown_op
+
+        if isinstance(node.right, Num):
+            constant = node.right.value
+
+            def binop_const(env):
+                return op(left(env), constant)
+            return binop_const
+
+        def binop(env):
+            return op(left(env), right(env))
+        return binop
+
+
+class SlotInterpreter(ClosureInterpreter):
+    """ClosureInterpreter over resolved slots instead of dict symbol tables.
+
+    Resolver binds every name before anything runs, so undefined names are
+    reported up front, globals live in a list indexed by slot, and each
+    user call gets a flat list frame sized for the function's locals. A
+    local read before the call assigns it falls back to the global slot
+    of the same name (or 0), as in Interpreter.
+    `symbol_table` is refreshed from the global slots after every visit().
+    """
+
+    def __init__(self, parser, tracer=None, memo=None):
+        super().__init__(parser, tracer, memo)
+        self.resolver = Resolver()
+        self.global_values = []  # Global slots; unassigned slots read as 0
+        self.functions = {}  # FunctionDef node -> (compiled body, parameter count, frame size)
+
+    def visit(self, node):
+        self.resolution = self.resolver.resolve(node)
+        self.global_values.extend([0] * (len(self.resolution.globals) - len(self.global_values)))
+        try:
+            return self.compile(node)(None)
+        finally:
+            self.symbol_table.update(zip(self.resolution.global_names(), self.global_values))
+
+    def loader(self, node):
+        scope, slot = self.resolution.slots[node]
+        global_values = self.global_values
+        if scope == LOCAL:
+            # Until the call assigns it, a local reads the global of the
+            # same name, or 0, as in Interpreter
+            fallback = self.resolution.globals.get(node.name)
+            if fallback is None:
+                def load_local(frame):
+                    value = frame[slot]
+                    return 0 if value is UNSET else value
+                return load_local
+
+            def load_local_or_global(frame):
+                value = frame[slot]
+                return global_values[fallback] if value is UNSET else value
+            return load_local_or_global
+        return lambda frame: global_values[slot]
+
+    def compile_var(self, node):
+        return self.loader(node)
+
+    def compile_assign(self, node):
+        scope, slot = self.resolution.slots[node]
+        value = self.compile(node.value)
+        if scope == LOCAL:
+            def assign_local(frame):
+                frame[slot] = value(frame)
+            return assign_local
+
+        global_values = self.global_values
+
+        def assign_global(frame):
+            global_values[slot] = value(frame)
+        return assign_global
+
+    def compile_for(self, node):
+        scope, slot = self.resolution.slots[node]
+        target = self.global_values if scope == GLOBAL else None
+        iterable = self.compile(node.iterable)
+        body = self.compile(node.body)
+
+        def for_(frame):
+            variables = target if target is not None else frame
+            for value in iterable(frame):
+                variables[slot] = value
+                result = body(frame)
+                if result is not None:  # Handle return values inside loops
+                    return result
+        return for_
+
+    def compile_function_def(self, node):
+        scope, slot = self.resolution.slots[node]
+        function_scope = self.resolution.scopes[node]
+        self.functions[node] = (self.compile(node.body), len(function_scope.params), function_scope.size)
+        target = self.global_values if scope == GLOBAL else None
+
+        def function_def(frame):
+            (target if target is not None else frame)[slot] = node
+        return function_def
+
+    def compile_function_call(self, node):
+        if node.name in BUILTINS:
+            return super().compile_function_call(node)
+
+        name = node.name
+        load = self.loader(node)
+        args = [self.compile(arg) for arg in node.args]
+        functions = self.functions
+        tracer = self.tracer
+        memo = self.memo
+
+        def call(frame):
+            func = load(frame)
+            if not func:
+                raise Exception(f"Function {name} is not defined")
+            arg_values = [arg(frame) for arg in args]
+            if tracer is not None:
+                tracer.emit('interpret', 'call', name=name, args=arg_values)
+            if memo is not None:
+                result = memo.get(func, arg_values)
+                if result is not MISSING:
+                    return result
+            body, param_count, size = functions[func]
+            # Parameters fill the front of the frame, other locals start unset
+            callee = arg_values[:param_count]
+            if len(callee) < size:
+                callee.extend([UNSET] * (size - len(callee)))
+            if memo is not None:
+                result = body(callee)
+                memo.store(func, arg_values, result)
+                return result
+            return body(callee)
+        return call
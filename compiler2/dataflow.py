@@ -0,0 +1,170 @@
+# compiler/dataflow.py
+#
+# Dataflow analysis and optimization over the IR (see ir.py).
+#
+#     program = Lowering().lower(ast)
+#     optimizer = IROptimizer()
+#     optimizer.optimize(program)  # rewrites the program in place
+#     print(optimizer.stats)
+#
+# liveness() is a backward analysis over the CFG. Copy propagation uses
+# a forward "available copies" analysis: a copy `x = y` reaches a use of x
+# on every path with neither x nor y written in between, so the use can
+# read y (or the constant) instead. Dead-store elimination then drops
+# pure instructions whose result is never read.
+#
+# A call may read any global, so globals are live across calls and at the
+# end of main. Functions never write globals, so calls kill no copies.
+
+from .ir import PURE_OPS
+
+
+def block_uses_and_defs(block, globals_):
+    # Names read before being written in the block, and names written
+    uses = set()
+    defs = set()
+    for instr in block.instructions:
+        for name in instr.uses():
+            if name not in defs:
+                uses.add(name)
+        if instr.op == 'call':
+            uses |= globals_ - defs
+        if instr.dest is not None:
+            defs.add(instr.dest)
+    for name in block.terminator.uses():
+        if name not in defs:
+            uses.add(name)
+    return uses, defs
+
+
+def liveness(function, globals_):
+    """Returns (live_in, live_out), each a dict of block -> set of names."""
+    globals_ = set(globals_)
+    exit_live = globals_ if function.name == 'main' else set()
+    summary = {block: block_uses_and_defs(block, globals_) for block in function.blocks}
+    live_in = {block: set() for block in function.blocks}
+    live_out = {block: set() for block in function.blocks}
+    changed = True
+    while changed:
+        changed = False
+        for block in reversed(function.blocks):
+            if block.succs:
+                out = set().union(*[live_in[succ] for succ in block.succs])
+            else:
+                out = set(exit_live)
+            uses, defs = summary[block]
+            new_in = uses | (out - defs)
+            if out != live_out[block] or new_in != live_in[block]:
+                live_out[block] = out
+                live_in[block] = new_in
+                changed = True
+    return live_in, live_out
+
+
+def available_copies(function):
+    """Returns a dict of block -> {name: operand} of copies valid on entry."""
+    copies_in = {function.entry: {}}
+    copies_out = {}
+    changed = True
+    while changed:
+        changed = False
+        for block in function.blocks:
+            if block is not function.entry:
+                incoming = [copies_out[pred] for pred in block.preds if pred in copies_out]
+                if not incoming:
+                    continue
+                # Keep only copies every predecessor agrees on
+                state = dict(incoming[0])
+                for other in incoming[1:]:
+                    state = {name: value for name, value in state.items() if name in other and other[name] == value}
+                copies_in[block] = state
+            out = transfer(copies_in[block], block.instructions)
+            if copies_out.get(block) != out:
+                copies_out[block] = out
+                changed = True
+    return copies_in
+
+
+def transfer(copies, instructions):
+    copies = dict(copies)
+    for instr in instructions:
+        kill(copies, instr.dest)
+        if instr.op == 'copy' and instr.dest != instr.args[0]:
+            copies[instr.dest] = instr.args[0]
+    return copies
+
+
+def kill(copies, name):
+    if name is None:
+        return
+    copies.pop(name, None)
+    for other in [other for other, value in copies.items() if value == name]:
+        del copies[other]
+
+
+class IROptimizer:
+    def __init__(self, propagate=True, eliminate=True):
+        self.propagate = propagate
+        self.eliminate = eliminate
+        self.stats = {
+            'copies_propagated': 0,
+            'dead_stores_removed': 0,
+        }
+
+    def optimize(self, program):
+        for function in program:
+            changed = True
+            while changed:
+                changed = False
+                if self.propagate:
+                    changed |= self.propagate_copies(function)
+                if self.eliminate:
+                    changed |= self.remove_dead_stores(function, program.globals)
+        return program
+
+    def propagate_copies(self, function):
+        replaced = 0
+        copies_in = available_copies(function)
+        for block in function.blocks:
+            copies = dict(copies_in.get(block, {}))
+            for instr in block.instructions:
+                args = tuple(copies.get(arg, arg) if isinstance(arg, str) else arg for arg in instr.args)
+                if args != instr.args:
+                    replaced += sum(1 for old, new in zip(instr.args, args) if old != new)
+                    instr.args = args
+                kill(copies, instr.dest)
+                if instr.op == 'copy' and instr.dest != instr.args[0]:
+                    copies[instr.dest] = instr.args[0]
+            terminator = block.terminator
+            args = tuple(copies.get(arg, arg) if isinstance(arg, str) else arg for arg in terminator.args)
+            if args != terminator.args:
+                replaced += sum(1 for old, new in zip(terminator.args, args) if old != new)
+                terminator.args = args
+        self.stats['copies_propagated'] += replaced
+        return replaced > 0
+
+    def remove_dead_stores(self, function, globals_):
+        removed = 0
+        globals_ = set(globals_)
+        _, live_out = liveness(function, globals_)
+        for block in function.blocks:
+            live = set(live_out[block]) | set(block.terminator.uses())
+            kept = []
+            for instr in reversed(block.instructions):
+                if instr.dest is not None and instr.dest not in live:
+                    if instr.op in PURE_OPS:
+                        removed += 1
+                        continue
+                    if instr.op == 'call':
+                        instr.dest = None  # Keep the call, drop the store
+                        removed += 1
+                if instr.dest is not None:
+                    live.discard(instr.dest)
+                live.update(instr.uses())
+                if instr.op == 'call':
+                    live |= globals_
+                kept.append(instr)
+            kept.reverse()
+            block.instructions = kept
+        self.stats['dead_stores_removed'] += removed
+        return removed > 0
@@ -0,0 +1,297 @@
+# compiler/emitter.py
+#
+# IR -> x86 (NASM, cdecl), the IR counterpart of CodeGen.
+#
+#     program = Lowering().lower(ast)
+#     IROptimizer().optimize(program)
+#     emitter = X86Emitter()
+#     emitter.generate(program)
+#     print("\n".join(emitter.asm_code))
+#
+# Every local and temporary gets a live interval from per-block liveness,
+# and a linear scan assigns registers to them. eax is the only scratch
+# register. ecx and edx may hold values that aren't live across a call or
+# a division, since those clobber them. ebx, esi and edi are callee-saved
+# and can hold anything. Values that don't fit go to stack slots, and
+# globals live in .bss as in CodeGen.
+
+from .dataflow import liveness
+from .ir import Jump, Branch, Ret, is_temp
+from .regalloc import Interval, MIN_WEIGHT, CALLEE_SAVED, global_label
+from .trace import get_tracer
+
+ARITHMETIC = {'PLUS': 'add', 'MINUS': 'sub', 'MUL': 'imul'}
+SETCC = {'GT': 'setg', 'LT': 'setl', 'EQEQ': 'sete'}
+JCC = {'GT': 'jg', 'LT': 'jl', 'EQEQ': 'je', 'LE': 'jle', 'GE': 'jge', 'NE': 'jne'}
+NEGATED = {'GT': 'LE', 'LT': 'GE', 'EQEQ': 'NE', 'LE': 'GT', 'GE': 'LT', 'NE': 'EQEQ'}
+LOW_BYTE = {'eax': 'al', 'ebx': 'bl', 'ecx': 'cl', 'edx': 'dl'}
+REGISTERS = ('ecx', 'edx') + CALLEE_SAVED  # Allocation order; eax stays free for scratch
+
+
+def is_memory(operand):
+    return operand.startswith("dword [")
+
+
+def is_immediate(operand):
+    return operand.lstrip('-').isdigit()
+
+
+def density(interval):
+    return interval.weight / (interval.end - interval.start + 1)
+
+
+class FunctionAllocation:
+    """Linear-scan register assignment for one IRFunction."""
+
+    def __init__(self, function, globals_):
+        self.function = function
+        self.intervals = {}
+        self.clobbers = []  # Positions of calls and divisions
+        self.number(function, globals_)
+        self.allocate()
+
+        self.saved = [reg for reg in CALLEE_SAVED if any(iv.register == reg for iv in self.intervals.values())]
+        self.slots = {}
+        for name, interval in self.intervals.items():
+            if interval.register is None and name not in function.params:
+                self.slots[name] = 4 * (len(self.saved) + len(self.slots) + 1)
+        self.frame_size = 4 * len(self.slots)
+
+    def allocatable(self, name):
+        return is_temp(name) or name in self.function.locals
+
+    def touch(self, name, position, weight):
+        if not self.allocatable(name):
+            return
+        interval = self.intervals.get(name)
+        if interval is None:
+            interval = self.intervals[name] = Interval(name, position)
+        interval.start = min(interval.start, position)
+        interval.end = max(interval.end, position)
+        interval.weight += weight
+
+    def number(self, function, globals_):
+        live_in, live_out = liveness(function, globals_)
+        position = 0
+        for param in function.params:
+            self.touch(param, 0, 1)
+        for block in function.blocks:
+            weight = 10 ** block.depth
+            position += 1
+            for name in live_in[block]:
+                self.touch(name, position, 0)
+            for instr in block.instructions:
+                position += 1
+                for name in instr.uses():
+                    self.touch(name, position, weight)
+                if instr.dest is not None:
+                    self.touch(instr.dest, position, weight)
+                if instr.op in ('call', 'DIV'):
+                    self.clobbers.append(position)
+            position += 1
+            for name in block.terminator.uses():
+                self.touch(name, position, weight)
+            for name in live_out[block]:
+                self.touch(name, position, 0)
+
+    def allowed(self, interval):
+        # A value live across a call or division can't sit in ecx/edx
+        for position in self.clobbers:
+            if interval.start < position <= interval.end:
+                return CALLEE_SAVED
+        return REGISTERS
+
+    def allocate(self):
+        active = []
+        free = list(REGISTERS)
+        for interval in sorted(self.intervals.values(), key=lambda iv: (iv.start, -iv.weight, iv.name)):
+            for old in [iv for iv in active if iv.end < interval.start]:
+                active.remove(old)
+                free.append(old.register)
+            if interval.name in self.function.params and interval.weight < MIN_WEIGHT:
+                continue  # Cheaper to read it from the caller's frame
+            allowed = self.allowed(interval)
+            register = next((reg for reg in REGISTERS if reg in free and reg in allowed), None)
+            if register is not None:
+                free.remove(register)
+                interval.register = register
+                active.append(interval)
+                continue
+            candidates = [iv for iv in active if iv.register in allowed]
+            if not candidates:
+                continue
+            # Spill whatever is used least per instruction it keeps a register busy
+            coldest = min(candidates, key=density)
+            if density(coldest) < density(interval):
+                interval.register = coldest.register
+                coldest.register = None
+                active.remove(coldest)
+                active.append(interval)
+
+    def location(self, name):
+        interval = self.intervals.get(name)
+        if interval is None:
+            return f"dword [{global_label(name)}]"
+        if interval.register is not None:
+            return interval.register
+        if name in self.function.params:
+            return f"dword [ebp + {8 + 4 * self.function.params.index(name)}]"
+        return f"dword [ebp - {self.slots[name]}]"
+
+
+class X86Emitter:
+    def __init__(self, tracer=None):
+        self.asm_code = []
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.label_count = 0
+
+    def emit(self, instruction):
+        self.code.append(f"    {instruction}")
+
+    def generate(self, program):
+        for function in program:
+            self.generate_function(function, program.globals)
+        if program.globals:
+            self.asm_code.append("section .bss")
+            for name in program.globals:
+                self.asm_code.append(f"{global_label(name)}: resd 1")
+        return self.asm_code
+
+    def generate_function(self, function, globals_):
+        allocation = self.allocation = FunctionAllocation(function, globals_)
+        if self.tracer is not None:
+            registers = {name: iv.register for name, iv in allocation.intervals.items() if iv.register}
+            self.tracer.emit('codegen', 'function', name=function.name, registers=registers,
+                             frame_size=allocation.frame_size)
+        self.code = []
+        self.code.append(f"{function.name}:")
+        self.emit("push ebp")
+        self.emit("mov ebp, esp")
+        for reg in allocation.saved:
+            self.emit(f"push {reg}")
+        if allocation.frame_size:
+            self.emit(f"sub esp, {allocation.frame_size}")
+        for index, param in enumerate(function.params):
+            location = allocation.location(param)
+            if not is_memory(location):
+                self.emit(f"mov {location}, dword [ebp + {8 + 4 * index}]")
+
+        self.label_count += 1
+        exit_label = f".exit{self.label_count}"
+        blocks = function.blocks
+        for index, block in enumerate(blocks):
+            following = blocks[index + 1] if index + 1 < len(blocks) else None
+            self.code.append(f"{block.label}:")
+            for instr in block.instructions:
+                self.instruction(instr)
+            self.terminator(block.terminator, following, exit_label)
+
+        self.code.append(f"{exit_label}:")
+        if allocation.saved:
+            self.emit(f"lea esp, [ebp - {4 * len(allocation.saved)}]")
+            for reg in reversed(allocation.saved):
+                self.emit(f"pop {reg}")
+        elif allocation.frame_size:
+            self.emit("mov esp, ebp")
+        self.emit("pop ebp")
+        self.emit("ret")
+
+        # Only keep labels something jumps to, so the peephole pass sees
+        # longer straight-line runs
+        targets = {line.split()[-1] for line in self.code if line.startswith("    j")}
+        self.asm_code.extend(line for line in self.code
+                             if not (line.startswith(".") and line[:-1] not in targets))
+
+    def operand(self, value):
+        if isinstance(value, int):
+            return str(value)
+        return self.allocation.location(value)
+
+    def instruction(self, instr):
+        op = instr.op
+        if op == 'call':
+            for arg in reversed(instr.args):
+                self.emit(f"push {self.operand(arg)}")
+            self.emit(f"call {instr.target}")
+            if instr.args:
+                self.emit(f"add esp, {4 * len(instr.args)}")
+            if instr.dest is not None:
+                self.emit(f"mov {self.operand(instr.dest)}, eax")
+            return
+
+        dest = self.operand(instr.dest)
+        if op == 'copy':
+            source = self.operand(instr.args[0])
+            if source == dest:
+                return
+            if is_memory(source) and is_memory(dest):
+                self.emit(f"mov eax, {source}")
+                source = 'eax'
+            self.emit(f"mov {dest}, {source}")
+            return
+
+        left, right = [self.operand(arg) for arg in instr.args]
+
+        if op in ARITHMETIC:
+            if dest == right and op != 'MINUS' and dest != left:
+                left, right = right, left  # Commutative: work in place
+            work = dest if not is_memory(dest) and dest != right else 'eax'
+            if op == 'MUL' and is_immediate(right) and not is_immediate(left):
+                self.emit(f"imul {work}, {left}, {right}")
+            else:
+                if left != work:
+                    self.emit(f"mov {work}, {left}")
+                self.emit(f"{ARITHMETIC[op]} {work}, {right}")
+            if work != dest:
+                self.emit(f"mov {dest}, {work}")
+
+        elif op == 'DIV':
+            # ecx and edx hold nothing live here (see FunctionAllocation.allowed)
+            self.emit(f"mov eax, {left}")
+            self.emit("cdq")
+            if is_immediate(right):
+                self.emit(f"mov ecx, {right}")
+                right = 'ecx'
+            self.emit(f"idiv {right}")
+            if dest != 'eax':
+                self.emit(f"mov {dest}, eax")
+
+        elif op in SETCC:
+            work = dest if dest in LOW_BYTE and dest != right else 'eax'
+            if left != work:
+                self.emit(f"mov {work}, {left}")
+            self.emit(f"cmp {work}, {right}")
+            self.emit(f"{SETCC[op]} {LOW_BYTE[work]}")
+            self.emit(f"movzx {work}, {LOW_BYTE[work]}")
+            if work != dest:
+                self.emit(f"mov {dest}, {work}")
+
+        else:
+            raise Exception(f"Unknown IR operation: {op}")
+
+    def terminator(self, terminator, following, exit_label):
+        if isinstance(terminator, Jump):
+            if terminator.target is not following:
+                self.emit(f"jmp {terminator.target.label}")
+
+        elif isinstance(terminator, Branch):
+            left, right = [self.operand(arg) for arg in terminator.args]
+            if is_immediate(left) or (is_memory(left) and is_memory(right)):
+                self.emit(f"mov eax, {left}")
+                left = 'eax'
+            self.emit(f"cmp {left}, {right}")
+            if terminator.false is following:
+                self.emit(f"{JCC[terminator.op]} {terminator.true.label}")
+            elif terminator.true is following:
+                self.emit(f"{JCC[NEGATED[terminator.op]]} {terminator.false.label}")
+            else:
+                self.emit(f"{JCC[terminator.op]} {terminator.true.label}")
+                self.emit(f"jmp {terminator.false.label}")
+
+        elif isinstance(terminator, Ret):
+            if terminator.args:
+                value = self.operand(terminator.args[0])
+                if value != 'eax':
+                    self.emit(f"mov eax, {value}")
+            if following is not None:
+                self.emit(f"jmp {exit_label}")
@@ -1,86 +1,496 @@
 from .ast1 import *
+from .ir import constant_value
+from .regalloc import ProgramLayout, SCRATCH, collect_assigned, global_label
+from .trace import get_tracer
+
+ARITHMETIC = {'PLUS': 'add', 'MINUS': 'sub', 'MUL': 'imul'}
+SETCC = {'GT': 'setg', 'LT': 'setl', 'EQEQ': 'sete'}
+JUMP_IF = {'GT': 'jg', 'LT': 'jl', 'EQEQ': 'je'}
+JUMP_UNLESS = {'GT': 'jle', 'LT': 'jge', 'EQEQ': 'jne'}
+LOW_BYTE = {'eax': 'al', 'ebx': 'bl', 'ecx': 'cl', 'edx': 'dl'}
 
 class CodeGen:
-    def __init__(self):
+    """x86 (NASM, cdecl) code generator.
+
+    The first generate() call lays out frames and registers for the whole
+    tree (see regalloc.py) and wraps the top-level code in `main`.
+    Expressions are evaluated straight into registers: eax, ecx and edx
+    hold temporaries, and locals allocated to ebx, esi or edi are used in
+    place. The stack is only touched for arguments, spills and locals that
+    didn't get a register.
+    """
+
+    def __init__(self, tracer=None):
         self.asm_code = []  # List to store generated assembly code
+        self.label_count = 0
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.layout = None
+        self.frame = None  # FunctionFrame of the function being generated
+        self.functions = []  # Code for FunctionDefs, emitted after main
+        self.register_needs = {}  # BinOp -> needs(), shared across a chain
+
+    def new_label(self, name):
+        self.label_count += 1
+        return f".{name}{self.label_count}"
+
+    def emit(self, instruction):
+        self.asm_code.append(f"    {instruction}")
 
     def generate(self, node):
+        if self.layout is None:
+            # Top-level code becomes main; functions follow it out of line
+            self.layout = ProgramLayout(node)
+            self.asm_code.append("main:")
+            self.emit("push ebp")
+            self.emit("mov ebp, esp")
+            self.generate(node)
+            self.emit("mov eax, 0")
+            self.epilogue()
+            self.asm_code.extend(self.functions)
+            if self.layout.globals:
+                self.asm_code.append("section .bss")
+                for name in self.layout.globals:
+                    self.asm_code.append(f"{global_label(name)}: resd 1")
+            return
+
+        # Statements are walked with an explicit stack instead of recursion.
+        # Entries are nodes, or callables that finish a statement once its
+        # body has been generated.
+        work = [node]
+        while work:
+            node = work.pop()
+            if callable(node):
+                node()
+            else:
+                self.statement(node, work)
+
+    def statement(self, node, work):
+        if self.tracer is not None:
+            self.tracer.emit('codegen', 'generate', node=type(node).__name__, offset=len(self.asm_code))
+
         if isinstance(node, Block):
-            print("Generating code for Block:")
-            #print(f"Block body: {node.body}")  # Debugging output
-            for stmt in node.body:  # Iterate over the body of the block
-                self.generate(stmt)
+            work.extend(reversed(node.body))  # First statement on top
 
         elif isinstance(node, FunctionDef):
-            print(f"Generating code for FunctionDef: {node.name}")
+            outer, self.frame = self.frame, self.layout.frames[node]
+            outer_code, self.asm_code = self.asm_code, []
             self.asm_code.append(f"{node.name}:")
-            self.asm_code.append("    push ebp")
-            self.asm_code.append("    mov ebp, esp")
-            self.generate(node.body)  # Generate code for the function body
-            self.asm_code.append("    pop ebp")
-            self.asm_code.append("    ret")
+            self.emit("push ebp")
+            self.emit("mov ebp, esp")
+            for reg in self.frame.saved:
+                self.emit(f"push {reg}")
+            if self.frame.frame_size:
+                self.emit(f"sub esp, {self.frame.frame_size}")
+            for index, param in enumerate(node.params):
+                location = self.frame.location(param)
+                if location in self.frame.saved:  # Parameter lives in a register
+                    self.emit(f"mov {location}, dword [ebp + {8 + 4 * index}]")
+            work.append(lambda: self.end_function(outer, outer_code))
+            work.append(node.body)  # Generate code for the function body
 
         elif isinstance(node, Return):
-            print(f"Generating code for Return: {node.value}")
-            self.generate(node.value)  # Generate code for the return value
-            self.asm_code.append("    mov esp, ebp")  # Restore the stack pointer
-            self.asm_code.append("    pop ebp")       # Restore the base pointer
-            self.asm_code.append("    ret")           # Return from the function
+            self.expression(node.value, 'eax')  # Return value goes in eax
+            self.epilogue()
 
         elif isinstance(node, Assign):
-            print(f"Generating code for Assign: {node.target}")
-            self.generate(node.value)
-            self.asm_code.append(f"    mov [ebp - {4 * hash(node.target)}], eax")
+            self.assign(node)
 
         elif isinstance(node, If):
-            print("Generating code for If statement")
-            self.generate(node.condition)
-            self.asm_code.append("    cmp eax, 0")
-            self.asm_code.append("    je .endif")
-            self.generate(node.body)
-            self.asm_code.append(".endif:")
+            end_label = self.new_label("endif")
+            self.branch_unless(node.condition, end_label)
+            work.append(lambda: self.asm_code.append(f"{end_label}:"))
+            work.append(node.body)
+
+        elif isinstance(node, While):
+            start_label = self.new_label("while")
+            end_label = self.new_label("endwhile")
+            self.asm_code.append(f"{start_label}:")
+            self.branch_unless(node.condition, end_label)
+            work.append(lambda: self.end_loop(f"jmp {start_label}", f"{end_label}:"))
+            work.append(node.body)
 
         elif isinstance(node, For):
-            print("Generating code for For loop")
-            self.asm_code.append(f"{node.var}_start:")
-            self.generate(node.iterable)
-            self.asm_code.append("    cmp eax, 0")
-            self.asm_code.append("    je .endfor")
-            self.generate(node.body)
-            self.asm_code.append("    jmp {node.var}_start")
-            self.asm_code.append(".endfor:")
+            self.for_loop(node, work)
 
-        elif isinstance(node, FunctionCall):
-            print(f"Generating code for FunctionCall: {node.name} with args {node.args}")
-            # Push arguments onto the stack in reverse order
-            for arg in reversed(node.args):
-                self.generate(arg)
-                self.asm_code.append("    push eax")
-            # Call the function
-            self.asm_code.append(f"    call {node.name}")
-            # Clean up the stack after the call
-            self.asm_code.append(f"    add esp, {4 * len(node.args)}")
+        else:
+            self.expression(node, 'eax')  # Expression statement, e.g. a call
 
-        elif isinstance(node, Num):
-            self.asm_code.append(f"    mov eax, {node.value}")
+    def for_loop(self, node, work):
+        # A counted loop over range(), like Lowering.lower_for: start and
+        # stop are evaluated once and the step is a constant.
+        #
+        #       eax = start; if not eax < limit: goto end    (> for a negative step)
+        #   next:
+        #       var = eax; <body>
+        #       eax = counter + step; if eax < limit: goto next
+        #   end:
+        #
+        # The counter is the loop variable itself unless the body assigns
+        # it, so the test runs once per iteration and the variable keeps
+        # its last value after the loop. The limit is read in place when it
+        # is a constant or a name the body can't change; anything else
+        # (and a separate counter) is kept on the stack.
+        iterable = node.iterable
+        if not (isinstance(iterable, FunctionCall) and iterable.name == 'range'):
+            raise Exception("For loops can only be compiled over range()")
+        args = iterable.args
+        if not 1 <= len(args) <= 3:
+            raise Exception(f"range() expects 1 to 3 arguments, got {len(args)}")
+        step = 1
+        if len(args) == 3:
+            step = constant_value(args[2])
+            if step is None:
+                raise Exception("range() step must be a constant in compiled code")
+            if step == 0:
+                raise Exception("range() arg 3 must not be zero")
+        start = args[0] if len(args) > 1 else Num(0)
+        stop = args[-1] if len(args) < 3 else args[1]
+        assigned = set()
+        collect_assigned(node.body, assigned)
+        in_place = isinstance(stop, Num) or (isinstance(stop, Var) and stop.name != node.var.name
+                                             and stop.name not in assigned)
 
-        elif isinstance(node, Var):
-            self.asm_code.append(f"    mov eax, [ebp - {4 * hash(node.name)}]")
+        slots = 0
+        if in_place:
+            if not is_leaf(start):
+                self.expression(start, 'eax')
+        elif is_leaf(start):
+            self.expression(stop, 'eax')
+            self.emit("push eax")
+            slots += 1
+        elif is_leaf(stop):
+            self.expression(start, 'eax')
+            self.emit(f"push {self.operand(stop)}")
+            slots += 1
+        else:
+            self.expression(start, 'eax')
+            self.emit("push eax")
+            self.expression(stop, 'eax')
+            self.emit("xchg eax, dword [esp]")  # Limit on the stack, start in eax
+            slots += 1
+        if is_leaf(start):
+            self.expression(start, 'eax')  # Reading it late is safe: stop can't change it
+
+        if node.var.name in assigned:
+            self.emit("push eax")
+            slots += 1
+            counter = "dword [esp]"
+        else:
+            counter = self.location(node.var.name)
+        if in_place:
+            limit = self.operand(stop)
+        else:
+            limit = "dword [esp + 4]" if slots == 2 else "dword [esp]"
+
+        next_label = self.new_label("for")
+        end_label = self.new_label("endfor")
+        self.emit(f"cmp eax, {limit}")
+        self.emit(f"{'jge' if step > 0 else 'jle'} {end_label}")
+        self.asm_code.append(f"{next_label}:")
+        self.emit(f"mov {self.location(node.var.name)}, eax")
+        work.append(lambda: self.end_for(counter, step, limit, next_label, end_label, slots))
+        work.append(node.body)
+
+    def end_for(self, counter, step, limit, next_label, end_label, slots):
+        self.emit(f"mov eax, {counter}")
+        self.emit(f"add eax, {step}")
+        if counter == "dword [esp]":
+            self.emit("mov dword [esp], eax")
+        self.emit(f"cmp eax, {limit}")
+        self.emit(f"{'jl' if step > 0 else 'jg'} {next_label}")
+        self.asm_code.append(f"{end_label}:")
+        if slots:
+            self.emit(f"add esp, {4 * slots}")
+
+    def end_function(self, outer, outer_code):
+        self.epilogue()
+        self.functions.extend(self.asm_code)
+        self.frame = outer
+        self.asm_code = outer_code
+
+    def end_loop(self, jump, end_label):
+        self.emit(jump)
+        self.asm_code.append(end_label)
+
+    def epilogue(self):
+        saved = self.frame.saved if self.frame is not None else []
+        if saved:
+            self.emit(f"lea esp, [ebp - {4 * len(saved)}]")
+            for reg in reversed(saved):
+                self.emit(f"pop {reg}")
+        elif self.frame is None or self.frame.frame_size:
+            self.emit("mov esp, ebp")  # Restore the stack pointer
+        self.emit("pop ebp")  # Restore the base pointer
+        self.emit("ret")  # Return from the function
+
+    def location(self, name):
+        return self.layout.location(self.frame, name)
+
+    def assign(self, node):
+        target = self.location(node.target)
+        value = node.value
+        if is_leaf(value):
+            source = self.operand(value)
+            if source == target:
+                return
+            if is_register(target) or not is_memory(source):
+                self.emit(f"mov {target}, {source}")  # Stores a constant or register directly
+                return
+        if is_register(target) and clobber_safe(value, node.target):
+            self.expression(value, target)  # Compute in the variable's own register
+            return
+        self.expression(value, 'eax')
+        self.emit(f"mov {target}, eax")
+
+    # Expressions
+
+    def operand(self, node):
+        if isinstance(node, Num):
+            return str(int(node.value))  # Folded comparisons are bools
+        return self.location(node.name)
+
+    def expression(self, node, dst, free=None):
+        """Evaluate `node` into register `dst`, using only the scratch registers in `free`."""
+        if free is None:
+            free = [reg for reg in SCRATCH if reg != dst]
+
+        if is_leaf(node):
+            source = self.operand(node)
+            if source != dst:
+                self.emit(f"mov {dst}, {source}")
 
         elif isinstance(node, BinOp):
-            self.generate(node.left)
-            self.asm_code.append("    push eax")
-            self.generate(node.right)
-            self.asm_code.append("    pop ebx")
-            if node.op == 'PLUS':
-                self.asm_code.append("    add eax, ebx")
-            elif node.op == 'MINUS':
-                self.asm_code.append("    sub eax, ebx")
-            elif node.op == 'MUL':
-                self.asm_code.append("    imul eax, ebx")
-            elif node.op == 'DIV':
-                self.asm_code.append("    xor edx, edx")
-                self.asm_code.append("    idiv ebx")
+            # Unless the right operand goes first, the left one is evaluated
+            # into dst with the same registers. Walk down that left spine
+            # iteratively, so long chains like a + b + c + ... don't recurse,
+            # then finish each operator on the way back up.
+            spine = []
+            while isinstance(node, BinOp) and not self.right_first(node, free):
+                spine.append(node)
+                node = node.left
+            if isinstance(node, BinOp):
+                self.finish_binop(node, dst, free)  # Evaluates both operands
+            else:
+                self.expression(node, dst, free)
+            for node in reversed(spine):
+                self.finish_binop(node, dst, free)
+
+        elif isinstance(node, FunctionCall):
+            self.call(node, dst, free)
 
         else:
             raise Exception(f"Unknown node type: {type(node)}")
+
+    def right_first(self, node, free):
+        if not isinstance(node, BinOp) or is_leaf(node.right) or not free:
+            return False
+        return (needs(node.right, self.register_needs) > needs(node.left, self.register_needs)
+                and not (has_call(node.left) and has_call(node.right)))
+
+    def finish_binop(self, node, dst, free):
+        # Apply `node` once its left operand is in dst (or, if right_first,
+        # compute both operands)
+        if is_leaf(node.right):
+            self.apply(node.op, dst, self.operand(node.right), free)
+        elif free:
+            # Division and calls clobber eax/edx, so prefer ecx
+            temp = next((reg for reg in free if reg not in ('eax', 'edx')), free[0])
+            rest = [reg for reg in free if reg != temp]
+            if self.right_first(node, free):
+                self.expression(node.right, temp, rest)
+                self.expression(node.left, dst, rest)
+            else:
+                self.expression(node.right, temp, rest)  # temp wasn't live for the left operand
+            self.apply(node.op, dst, temp, rest)
+        else:
+            # Out of registers: park the left operand on the stack
+            self.emit(f"push {dst}")
+            self.expression(node.right, dst, free)
+            self.emit(f"xchg {dst}, dword [esp]")
+            self.apply(node.op, dst, "dword [esp]", free)
+            self.emit("add esp, 4")
+
+    def call(self, node, dst, free):
+        # eax, ecx and edx don't survive the call; save the ones still in use
+        busy = [reg for reg in SCRATCH if reg not in free and reg != dst]
+        for reg in busy:
+            self.emit(f"push {reg}")
+        if any(has_call(arg) for arg in node.args):
+            # Calls in the arguments must run left to right, as in the
+            # interpreter: reserve the argument area and fill it in order
+            self.emit(f"sub esp, {4 * len(node.args)}")
+            for index, arg in enumerate(node.args):
+                if isinstance(arg, Num):
+                    self.emit(f"mov dword [esp + {4 * index}], {self.operand(arg)}")
+                else:
+                    self.expression(arg, 'eax')
+                    self.emit(f"mov dword [esp + {4 * index}], eax")
+        else:
+            # Push arguments onto the stack in reverse order
+            for arg in reversed(node.args):
+                if is_leaf(arg):
+                    self.emit(f"push {self.operand(arg)}")
+                else:
+                    self.expression(arg, 'eax')
+                    self.emit("push eax")
+        self.emit(f"call {node.name}")
+        if node.args:
+            self.emit(f"add esp, {4 * len(node.args)}")  # Clean up the stack after the call
+        if dst != 'eax':
+            self.emit(f"mov {dst}, eax")
+        for reg in reversed(busy):
+            self.emit(f"pop {reg}")
+
+    def apply(self, op, dst, source, free):
+        # dst = dst <op> source
+        if op in ARITHMETIC:
+            if op == 'MUL' and source.lstrip('-').isdigit():
+                self.emit(f"imul {dst}, {dst}, {source}")
+            else:
+                self.emit(f"{ARITHMETIC[op]} {dst}, {source}")
+        elif op == 'DIV':
+            self.divide(dst, source, free)
+        elif op in SETCC:
+            # Leave 1 or 0 in dst so conditions can test against 0
+            self.emit(f"cmp {dst}, {source}")
+            if dst in LOW_BYTE:
+                self.emit(f"{SETCC[op]} {LOW_BYTE[dst]}")
+                self.emit(f"movzx {dst}, {LOW_BYTE[dst]}")
+            else:
+                done = self.new_label("cmp")
+                self.emit(f"mov {dst}, 1")  # mov leaves the flags alone
+                self.emit(f"{JUMP_IF[op]} {done}")
+                self.emit(f"mov {dst}, 0")
+                self.asm_code.append(f"{done}:")
+        else:
+            raise Exception(f"Unknown operator: {op}")
+
+    def divide(self, dst, divisor, free):
+        # idiv divides edx:eax, leaving the quotient in eax and clobbering edx
+        saved = [reg for reg in ('eax', 'edx') if reg != dst and reg not in free and reg != divisor]
+        for reg in saved:
+            self.emit(f"push {reg}")
+        if divisor == "dword [esp]" and saved:
+            divisor = f"dword [esp + {4 * len(saved)}]"
+        pushed = False
+        if not (is_memory(divisor) or (is_register(divisor) and divisor not in ('eax', 'edx'))):
+            spare = next((reg for reg in free if reg not in ('eax', 'edx')), None)
+            if spare is not None:
+                self.emit(f"mov {spare}, {divisor}")
+                divisor = spare
+            else:
+                pushed = True
+        if pushed:
+            self.emit(f"push {divisor}")
+            divisor = "dword [esp]"
+        if dst != 'eax':
+            self.emit(f"mov eax, {dst}")
+        self.emit("cdq")
+        self.emit(f"idiv {divisor}")
+        if dst != 'eax':
+            self.emit(f"mov {dst}, eax")
+        if pushed:
+            self.emit("add esp, 4")
+        for reg in reversed(saved):
+            self.emit(f"pop {reg}")
+
+    def branch_unless(self, condition, label):
+        # Jump to `label` when the condition is false, comparing in place
+        # instead of materializing 1/0
+        if isinstance(condition, BinOp) and condition.op in JUMP_UNLESS:
+            right = self.operand(condition.right) if is_leaf(condition.right) else 'ecx'
+            left = self.operand(condition.left) if isinstance(condition.left, Var) else None
+            if left is None or (is_memory(left) and is_memory(right)):
+                left = 'eax'
+                self.expression(condition.left, 'eax')
+            if right == 'ecx':
+                self.expression(condition.right, 'ecx', [reg for reg in ('eax', 'edx') if reg != left])
+            self.emit(f"cmp {left}, {right}")
+            self.emit(f"{JUMP_UNLESS[condition.op]} {label}")
+            return
+        value = self.operand(condition) if isinstance(condition, Var) else None
+        if value is None or not is_register(value):
+            self.expression(condition, 'eax')
+            value = 'eax'
+        self.emit(f"test {value}, {value}")
+        self.emit(f"je {label}")
+
+
+def is_leaf(node):
+    return isinstance(node, (Num, Var))
+
+
+def is_memory(operand):
+    return operand.startswith("dword [")
+
+
+def is_register(operand):
+    return operand in LOW_BYTE or operand in ('esi', 'edi')
+
+
+def needs(node, known=None):
+    # Registers needed to evaluate a subtree (Sethi-Ullman numbering),
+    # computed bottom-up with an explicit stack. Results for every BinOp
+    # visited are kept in `known`, so asking again down a long chain is cheap.
+    if known is None:
+        known = {}
+    root = node
+    work = [node]
+    while work:
+        node = work[-1]
+        if not isinstance(node, BinOp):
+            work.pop()
+            continue
+        if node in known:
+            work.pop()
+            continue
+        left = known.get(node.left) if isinstance(node.left, BinOp) else 1
+        right = 0 if is_leaf(node.right) else known.get(node.right) if isinstance(node.right, BinOp) else 1
+        if left is None or right is None:
+            if left is None:
+                work.append(node.left)
+            if right is None:
+                work.append(node.right)
+            continue
+        work.pop()
+        known[node] = max(left, right) if left != right else left + 1
+    return known[root] if isinstance(root, BinOp) else 1
+
+
+def clobber_safe(node, name):
+    # True if `node` can be evaluated straight into the register holding
+    # `name`: the variable may only be read first, down the left spine
+    while isinstance(node, BinOp):
+        if reads(node.right, name):
+            return False
+        node = node.left
+    if isinstance(node, Var):
+        return True
+    return not reads(node, name)
+
+
+def has_call(node):
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, FunctionCall):
+            return True
+        if isinstance(node, BinOp):
+            work.append(node.right)
+            work.append(node.left)
+    return False
+
+
+def reads(node, name):
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Var):
+            if node.name == name:
+                return True
+        elif isinstance(node, BinOp):
+            work.append(node.right)
+            work.append(node.left)
+        elif isinstance(node, FunctionCall):
+            work.extend(reversed(node.args))
+    return False
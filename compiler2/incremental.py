@@ -0,0 +1,227 @@
+# compiler/incremental.py
+#
+# Incremental reparsing for editors.
+#
+#     parser = IncrementalParser(text)
+#     tree = parser.tree                          # same tree Parser.parse gives
+#     tree = parser.edit((2, 4), (2, 9), "new")  # replace line 2, columns 4-9
+#     print(parser.stats)
+#
+# A source file is split into chunks, one per top-level statement: a line
+# that starts in column 0 opens a chunk, and the indented and blank lines
+# after it belong to it. Top-level statements never share tokens, so every
+# chunk lexes and parses on its own. An edit re-lexes and reparses only the
+# chunks whose lines it touches (plus the chunk before, if the edit indents
+# that chunk's first line into it); every other chunk keeps its statements.
+# Inside a reparsed chunk, subtrees that came out the same as before are
+# replaced by the old objects, so an edit to one line of a function keeps
+# the rest of its Blocks.
+#
+# Each edit returns a new top-level Block; trees handed out earlier are
+# never modified.
+
+from .ast1 import *
+from .parser1 import Parser
+from .scanner import Scanner
+
+
+def starts_statement(line):
+    # Scanner measures indentation in spaces only. A line of just tabs sits
+    # at level 0 but yields no statement (a `def` header may even continue
+    # past it), so it stays with the chunk before it.
+    return line.strip() != '' and line[0] != ' '
+
+
+def same_value(old, new):
+    if isinstance(old, ASTNode) or isinstance(new, ASTNode):
+        return old is new
+    if isinstance(old, list) and isinstance(new, list):
+        return len(old) == len(new) and all(same_value(a, b) for a, b in zip(old, new))
+    return type(old) is type(new) and old == new
+
+
+def reuse(old, new):
+    """Returns `new`, with every subtree equal to the matching part of `old` swapped for the old one."""
+    if isinstance(old, list) and isinstance(new, list):
+        return [reuse(a, b) for a, b in zip(old, new)] + new[len(old):]
+    if not isinstance(new, ASTNode) or type(old) is not type(new):
+        return new
+    same = True
+    for field in type(new).__slots__:
+        value = reuse(getattr(old, field), getattr(new, field))
+        setattr(new, field, value)
+        if not same_value(getattr(old, field), value):
+            same = False
+    return old if same else new
+
+
+class Chunk:
+    __slots__ = ('start', 'offset', 'lines', 'statements', 'error', 'final')
+
+    def __init__(self, start, lines):
+        self.start = start  # Index of the first line in the file
+        self.offset = 0  # Index of the first statement in the top-level Block
+        self.lines = lines
+        self.statements = []
+        self.error = None
+        self.error_start = None  # File line index the error's line numbers count from
+        self.final = False  # Parsed as the last chunk of the file
+
+
+class IncrementalParser:
+    def __init__(self, text):
+        self.lines = text.split('\n')
+        self.lexemes = {}  # Scanner lexeme table, shared by every chunk
+        self.stats = {
+            'edits': 0,
+            'lines_relexed': 0,
+            'statements_reparsed': 0,
+            'statements_reused': 0,
+        }
+        # Chunks from `gap` on are stored with their start and offset short
+        # by `pending`; edits fix up only the chunks between the gap and the
+        # edit, like an editor's gap buffer, instead of every chunk after it
+        self.gap = 0
+        self.pending = (0, 0)  # (lines, statements)
+        self.broken = set()  # Chunks that failed to lex or parse
+        self.chunks = self.split(0, self.lines)
+        self.statements = []
+        for chunk in self.chunks:
+            self.parse_chunk(chunk, chunk is self.chunks[-1])
+            chunk.offset = len(self.statements)
+            self.statements.extend(chunk.statements)
+        self.gap = len(self.chunks)
+        self.tree = self.build()
+
+    @property
+    def text(self):
+        return '\n'.join(self.lines)
+
+    def split(self, start, lines):
+        chunks = []
+        for index, line in enumerate(lines):
+            if not chunks or starts_statement(line):
+                chunks.append(Chunk(start + index, []))
+            chunks[-1].lines.append(line)
+        return chunks
+
+    def parse_chunk(self, chunk, final, start=None):
+        # Scanner reads a last line of spaces as indentation, not as a blank
+        # line. Every chunk but the last is followed by a line in column 0,
+        # so end it with an empty one to lex it the way the whole file lexes.
+        lines = chunk.lines if final else chunk.lines + ['']
+        chunk.final = final
+        # Numbered from the chunk's place in the file, so tokens and lexer
+        # errors carry file line numbers
+        start = chunk.start if start is None else start
+        scanner = Scanner('\n'.join(lines), first_line=start + 1)
+        scanner.lexemes = self.lexemes
+        try:
+            chunk.statements = Parser(scanner).parse().body
+            chunk.error = None
+        except Exception as e:  # Lexer errors are plain Exceptions, Parser's are SyntaxErrors
+            chunk.statements = []
+            chunk.error = e
+            chunk.error_start = start
+            self.broken.add(chunk)
+        self.stats['lines_relexed'] += len(chunk.lines)
+        self.stats['statements_reparsed'] += len(chunk.statements)
+
+    def start_of(self, index):
+        chunk = self.chunks[index]
+        return chunk.start + self.pending[0] if index >= self.gap else chunk.start
+
+    def chunk_at(self, line):
+        # Binary search over chunk starts
+        low, high = 0, len(self.chunks) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.start_of(middle) <= line:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def move_gap(self, index):
+        lines, statements = self.pending
+        if index > self.gap:
+            for chunk in self.chunks[self.gap:index]:
+                chunk.start += lines
+                chunk.offset += statements
+        else:
+            for chunk in self.chunks[index:self.gap]:
+                chunk.start -= lines
+                chunk.offset -= statements
+        self.gap = index
+
+    def edit(self, start, end, new_text):
+        """Replaces the text from `start` up to `end` with new_text and returns the new tree.
+
+        Positions are (line, column) pairs counted from 0, the way editors
+        report changes. Raises the first Lexer or Parser error in the file,
+        if any; the edit is applied either way, so later edits can fix it.
+        """
+        self.stats['edits'] += 1
+        first, first_column = start
+        last, last_column = end
+        if not (0 <= first <= last < len(self.lines)):
+            raise Exception(f"Edit range {start}-{end} is outside the text")
+        replaced = (self.lines[first][:first_column] + new_text + self.lines[last][last_column:]).split('\n')
+        delta = len(replaced) - (last - first + 1)
+        self.lines[first:last + 1] = replaced
+
+        low = self.chunk_at(first)
+        high = self.chunk_at(last)
+        if low > 0 and first == self.start_of(low) and not starts_statement(self.lines[first]):
+            low -= 1  # The chunk's first line now continues the one before it
+        self.move_gap(high + 1)
+        old = self.chunks[low:high + 1]
+        span_start = old[0].start
+        span_end = old[-1].start + len(old[-1].lines) + delta
+        new = self.split(span_start, self.lines[span_start:span_end])
+
+        # Chunks whose text didn't change keep their statements as they are;
+        # the rest are reparsed and matched against the old chunk in the same place
+        unchanged = {}
+        for chunk in old:
+            self.broken.discard(chunk)
+            unchanged.setdefault('\n'.join(chunk.lines), chunk)
+        at_end = high == len(self.chunks) - 1
+        statements = []
+        reparsed = 0
+        for index, chunk in enumerate(new):
+            final = at_end and index == len(new) - 1
+            chunk.offset = old[0].offset + len(statements)
+            match = unchanged.pop('\n'.join(chunk.lines), None)
+            if match is not None and match.error is None and match.final == final:
+                chunk.statements = match.statements
+                chunk.final = final
+            else:
+                self.parse_chunk(chunk, final)
+                reparsed += len(chunk.statements)
+                if index < len(old) and old[index].error is None:
+                    chunk.statements = reuse(old[index].statements, chunk.statements)
+            statements.extend(chunk.statements)
+
+        removed = sum(len(chunk.statements) for chunk in old)
+        self.statements[old[0].offset:old[0].offset + removed] = statements
+        self.chunks[low:high + 1] = new
+        self.gap = low + len(new)
+        self.pending = (self.pending[0] + delta, self.pending[1] + len(statements) - removed)
+        self.stats['statements_reused'] += len(self.statements) - reparsed
+        self.tree = self.build()
+        return self.tree
+
+    def build(self):
+        if self.broken:
+            self.tree = None
+            # Report the error that comes first in the file
+            index = min(self.chunks.index(chunk) for chunk in self.broken)
+            first = self.chunks[index]
+            start = self.start_of(index)
+            if first.error_start != start:
+                # Edits above it moved the chunk since its error was made;
+                # lex it again for the error's line numbers
+                self.parse_chunk(first, first.final, start)
+            raise first.error
+        return Block(list(self.statements))
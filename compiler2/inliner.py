@@ -0,0 +1,378 @@
+# compiler/inliner.py
+#
+# Tree-to-tree pass that replaces calls to small functions with their
+# bodies. Run it before Optimizer, so the inlined code gets folded too:
+#
+#     inliner = Inliner(max_size=16)
+#     ast = Optimizer().optimize(inliner.inline(ast))
+#     print("\n".join(inliner.report()))
+#
+# A function is inlined when it is
+#   - defined once, directly at the top level, and its name is never
+#     assigned, so every call to that name reaches this FunctionDef;
+#   - straight-line: some assignments followed by `return <expr>`, each
+#     local assigned before it is read, at most `max_size` nodes;
+#   - defined before the statement making the call. That is also what
+#     stops recursion: a function is never inlined into itself, and
+#     inlined bodies only contain calls to functions defined earlier.
+#
+# At a call that is a whole statement (`x = f(...)`, `return f(...)` or
+# `f(...)`), parameters and locals are renamed to fresh names. Arguments
+# are bound to fresh temporaries in order, then the body's assignments
+# run, then the statement uses the returned expression. Anywhere else
+# (inside a larger expression, a condition, another call's arguments)
+# only single-`return` functions are inlined, by substituting the
+# arguments into the expression. That needs each argument to be a Num or
+# Var, or arithmetic that can't raise and is used exactly once, so
+# nothing observable moves.
+#
+# A call inside a function is only inlined when none of the callee's
+# free names is a local there, since the caller's local would shadow the
+# global the callee reads. Temporaries inlined at the top level are new
+# globals. The input tree is never modified.
+
+from .ast1 import *
+from .optimizer import is_side_effect_free
+
+MODULE = '<module>'
+
+
+class Candidate:
+    def __init__(self, func, index):
+        self.func = func
+        self.index = index  # Top-level statement that defines it
+        self.params = list(func.params)
+        self.assignments = func.body.body[:-1]
+        self.result = func.body.body[-1].value
+        self.locals = {stmt.target for stmt in self.assignments}
+        self.free = set()
+        for stmt in self.assignments:
+            self.free |= read_names(stmt.value)
+        self.free |= read_names(self.result)
+        self.free |= called_names(func.body)
+        self.free -= set(self.params) | self.locals
+        self.uses = {}  # param -> times the body reads it
+        for stmt in self.assignments:
+            count_reads(stmt.value, self.uses)
+        count_reads(self.result, self.uses)
+
+
+class Scope:
+    def __init__(self, index, name, local_names=None):
+        self.index = index  # Top-level statement the code belongs to
+        self.name = name  # Function being rewritten, or MODULE
+        self.locals = local_names  # None at the top level
+
+
+class Inliner:
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self.stats = {
+            'calls_inlined': 0,
+            'temporaries': 0,
+        }
+        self.inlined = {}  # (callee, caller) -> call sites inlined
+        self.rejected = {}  # function name -> why its calls stay calls
+
+    def inline(self, tree):
+        self.taken = set()
+        definitions = {}
+        reassigned = set()
+        collect_names(tree, self.taken, definitions, reassigned)
+        self.counter = 0
+        self.candidates = {}
+
+        statements = []
+        for index, stmt in enumerate(tree.body):
+            if isinstance(stmt, FunctionDef):
+                stmt = self.function_def(stmt, index)
+                reason = self.check_candidate(stmt, definitions, reassigned)
+                if reason is None:
+                    self.candidates[stmt.name] = Candidate(stmt, index)
+                else:
+                    self.rejected[stmt.name] = reason
+                statements.append(stmt)
+            else:
+                statements.extend(self.statement(stmt, Scope(index, MODULE)))
+        return Block(statements)
+
+    def check_candidate(self, func, definitions, reassigned):
+        if definitions.get(func.name, 0) > 1:
+            return "defined more than once"
+        if func.name in reassigned:
+            return "name is reassigned"
+        body = func.body.body
+        if not body or not isinstance(body[-1], Return):
+            return "doesn't end in return"
+        if not all(isinstance(stmt, Assign) for stmt in body[:-1]):
+            return "has control flow"
+        if size(func.body) > self.max_size:
+            return f"larger than {self.max_size} nodes"
+        assigned = set(func.params)
+        local_names = {stmt.target for stmt in body[:-1]}
+        if called_names(func.body) & (assigned | local_names):
+            return "calls a parameter or local"
+        for stmt in body[:-1]:
+            if (read_names(stmt.value) & local_names) - assigned:
+                return "reads a local before assigning it"
+            assigned.add(stmt.target)
+        return None
+
+    def function_def(self, node, index):
+        local_names = set(node.params) | assigned_names(node.body)
+        scope = Scope(index, node.name, local_names)
+        return FunctionDef(node.name, list(node.params), Block(self.statements(node.body.body, scope)))
+
+    # Statements
+
+    def statements(self, statements, scope):
+        result = []
+        for stmt in statements:
+            result.extend(self.statement(stmt, scope))
+        return result
+
+    def statement(self, node, scope):
+        if isinstance(node, Assign):
+            prefix, value = self.whole(node.value, scope)
+            return prefix + [Assign(node.target, value)]
+        if isinstance(node, Return):
+            prefix, value = self.whole(node.value, scope)
+            return prefix + [Return(value)]
+        if isinstance(node, If):
+            return [If(self.expression(node.condition, scope), Block(self.statements(node.body.body, scope)))]
+        if isinstance(node, While):
+            return [While(self.expression(node.condition, scope), Block(self.statements(node.body.body, scope)))]
+        if isinstance(node, For):
+            iterable = self.expression(node.iterable, scope)
+            return [For(Var(node.var.name), iterable, Block(self.statements(node.body.body, scope)))]
+        if isinstance(node, FunctionDef):
+            # Nested functions see their own locals, then globals
+            local_names = set(node.params) | assigned_names(node.body)
+            inner = Scope(scope.index, node.name, local_names)
+            return [FunctionDef(node.name, list(node.params), Block(self.statements(node.body.body, inner)))]
+        prefix, value = self.whole(node, scope)
+        return prefix + [value]
+
+    def whole(self, node, scope):
+        # (statements to run first, expression) for an expression that is
+        # the entire value of its statement
+        if isinstance(node, FunctionCall):
+            args = [self.expression(arg, scope) for arg in node.args]
+            candidate = self.candidate_for(node, scope)
+            if candidate is not None:
+                return self.expand(candidate, args, scope)
+            return [], FunctionCall(node.name, args)
+        return [], self.expression(node, scope)
+
+    def candidate_for(self, node, scope):
+        candidate = self.candidates.get(node.name)
+        if candidate is None or node.name in ('print', 'range'):
+            return None
+        if candidate.index >= scope.index or len(node.args) != len(candidate.params):
+            return None
+        if scope.locals is not None and (node.name in scope.locals or candidate.free & scope.locals):
+            return None
+        return candidate
+
+    def expand(self, candidate, args, scope):
+        mapping = {}
+        prefix = []
+        for param, arg in zip(candidate.params, args):
+            if param not in candidate.locals and self.substitutable(arg, candidate.uses.get(param, 0)):
+                mapping[param] = arg
+            else:
+                temp = self.fresh(candidate.func.name, param)
+                prefix.append(Assign(temp, arg))
+                mapping[param] = Var(temp)
+                self.stats['temporaries'] += 1
+        for name in sorted(candidate.locals - set(candidate.params)):
+            mapping[name] = Var(self.fresh(candidate.func.name, name))
+        for stmt in candidate.assignments:
+            prefix.append(Assign(mapping[stmt.target].name, substitute(stmt.value, mapping)))
+        self.record(candidate, scope)
+        return prefix, substitute(candidate.result, mapping)
+
+    def substitutable(self, arg, uses):
+        # Evaluated where the parameter is read instead of up front
+        if isinstance(arg, (Num, Var)):
+            return True
+        return uses == 1 and is_side_effect_free(arg)
+
+    def fresh(self, function_name, name):
+        while True:
+            self.counter += 1
+            fresh = f"{function_name}_{name}_{self.counter}"
+            if fresh not in self.taken:
+                self.taken.add(fresh)
+                return fresh
+
+    def record(self, candidate, scope):
+        key = (candidate.func.name, scope.name)
+        self.inlined[key] = self.inlined.get(key, 0) + 1
+        self.stats['calls_inlined'] += 1
+
+    # Expressions
+
+    def expression(self, node, scope):
+        if isinstance(node, BinOp):
+            return BinOp(self.expression(node.left, scope), node.op, self.expression(node.right, scope))
+        if isinstance(node, FunctionCall):
+            args = [self.expression(arg, scope) for arg in node.args]
+            candidate = self.candidate_for(node, scope)
+            if (candidate is not None and not candidate.assignments
+                    and all(self.substitutable(arg, candidate.uses.get(param, 0))
+                            for param, arg in zip(candidate.params, args))):
+                self.record(candidate, scope)
+                return substitute(candidate.result, dict(zip(candidate.params, args)))
+            return FunctionCall(node.name, args)
+        return copy_leaf(node)
+
+    def report(self):
+        lines = []
+        for (callee, caller), count in sorted(self.inlined.items()):
+            lines.append(f"inlined {callee} into {caller}: {count} call{'s' if count != 1 else ''}")
+        for name, reason in sorted(self.rejected.items()):
+            lines.append(f"not inlined {name}: {reason}")
+        return lines
+
+
+def copy_leaf(node):
+    if isinstance(node, Num):
+        return Num(node.value)
+    if isinstance(node, Var):
+        return Var(node.name)
+    if isinstance(node, Str):
+        return Str(node.value)
+    raise Exception(f"Unknown node type: {type(node)}")
+
+
+def substitute(node, mapping):
+    # Copy of an expression with Vars replaced by copies of mapping[name]
+    if isinstance(node, Var):
+        if node.name in mapping:
+            return substitute(mapping[node.name], {})
+        return Var(node.name)
+    if isinstance(node, BinOp):
+        return BinOp(substitute(node.left, mapping), node.op, substitute(node.right, mapping))
+    if isinstance(node, FunctionCall):
+        return FunctionCall(node.name, [substitute(arg, mapping) for arg in node.args])
+    return copy_leaf(node)
+
+
+def read_names(node):
+    names = set()
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Var):
+            names.add(node.name)
+        elif isinstance(node, BinOp):
+            work.extend((node.left, node.right))
+        elif isinstance(node, FunctionCall):
+            work.extend(node.args)
+    return names
+
+
+def called_names(node):
+    # User functions called anywhere under node; print and range are builtins
+    names = set()
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Block):
+            work.extend(node.body)
+        elif isinstance(node, (Assign, Return)):
+            work.append(node.value)
+        elif isinstance(node, BinOp):
+            work.extend((node.left, node.right))
+        elif isinstance(node, FunctionCall):
+            if node.name not in ('print', 'range'):
+                names.add(node.name)
+            work.extend(node.args)
+    return names
+
+
+def count_reads(node, counts):
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Var):
+            counts[node.name] = counts.get(node.name, 0) + 1
+        elif isinstance(node, BinOp):
+            work.extend((node.left, node.right))
+        elif isinstance(node, FunctionCall):
+            work.extend(node.args)
+
+
+def assigned_names(node):
+    # Locals a function body creates: assignments, loop variables and
+    # nested functions, not counting what those nested functions assign
+    names = set()
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Block):
+            work.extend(node.body)
+        elif isinstance(node, Assign):
+            names.add(node.target)
+        elif isinstance(node, For):
+            names.add(node.var.name)
+            work.append(node.body)
+        elif isinstance(node, (If, While)):
+            work.append(node.body)
+        elif isinstance(node, FunctionDef):
+            names.add(node.name)
+    return names
+
+
+def collect_names(tree, taken, definitions, reassigned):
+    # Every name in the program goes in `taken`; FunctionDef names are
+    # counted in `definitions`, and names assigned to in `reassigned`
+    work = [tree]
+    while work:
+        node = work.pop()
+        if isinstance(node, Block):
+            work.extend(node.body)
+        elif isinstance(node, FunctionDef):
+            taken.add(node.name)
+            taken.update(node.params)
+            definitions[node.name] = definitions.get(node.name, 0) + 1
+            work.append(node.body)
+        elif isinstance(node, Assign):
+            taken.add(node.target)
+            reassigned.add(node.target)
+            work.append(node.value)
+        elif isinstance(node, For):
+            taken.add(node.var.name)
+            reassigned.add(node.var.name)
+            work.extend((node.iterable, node.body))
+        elif isinstance(node, (If, While)):
+            work.extend((node.condition, node.body))
+        elif isinstance(node, Return):
+            work.append(node.value)
+        elif isinstance(node, BinOp):
+            work.extend((node.left, node.right))
+        elif isinstance(node, FunctionCall):
+            taken.add(node.name)
+            work.extend(node.args)
+        elif isinstance(node, Var):
+            taken.add(node.name)
+
+
+def size(node):
+    count = 0
+    work = [node]
+    while work:
+        node = work.pop()
+        count += 1
+        if isinstance(node, Block):
+            work.extend(node.body)
+        elif isinstance(node, Assign):
+            work.append(node.value)
+        elif isinstance(node, Return):
+            work.append(node.value)
+        elif isinstance(node, BinOp):
+            work.extend((node.left, node.right))
+        elif isinstance(node, FunctionCall):
+            work.extend(node.args)
+    return count
@@ -1,11 +1,26 @@
 from .ast1 import *
+from .memo import MISSING
+from .trace import get_tracer
 
 class Interpreter:
-    def __init__(self, parser):
+    def __init__(self, parser, tracer=None, memo=None, profiler=None, tier=None, vectorizer=None):
         self.parser = parser
+        self.memo = memo  # Optional MemoCache for pure functions
+        self.profiler = profiler  # Optional Profiler
+        self.tier = tier  # Optional NativeTier for hot functions
+        self.vectorizer = vectorizer  # Optional LoopVectorizer for counted loops
         self.symbol_table = {}
+        self.globals = self.symbol_table  # symbol_table is swapped during calls
+        self.tracer = tracer if tracer is not None else get_tracer()
+        if tier is not None:
+            tier.bind(self)
 
     def visit(self, node):
+        if self.tracer is not None:
+            self.tracer.emit('interpret', 'visit', node=type(node).__name__)
+        if self.profiler is not None:
+            self.profiler.visits[node] += 1
+
         if isinstance(node, Block):
             for stmt in node.body:
                 result = self.visit(stmt)
@@ -22,8 +37,17 @@ class Interpreter:
             if self.visit(node.condition):
                 return self.visit(node.body)
 
+        elif isinstance(node, While):
+            while self.visit(node.condition):
+                result = self.visit(node.body)
+                if result is not None:  # Handle return values inside loops
+                    return result
+
         elif isinstance(node, For):
-            iterable = self.visit(node.iterable)  # Evaluate the iterable (e.g., range)
+            iterable = self.visit(node.iterable)  # Evaluate the iterable (e.g., range); consumed lazily
+            if (self.vectorizer is not None and self.tracer is None and self.profiler is None
+                    and self.vectorizer.run(node, iterable, self)):
+                return None  # Ran as array operations; the body never returns
             for value in iterable:
                 self.symbol_table[node.var.name] = value  # Use the variable's name as the key
                 result = self.visit(node.body)  # Visit the loop body
@@ -37,29 +61,21 @@ class Interpreter:
                 print(*values)  # Use Python's built-in print function
                 return None
             elif node.name == "range":
-                # Handle the built-in `range` function
-                if len(node.args) == 2:
-                    start = self.visit(node.args[0])
-                    end = self.visit(node.args[1])
-                    return list(range(start, end))
+                # Handle the built-in `range` function; the range object is
+                # lazy, so loops over it run in constant memory
+                if 1 <= len(node.args) <= 3:
+                    return range(*[self.visit(arg) for arg in node.args])
                 else:
-                    raise Exception(f"range() expects 2 arguments, got {len(node.args)}")
+                    raise Exception(f"range() expects 1 to 3 arguments, got {len(node.args)}")
             else:
                 # Handle user-defined functions
-                func = self.symbol_table.get(node.name)
+                func = self.symbol_table.get(node.name) or self.globals.get(node.name)
                 if not func:
                     raise Exception(f"Function {node.name} is not defined")
                 arg_values = [self.visit(arg) for arg in node.args]
-                local_symbol_table = {}
-                for param, arg in zip(func.params, arg_values):
-                    local_symbol_table[param] = arg
-                previous_symbol_table = self.symbol_table
-                self.symbol_table = local_symbol_table
-                try:
-                    result = self.visit(func.body)
-                    return result
-                finally:
-                    self.symbol_table = previous_symbol_table
+                if self.tracer is not None:
+                    self.tracer.emit('interpret', 'call', name=node.name, args=arg_values)
+                return self.call_function(func, arg_values)
 
         elif isinstance(node, Return):
             return self.visit(node.value)
@@ -68,8 +84,13 @@ class Interpreter:
             return node.value
 
         elif isinstance(node, Var):
-            value = self.symbol_table.get(node.name, 0)  # Retrieve the value using the variable's name
-            print(f"Var: {node.name} = {value}")  # Debugging output
+            # Locals first, then globals
+            if node.name in self.symbol_table:
+                value = self.symbol_table[node.name]
+            else:
+                value = self.globals.get(node.name, 0)
+            if self.tracer is not None:
+                self.tracer.emit('interpret', 'var', name=node.name, value=value)
             return value
 
         elif isinstance(node, BinOp):
@@ -83,6 +104,44 @@ class Interpreter:
                 return left * right
             elif node.op == 'DIV':
                 return left // right
+            elif node.op == 'GT':
+                return left > right
+            elif node.op == 'LT':
+                return left < right
+            elif node.op == 'EQEQ':
+                return left == right
 
         else:
             raise Exception(f"Unknown node type: {type(node)}")
+
+    def call_function(self, func, arg_values):
+        # Runs a user-defined function on already evaluated arguments
+        if self.memo is not None:
+            result = self.memo.get(func, arg_values)
+            if result is not MISSING:
+                return result
+        if self.tier is not None and self.tracer is None and self.profiler is None:
+            # Native code reports no per-node events, so it only runs
+            # when nothing is listening for them
+            native = self.tier.native_for(func)
+            if native is not None and len(arg_values) == len(func.params):
+                result = native(*arg_values)
+                if self.memo is not None:
+                    self.memo.store(func, arg_values, result)
+                return result
+        local_symbol_table = {}
+        for param, arg in zip(func.params, arg_values):
+            local_symbol_table[param] = arg
+        previous_symbol_table = self.symbol_table
+        self.symbol_table = local_symbol_table
+        if self.profiler is not None:
+            self.profiler.enter(func)
+        try:
+            result = self.visit(func.body)
+            if self.memo is not None:
+                self.memo.store(func, arg_values, result)
+            return result
+        finally:
+            self.symbol_table = previous_symbol_table
+            if self.profiler is not None:
+                self.profiler.exit()
@@ -0,0 +1,388 @@
+# compiler/ir.py
+#
+# Three-address IR between the AST and x86.
+#
+#     program = Lowering().lower(ast)
+#     print(format_ir(program))
+#
+# A program is a list of IRFunctions; top-level code is the function
+# `main`. Each function is a list of BasicBlocks in layout order. A block
+# holds straight-line Instrs and ends in one terminator: Jump, Branch or
+# Ret. Block labels are unique across the whole program.
+#
+# Operands are ints (constants) or strings (variables). Temporaries are
+# named %1, %2, ... so they can never clash with a source name.
+#
+#     x = %1 + 4          Instr('PLUS', 'x', ('%1', 4))
+#     x = y               Instr('copy', 'x', ('y',))
+#     %2 = call f(x, 1)   Instr('call', '%2', ('x', 1), 'f')
+#
+# Like CodeGen, names assigned in a function are its locals and every
+# other name is a global. Globals live in memory; main only has globals.
+
+from .ast1 import *
+from .regalloc import collect_assigned
+from .trace import get_tracer
+
+BINARY_OPS = ('PLUS', 'MINUS', 'MUL', 'DIV', 'GT', 'LT', 'EQEQ')
+PURE_OPS = ('copy', 'PLUS', 'MINUS', 'MUL', 'GT', 'LT', 'EQEQ')  # DIV can trap
+SYMBOLS = {'PLUS': '+', 'MINUS': '-', 'MUL': '*', 'DIV': '/', 'GT': '>', 'LT': '<', 'EQEQ': '=='}
+
+# Branch conditions and their negations
+CONDITIONS = {'GT': 'LE', 'LT': 'GE', 'EQEQ': 'NE', 'LE': 'GT', 'GE': 'LT', 'NE': 'EQEQ'}
+CONDITION_SYMBOLS = {'GT': '>', 'LT': '<', 'EQEQ': '==', 'LE': '<=', 'GE': '>=', 'NE': '!='}
+
+
+def is_temp(operand):
+    return isinstance(operand, str) and operand.startswith('%')
+
+
+class Instr:
+    __slots__ = ('op', 'dest', 'args', 'target')
+
+    def __init__(self, op, dest, args, target=None):
+        self.op = op
+        self.dest = dest  # Name written, or None
+        self.args = args  # Tuple of operands
+        self.target = target  # Callee name for 'call'
+
+    def uses(self):
+        return [arg for arg in self.args if isinstance(arg, str)]
+
+    def __repr__(self):
+        if self.op == 'call':
+            text = f"call {self.target}({', '.join(map(str, self.args))})"
+        elif self.op == 'copy':
+            text = str(self.args[0])
+        else:
+            text = f"{self.args[0]} {SYMBOLS[self.op]} {self.args[1]}"
+        return text if self.dest is None else f"{self.dest} = {text}"
+
+
+class Jump:
+    __slots__ = ('target',)
+    args = ()
+
+    def __init__(self, target):
+        self.target = target
+
+    def uses(self):
+        return []
+
+    def successors(self):
+        return [self.target]
+
+    def __repr__(self):
+        return f"jump {self.target.label}"
+
+
+class Branch:
+    __slots__ = ('op', 'args', 'true', 'false')
+
+    def __init__(self, op, args, true, false):
+        self.op = op  # One of CONDITIONS
+        self.args = args
+        self.true = true
+        self.false = false
+
+    def uses(self):
+        return [arg for arg in self.args if isinstance(arg, str)]
+
+    def successors(self):
+        return [self.true, self.false]
+
+    def __repr__(self):
+        left, right = self.args
+        return f"if {left} {CONDITION_SYMBOLS[self.op]} {right} goto {self.true.label} else {self.false.label}"
+
+
+class Ret:
+    __slots__ = ('args',)
+
+    def __init__(self, value):
+        self.args = () if value is None else (value,)
+
+    def uses(self):
+        return [arg for arg in self.args if isinstance(arg, str)]
+
+    def successors(self):
+        return []
+
+    def __repr__(self):
+        return f"return {self.args[0]}" if self.args else "return"
+
+
+class BasicBlock:
+    def __init__(self, label, depth=0):
+        self.label = label
+        self.depth = depth  # Loop nesting depth, for register allocation
+        self.instructions = []
+        self.terminator = None
+        self.preds = []
+        self.succs = []
+
+    def __repr__(self):
+        return f"<block {self.label}, {len(self.instructions)} instructions>"
+
+
+class IRFunction:
+    def __init__(self, name, params, local_names):
+        self.name = name
+        self.params = list(params)
+        self.locals = set(local_names)  # Everything else is a global
+        self.blocks = []
+
+    @property
+    def entry(self):
+        return self.blocks[0]
+
+    def build_cfg(self):
+        # Link blocks through their terminators and drop unreachable ones
+        reachable = set()
+        stack = [self.entry]
+        while stack:
+            block = stack.pop()
+            if block in reachable:
+                continue
+            reachable.add(block)
+            stack.extend(block.terminator.successors())
+        self.blocks = [block for block in self.blocks if block in reachable]
+        for block in self.blocks:
+            block.preds = []
+        for block in self.blocks:
+            block.succs = block.terminator.successors()
+            for succ in block.succs:
+                succ.preds.append(block)
+
+
+class IRProgram:
+    def __init__(self):
+        self.functions = []  # main first
+        self.globals = []  # Names that need a memory slot, in first-seen order
+
+    def __iter__(self):
+        return iter(self.functions)
+
+
+class Lowering:
+    """Lowers an AST to an IRProgram."""
+
+    def __init__(self, tracer=None):
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.label_count = 0
+
+    def lower(self, tree):
+        self.program = IRProgram()
+        self.function = None
+        self.block = None
+        self.depth = 0
+        self.temp_count = 0
+        self.lower_function('main', [], tree, set())
+        # Functions are added as they finish, so main comes out last
+        self.program.functions.insert(0, self.program.functions.pop())
+        return self.program
+
+    def new_block(self, name):
+        self.label_count += 1
+        return BasicBlock(f".{name}{self.label_count}", self.depth)
+
+    def new_temp(self):
+        self.temp_count += 1
+        return f"%{self.temp_count}"
+
+    def lower_function(self, name, params, body, local_names):
+        outer = (self.function, self.block, self.depth, self.temp_count)
+        self.function = IRFunction(name, params, local_names)
+        self.depth = 0
+        self.temp_count = 0
+        self.block = self.new_block(name + '_entry')
+        self.function.blocks.append(self.block)
+        self.statement(body)
+        # Falling off the end returns None; main exits with 0
+        self.finish(Ret(0 if name == 'main' else None))
+        self.function.build_cfg()
+        self.program.functions.append(self.function)
+        if self.tracer is not None:
+            self.tracer.emit('ir', 'function', name=name, blocks=len(self.function.blocks))
+        self.function, self.block, self.depth, self.temp_count = outer
+
+    def start(self, block):
+        self.function.blocks.append(block)
+        self.block = block
+
+    def finish(self, terminator):
+        self.block.terminator = terminator
+
+    def add(self, instr):
+        self.block.instructions.append(instr)
+        if instr.dest is not None:
+            self.note_name(instr.dest)
+
+    def note_name(self, name):
+        if not is_temp(name) and name not in self.function.locals and name not in self.program.globals:
+            self.program.globals.append(name)
+
+    # Statements
+
+    def statement(self, node):
+        if isinstance(node, Block):
+            for stmt in node.body:
+                self.statement(stmt)
+
+        elif isinstance(node, FunctionDef):
+            local_names = set(node.params)
+            collect_assigned(node.body, local_names)
+            self.lower_function(node.name, node.params, node.body, local_names)
+
+        elif isinstance(node, Assign):
+            self.expression(node.value, node.target)
+
+        elif isinstance(node, Return):
+            self.finish(Ret(self.expression(node.value)))
+            self.start(self.new_block('dead'))  # Anything after it is unreachable
+
+        elif isinstance(node, If):
+            body = self.new_block('then')
+            end = self.new_block('endif')
+            self.branch(node.condition, body, end)
+            self.start(body)
+            self.statement(node.body)
+            self.finish(Jump(end))
+            self.start(end)
+
+        elif isinstance(node, While):
+            self.depth += 1
+            header = self.new_block('while')
+            body = self.new_block('do')
+            self.depth -= 1
+            end = self.new_block('endwhile')
+            self.finish(Jump(header))
+            self.start(header)
+            self.branch(node.condition, body, end)
+            self.depth += 1
+            self.start(body)
+            self.statement(node.body)
+            self.finish(Jump(header))
+            self.depth -= 1
+            self.start(end)
+
+        elif isinstance(node, For):
+            self.lower_for(node)
+
+        else:
+            self.expression(node)  # Expression statement; only calls matter
+
+    def lower_for(self, node):
+        # Only counted loops over range() have a machine-level meaning:
+        #
+        #     %i = start; %stop = stop
+        #   header: if %i < %stop goto body else end     (> for a negative step)
+        #   body:   var = %i; <body>; %i = %i + step; jump header
+        #
+        # The hidden counter keeps the loop variable's last value after the
+        # loop, and assignments to it in the body don't change the trip count.
+        iterable = node.iterable
+        if not (isinstance(iterable, FunctionCall) and iterable.name == 'range'):
+            raise Exception("For loops can only be compiled over range()")
+        args = iterable.args
+        if not 1 <= len(args) <= 3:
+            raise Exception(f"range() expects 1 to 3 arguments, got {len(args)}")
+        step = 1
+        if len(args) == 3:
+            step = constant_value(args[2])
+            if step is None:
+                raise Exception("range() step must be a constant in compiled code")
+            if step == 0:
+                raise Exception("range() arg 3 must not be zero")
+        start = self.expression(args[0]) if len(args) > 1 else 0
+        stop = self.expression(args[-1] if len(args) < 3 else args[1])
+
+        counter = self.new_temp()
+        self.add(Instr('copy', counter, (start,)))
+        if isinstance(stop, str):
+            limit = self.new_temp()
+            self.add(Instr('copy', limit, (stop,)))  # range() evaluates stop once
+            stop = limit
+
+        self.depth += 1
+        header = self.new_block('for')
+        body = self.new_block('loop')
+        self.depth -= 1
+        end = self.new_block('endfor')
+        self.finish(Jump(header))
+        self.start(header)
+        self.finish(Branch('LT' if step > 0 else 'GT', (counter, stop), body, end))
+        self.depth += 1
+        self.start(body)
+        self.add(Instr('copy', node.var.name, (counter,)))
+        self.statement(node.body)
+        self.add(Instr('PLUS', counter, (counter, step)))
+        self.finish(Jump(header))
+        self.depth -= 1
+        self.start(end)
+
+    def branch(self, condition, true, false):
+        if isinstance(condition, BinOp) and condition.op in CONDITIONS:
+            args = (self.expression(condition.left), self.expression(condition.right))
+            self.finish(Branch(condition.op, args, true, false))
+        else:
+            self.finish(Branch('NE', (self.expression(condition), 0), true, false))
+
+    # Expressions
+
+    def expression(self, node, dest=None):
+        """Lower `node`; the value ends up in `dest` if given. Returns the operand holding it."""
+        if isinstance(node, Num):
+            value = int(node.value)  # Folded comparisons are bools
+            if dest is None:
+                return value
+            self.add(Instr('copy', dest, (value,)))
+            return dest
+
+        if isinstance(node, Var):
+            self.note_name(node.name)
+            if dest is None:
+                return node.name
+            self.add(Instr('copy', dest, (node.name,)))
+            return dest
+
+        if isinstance(node, BinOp):
+            if node.op not in BINARY_OPS:
+                raise Exception(f"Unknown operator: {node.op}")
+            args = (self.expression(node.left), self.expression(node.right))
+            dest = dest or self.new_temp()
+            self.add(Instr(node.op, dest, args))
+            return dest
+
+        if isinstance(node, FunctionCall):
+            args = tuple(self.expression(arg) for arg in node.args)
+            if dest is None and node.name != 'print':
+                dest = self.new_temp()
+            self.add(Instr('call', dest, args, node.name))
+            return dest if dest is not None else 0
+
+        raise Exception(f"Unknown node type: {type(node)}")
+
+
+def constant_value(node):
+    # Value of a constant expression such as `0 - 1`, or None
+    if isinstance(node, Num):
+        return int(node.value)
+    if isinstance(node, BinOp) and node.op in ('PLUS', 'MINUS', 'MUL'):
+        left = constant_value(node.left)
+        right = constant_value(node.right)
+        if left is not None and right is not None:
+            return {'PLUS': left + right, 'MINUS': left - right, 'MUL': left * right}[node.op]
+    return None
+
+
+def format_ir(program):
+    lines = []
+    for function in program:
+        lines.append(f"function {function.name}({', '.join(function.params)}):")
+        for block in function.blocks:
+            lines.append(f"{block.label}:")
+            for instr in block.instructions:
+                lines.append(f"    {instr!r}")
+            lines.append(f"    {block.terminator!r}")
+    return "\n".join(lines)
@@ -1,5 +1,7 @@
 import re
 
+from .trace import get_tracer
+
 TOKEN_TYPES = {
     'STRING': 'STRING',
     'NUMBER': 'NUMBER',
@@ -37,12 +39,15 @@ TOKEN_TYPES = {
 }
 
 class Lexer:
-    def __init__(self, text):
+    def __init__(self, text, tracer=None):
         self.text = text
+        self.tracer = tracer if tracer is not None else get_tracer()
         self.pos = 0
         self.current_char = self.text[self.pos]
         self.line = 1
         self.indent_level = 0  # Track the current level of indentation
+        self.indent_stack = [0]  # Open indentation levels, innermost last
+        self.pending_tokens = []  # INDENT/DEDENT tokens waiting to be returned
 
     def error(self, message):
         raise Exception(f"Lexer Error: {message}")
@@ -60,22 +65,38 @@ class Lexer:
                 break
             self.advance()
 
+    def __iter__(self):
+        # Stream tokens lazily; the EOF token is the last one produced
+        while True:
+            token = self.get_next_token()
+            yield token
+            if token.type == TOKEN_TYPES['EOF']:
+                return
+
     def get_next_token(self):
+        token = self.scan_token()
+        if self.tracer is not None:
+            self.tracer.emit('lex', 'token', type=token.type, value=token.value, line=token.line)
+        return token
+
+    def scan_token(self):
+        if self.pending_tokens:
+            return self.pending_tokens.pop(0)
+
         self.skip_whitespace()
 
         if self.current_char is None:
             # Finalize tokens by generating all remaining DEDENT tokens
             if not hasattr(self, 'finalized_tokens'):
                 self.finalized_tokens = []
-                while self.indent_level > 0:
-                    self.indent_level -= 1
+                while len(self.indent_stack) > 1:
+                    self.indent_stack.pop()
+                    self.indent_level = self.indent_stack[-1]
                     dedent_token = Token(TOKEN_TYPES['DEDENT'], None, self.line)
-                    print(f"Generated DEDENT Token: {dedent_token}")  # Debugging
                     self.finalized_tokens.append(dedent_token)
 
                 # Generate EOF token
                 eof_token = Token(TOKEN_TYPES['EOF'], None, self.line)
-                print(f"Generated EOF Token: {eof_token}")  # Debugging
                 self.finalized_tokens.append(eof_token)
 
             # Return tokens from the finalized list
@@ -87,12 +108,14 @@ class Lexer:
             self.advance()
             self.line += 1
             newline_token = Token(TOKEN_TYPES['NEWLINE'], '\n', self.line)
-            print(f"Generated NEWLINE Token: {newline_token}")  # Debugging
             # Check for indentation changes
             current_indent = self.get_indent_level()
+            if self.current_char == '\n':
+                return newline_token  # Blank lines don't change indentation
             indent_dedent_tokens = self.handle_indentation(current_indent)
             if indent_dedent_tokens:
-                return indent_dedent_tokens.pop(0)  # Return the first token
+                self.pending_tokens = indent_dedent_tokens
+                return self.pending_tokens.pop(0)  # Return the first token
             return newline_token
 
         # Handle '=' and '=='
@@ -221,29 +244,33 @@ class Lexer:
         while self.current_char == ' ':
             count += 1
             self.advance()
-        print(f"Current Indent Level: {count}, Previous Indent Level: {self.indent_level}")  # Debugging
+        if self.tracer is not None:
+            self.tracer.emit('lex', 'indent_level', line=self.line, level=count, previous=self.indent_level)
         return count
 
     def handle_indentation(self, current_indent):
         tokens = []
         if current_indent > self.indent_level:
+            self.indent_stack.append(current_indent)
             self.indent_level = current_indent
             indent_token = Token(TOKEN_TYPES['INDENT'], None, self.line)
-            print(f"Generated INDENT Token: {indent_token}")  # Debugging
             tokens.append(indent_token)
         elif current_indent < self.indent_level:
             while self.indent_level > current_indent:
-                self.indent_level -= 1
+                self.indent_stack.pop()
+                self.indent_level = self.indent_stack[-1]
                 dedent_token = Token(TOKEN_TYPES['DEDENT'], None, self.line)
-                print(f"Generated DEDENT Token: {dedent_token}")  # Debugging
                 tokens.append(dedent_token)
+            if self.indent_level != current_indent:
+                self.error(f"Unindent does not match any outer indentation level on line {self.line}")
         return tokens
 
 class Token:
-    def __init__(self, type_, value, line):
+    def __init__(self, type_, value, line, column=None):
         self.type = type_
         self.value = value
         self.line = line
+        self.column = column  # 0-based; only set by sources that track it
 
     def __repr__(self):
         return f"Token({self.type}, {repr(self.value)}, {self.line})"
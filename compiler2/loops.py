@@ -0,0 +1,330 @@
+# compiler/loops.py
+#
+# Tree-to-tree loop optimizer for For loops over range() with a constant
+# step, run after Optimizer:
+#
+#   - invariant code motion: a BinOp whose operands can't change while the
+#     loop runs is computed once, into a fresh name, before the loop;
+#   - strength reduction: `i * k` (k a number or invariant name) becomes
+#     an induction variable set to start * k before the loop and increased
+#     by step * k at the end of every iteration.
+#
+#     loops = LoopOptimizer()
+#     ast = loops.optimize(Optimizer().optimize(ast))
+#
+# "Can't change" means every name the expression reads is neither the
+# loop variable nor assigned anywhere in the body; calls can't change it,
+# since a call never writes its caller's locals and only top-level code
+# writes globals. Outer loops are done first, so an expression moves out
+# of as many loops as it can. Nested functions are left to their own loops.
+#
+# A name may hold a function or a range, which arithmetic raises on, so
+# moving an expression must not make it run when it wouldn't have:
+#   - the code before the loop sits under `if start < stop:` (> for a
+#     negative step), with range() arguments other than names and numbers
+#     evaluated into fresh names first, so it only runs if the loop does;
+#   - expressions are only taken from the part of the body every iteration
+#     runs: not from inside an If, While or inner For, and not after a
+#     statement that may end the iteration (a return, or any statement
+#     with a value). Elsewhere only `i * <number>` is reduced.
+# Only operators without a zero-divisor case are moved. One that still
+# raises (on a function, say) does so before the first iteration instead
+# of partway through it, possibly ahead of another error.
+#
+# The fresh names are ordinary variables (globals at the top level). The
+# input tree is never modified, each pass can be switched off, and `stats`
+# counts what each did. A loop with an induction variable reads a value
+# carried between iterations, so LoopVectorizer no longer takes it.
+
+from .ast1 import *
+from .inliner import collect_names, copy_leaf, substitute
+from .ir import constant_value
+from .optimizer import SIDE_EFFECT_FREE_OPS, assigned_names
+
+
+class LoopOptimizer:
+    def __init__(self, hoist=True, reduce=True):
+        self.hoist = hoist
+        self.reduce = reduce
+        self.stats = {
+            'invariants_hoisted': 0,
+            'induction_variables': 0,
+        }
+
+    def optimize(self, tree):
+        self.taken = set()
+        collect_names(tree, self.taken, {}, set())
+        self.counter = 0
+        return Block(self.statements(tree.body))
+
+    def fresh(self, name):
+        while True:
+            self.counter += 1
+            fresh = f"{name}{self.counter}"
+            if fresh not in self.taken:
+                self.taken.add(fresh)
+                return fresh
+
+    # Statements
+
+    def statements(self, statements):
+        result = []
+        for stmt in statements:
+            result.extend(self.statement(stmt))
+        return result
+
+    def statement(self, node):
+        if isinstance(node, For):
+            return self.loop(node)
+        if isinstance(node, If):
+            return [If(substitute(node.condition, {}), Block(self.statements(node.body.body)))]
+        if isinstance(node, While):
+            return [While(substitute(node.condition, {}), Block(self.statements(node.body.body)))]
+        if isinstance(node, FunctionDef):
+            return [FunctionDef(node.name, list(node.params), Block(self.statements(node.body.body)))]
+        if isinstance(node, Assign):
+            return [Assign(node.target, substitute(node.value, {}))]
+        if isinstance(node, Return):
+            return [Return(substitute(node.value, {}))]
+        return [substitute(node, {})]
+
+    def loop(self, node):
+        var = node.var.name
+        counted = counted_range(node)
+        if counted is None:
+            # Nothing can be hoisted without knowing the loop runs
+            return [For(Var(var), substitute(node.iterable, {}), Block(self.statements(node.body.body)))]
+        args, step = counted
+        assigned = assigned_names(node.body) | {var}
+        prefix = []  # Non-leaf range() arguments, evaluated once into fresh names
+        args = [arg if isinstance(arg, (Num, Var)) or index == 2 else self.bind(arg, prefix)
+                for index, arg in enumerate(args)]
+        start = args[0] if len(args) > 1 else Num(0)
+        stop = args[1] if len(args) > 1 else args[0]
+        hoisted = []  # Statements that now run once, before the loop
+        increments = []  # Statements added to the end of the body
+        body = node.body
+
+        if self.hoist:
+            invariants = {}  # expression key -> fresh name
+            body = rewrite_body(
+                body,
+                lambda expr: self.hoist_invariants(expr, assigned, invariants, hoisted),
+                lambda expr: substitute(expr, {}),
+            )
+
+        if self.reduce and var not in assigned_names(node.body):
+            inductions = {}  # factor key -> fresh name
+
+            def reduce(numbers_only):
+                return lambda expr: self.reduce_products(
+                    expr, var, assigned, (start, step), inductions, hoisted, increments, numbers_only)
+            body = rewrite_body(body, reduce(False), reduce(True))
+
+        # Inner loops see what is left
+        body = Block(self.statements(body.body) + increments)
+        if not hoisted:
+            return [For(Var(var), substitute(node.iterable, {}), body)]
+        # The hoisted code only runs if the loop will, since names can hold
+        # values (a function, a range) that arithmetic raises on
+        guard = BinOp(substitute(start, {}), 'LT' if step > 0 else 'GT', substitute(stop, {}))
+        iterable = FunctionCall('range', [substitute(arg, {}) for arg in args])
+        return prefix + [If(guard, Block(hoisted)), For(Var(var), iterable, body)]
+
+    def bind(self, node, prefix):
+        name = self.fresh('range')
+        prefix.append(Assign(name, substitute(node, {})))
+        return Var(name)
+
+    # Expressions
+
+    def hoist_invariants(self, node, assigned, invariants, hoisted):
+        if isinstance(node, BinOp):
+            if is_invariant(node, assigned):
+                key = expression_key(node)
+                name = invariants.get(key)
+                if name is None:
+                    name = invariants[key] = self.fresh('inv')
+                    hoisted.append(Assign(name, substitute(node, {})))
+                    self.stats['invariants_hoisted'] += 1
+                return Var(name)
+            return BinOp(self.hoist_invariants(node.left, assigned, invariants, hoisted), node.op,
+                         self.hoist_invariants(node.right, assigned, invariants, hoisted))
+        if isinstance(node, FunctionCall):
+            return FunctionCall(node.name, [self.hoist_invariants(arg, assigned, invariants, hoisted)
+                                            for arg in node.args])
+        return copy_leaf(node)
+
+    def reduce_products(self, node, var, assigned, bounds, inductions, hoisted, increments, numbers_only):
+        if isinstance(node, BinOp):
+            factor = induction_factor(node, var, assigned)
+            if numbers_only and not isinstance(factor, Num):
+                factor = None
+            if factor is not None:
+                key = expression_key(factor)
+                name = inductions.get(key)
+                if name is None:
+                    name = inductions[key] = self.induction(factor, var, bounds, hoisted, increments)
+                return Var(name)
+            return BinOp(
+                self.reduce_products(node.left, var, assigned, bounds, inductions, hoisted, increments, numbers_only),
+                node.op,
+                self.reduce_products(node.right, var, assigned, bounds, inductions, hoisted, increments, numbers_only),
+            )
+        if isinstance(node, FunctionCall):
+            return FunctionCall(node.name, [
+                self.reduce_products(arg, var, assigned, bounds, inductions, hoisted, increments, numbers_only)
+                for arg in node.args
+            ])
+        return copy_leaf(node)
+
+    def induction(self, factor, var, bounds, hoisted, increments):
+        # name = start * factor before the loop, name += step * factor after
+        # every iteration, so name == var * factor wherever the body reads it
+        start, step = bounds
+        name = self.fresh(f"{var}_times")
+        if isinstance(start, Num) and isinstance(factor, Num):
+            initial = Num(start.value * factor.value)
+        else:
+            initial = BinOp(substitute(start, {}), 'MUL', substitute(factor, {}))
+        hoisted.append(Assign(name, initial))
+        if isinstance(factor, Num):
+            stride = Num(step * factor.value)
+        elif step == 1:
+            stride = Var(factor.name)
+        else:
+            stride = Var(self.fresh(f"{var}_stride"))
+            hoisted.append(Assign(stride.name, BinOp(Var(factor.name), 'MUL', Num(step))))
+        increments.append(Assign(name, BinOp(Var(name), 'PLUS', stride)))
+        self.stats['induction_variables'] += 1
+        return name
+
+
+def counted_range(node):
+    # (range() arguments, step) of a For over range() with a constant step
+    iterable = node.iterable
+    if not (isinstance(iterable, FunctionCall) and iterable.name == 'range' and 1 <= len(iterable.args) <= 3):
+        return None
+    args = iterable.args
+    step = 1
+    if len(args) == 3:
+        step = constant_value(args[2])
+        if not step:
+            return None
+    return args, step
+
+
+def induction_factor(node, var, assigned):
+    # k for `var * k` or `k * var`, with k a number or a name the loop
+    # doesn't assign
+    if node.op != 'MUL':
+        return None
+    for this, other in ((node.left, node.right), (node.right, node.left)):
+        if isinstance(this, Var) and this.name == var:
+            if isinstance(other, Num) and type(other.value) is int:
+                return other
+            if isinstance(other, Var) and other.name not in assigned:
+                return other
+    return None
+
+
+def is_invariant(node, assigned):
+    # Side-effect-free arithmetic over numbers and unassigned names, reading
+    # at least one name (constants are Optimizer's job)
+    reads = False
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, BinOp):
+            if node.op not in SIDE_EFFECT_FREE_OPS:
+                return False
+            work.extend((node.left, node.right))
+        elif isinstance(node, Var):
+            if node.name in assigned:
+                return False
+            reads = True
+        elif not isinstance(node, Num):
+            return False
+    return reads
+
+
+def expression_key(node):
+    # Hashable structure of an expression, so repeats share one name
+    if isinstance(node, Num):
+        return ('Num', type(node.value), node.value)
+    if isinstance(node, Var):
+        return ('Var', node.name)
+    if isinstance(node, Str):
+        return ('Str', node.value)
+    if isinstance(node, BinOp):
+        return (node.op, expression_key(node.left), expression_key(node.right))
+    return ('Call', node.name, tuple(expression_key(arg) for arg in node.args))
+
+
+def rewrite_body(block, always, sometimes):
+    # Copy of a loop body. Expressions evaluated on every iteration, before
+    # anything could end the iteration, go through always(); the rest
+    # (later statements, and everything inside nested blocks) through
+    # sometimes()
+    statements = []
+    every = True
+    for node in block.body:
+        rewrite = always if every else sometimes
+        if isinstance(node, Assign):
+            statements.append(Assign(node.target, rewrite(node.value)))
+        elif isinstance(node, Return):
+            statements.append(Return(rewrite(node.value)))
+        elif isinstance(node, If):
+            statements.append(If(rewrite(node.condition), rewrite_block(node.body, sometimes)))
+        elif isinstance(node, While):
+            statements.append(While(rewrite(node.condition), rewrite_block(node.body, sometimes)))
+        elif isinstance(node, For):
+            statements.append(For(Var(node.var.name), rewrite(node.iterable), rewrite_block(node.body, sometimes)))
+        elif isinstance(node, FunctionDef):
+            statements.append(FunctionDef(node.name, list(node.params), rewrite_block(node.body, lambda expr: substitute(expr, {}))))
+        else:
+            statements.append(rewrite(node))
+        if may_exit(node):
+            every = False
+    return Block(statements)
+
+
+def may_exit(node):
+    # True if the statement may end the iteration early: a return, or any
+    # other statement with a value, which ends the enclosing Block
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Block):
+            work.extend(node.body)
+        elif isinstance(node, (If, While, For)):
+            work.append(node.body)
+        elif isinstance(node, Return):
+            return True
+        elif isinstance(node, (BinOp, Num, Var, Str)):
+            return True
+        elif isinstance(node, FunctionCall) and node.name != 'print':
+            return True
+    return False
+
+
+def rewrite_block(block, rewrite):
+    # Copy of a loop body with rewrite() applied to every expression in
+    # it, inner loops included; nested functions are copied unchanged
+    statements = []
+    for node in block.body:
+        if isinstance(node, Assign):
+            statements.append(Assign(node.target, rewrite(node.value)))
+        elif isinstance(node, Return):
+            statements.append(Return(rewrite(node.value)))
+        elif isinstance(node, If):
+            statements.append(If(rewrite(node.condition), rewrite_block(node.body, rewrite)))
+        elif isinstance(node, While):
+            statements.append(While(rewrite(node.condition), rewrite_block(node.body, rewrite)))
+        elif isinstance(node, For):
+            statements.append(For(Var(node.var.name), rewrite(node.iterable), rewrite_block(node.body, rewrite)))
+        elif isinstance(node, FunctionDef):
+            statements.append(FunctionDef(node.name, list(node.params), rewrite_block(node.body, lambda expr: substitute(expr, {}))))
+        else:
+            statements.append(rewrite(node))
+    return Block(statements)
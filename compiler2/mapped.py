@@ -0,0 +1,183 @@
+# compiler/mapped.py
+#
+# Scanner over a source file mapped into memory.
+#
+#     with MappedScanner("big.py") as scanner:
+#         ast = Parser(scanner).parse()
+#
+# The file is never read into a str. MappedScanner walks the mmap a line at
+# a time with a bytes version of MASTER_PATTERN, and Parser pulls tokens as
+# it goes, so neither the source nor the token stream is held in full.
+# Keywords and operators are looked up by their bytes. An identifier is
+# decoded (as UTF-8) the first time it is seen, and numbers are converted
+# straight from bytes. The tokens are the ones Scanner produces for the
+# decoded text, with a 0-based `column` added. Columns count bytes, so
+# they only match TokenArray's character columns on ASCII lines.
+#
+# Pages behind the cursor are handed back to the OS as scanning moves on
+# (where madvise is available), so resident memory for the source stays
+# around RELEASE_BYTES however large the file is.
+
+import mmap
+import re
+
+from .lexer import Token, TOKEN_TYPES
+from .scanner import KEYWORDS, OPERATORS
+from .trace import get_tracer
+
+# MASTER_PATTERN over bytes: non-ASCII bytes can only be part of an
+# identifier, and are checked once the lexeme is decoded
+BYTES_PATTERN = re.compile(rb"[A-Za-z_\x80-\xff][\w\x80-\xff]*|\d+|==|>=|<=|[=><+\-*/%|&^:,()]|\S")
+
+BYTE_OPERATORS = {lexeme.encode(): token_type for lexeme, token_type in OPERATORS.items()}
+
+RELEASE_BYTES = 16 * 1024 * 1024
+
+
+class MappedScanner:
+    """Scanner that reads its source from a file through mmap."""
+
+    def __init__(self, path, tracer=None):
+        self.path = path
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.line = 1
+        self.indent_stack = [0]  # Open indentation levels, innermost last
+        self.lexemes = {}  # bytes lexeme -> (token type, token value), except numbers
+        self._stream = None
+        self._file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # An empty file can't be mapped
+            self.data = b""
+        if isinstance(self.data, mmap.mmap) and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            self.data.madvise(mmap.MADV_SEQUENTIAL)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def error(self, message):
+        raise Exception(f"Lexer Error: {message}")
+
+    def classify(self, lexeme, line, column):
+        try:
+            text = lexeme.decode('utf-8')
+        except UnicodeDecodeError:
+            self.error(f"Invalid UTF-8 on line {line}, column {column}")
+        if text[0].isalpha() or text[0] == '_':
+            info = (KEYWORDS.get(text, TOKEN_TYPES['IDENTIFIER']), text)
+        elif lexeme in BYTE_OPERATORS:
+            info = (BYTE_OPERATORS[lexeme], text)
+        else:
+            self.error(f"Unexpected character: {text} on line {line}, column {column}")
+        self.lexemes[lexeme] = info
+        return info
+
+    def __iter__(self):
+        if self.tracer is None:
+            return self.scan()
+        return self.traced(self.scan())
+
+    def traced(self, tokens):
+        tracer = self.tracer
+        for token in tokens:
+            tracer.emit('lex', 'token', type=token.type, value=token.value, line=token.line)
+            yield token
+
+    def release(self, start, end):
+        # Drop the pages wholly inside [start, end) from resident memory;
+        # they are reread from the file if ever touched again
+        start = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+        end = end // mmap.PAGESIZE * mmap.PAGESIZE
+        if end > start:
+            self.data.madvise(mmap.MADV_DONTNEED, start, end - start)
+        return max(start, end)
+
+    def scan(self):
+        data = self.data
+        size = len(data)
+        indent_stack = self.indent_stack
+        lexemes = self.lexemes
+        finditer = BYTES_PATTERN.finditer
+        can_release = isinstance(data, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED')
+        released = 0
+        NUMBER = TOKEN_TYPES['NUMBER']
+        NEWLINE = TOKEN_TYPES['NEWLINE']
+        INDENT = TOKEN_TYPES['INDENT']
+        DEDENT = TOKEN_TYPES['DEDENT']
+
+        start = 0  # Offset of the current line
+        previous = 0  # Offset of the line before it
+        line = 1
+        while True:
+            end = data.find(b'\n', start)
+            last = end == -1
+            if last:
+                end = size
+            if can_release and start - released >= RELEASE_BYTES:
+                released = self.release(released, previous)
+            self.line = line
+            first = start
+            if line > 1:
+                # Every line after the first starts right after a '\n'
+                newline_column = start - 1 - previous
+                while first < end and data[first] == 0x20:
+                    first += 1
+                if first == end and not last:
+                    # Blank lines don't change indentation
+                    yield Token(NEWLINE, '\n', line, newline_column)
+                    previous, start, line = start, end + 1, line + 1
+                    continue
+                current_indent = first - start
+                if current_indent > indent_stack[-1]:
+                    indent_stack.append(current_indent)
+                    yield Token(INDENT, None, line, current_indent)
+                elif current_indent < indent_stack[-1]:
+                    while indent_stack[-1] > current_indent:
+                        indent_stack.pop()
+                        yield Token(DEDENT, None, line, current_indent)
+                    if indent_stack[-1] != current_indent:
+                        self.error(f"Unindent does not match any outer indentation level on line {line}")
+                else:
+                    yield Token(NEWLINE, '\n', line, newline_column)
+
+            for match in finditer(data, first, end):
+                lexeme = match.group()
+                column = match.start() - start
+                if lexeme[0] < 0x3a and lexeme[0] > 0x2f:  # Starts with a digit
+                    yield Token(NUMBER, int(lexeme), line, column)
+                    continue
+                info = lexemes.get(lexeme)
+                if info is None:
+                    info = self.classify(lexeme, line, column)
+                yield Token(info[0], info[1], line, column)
+
+            if last:
+                break
+            previous, start, line = start, end + 1, line + 1
+
+        # Close every block that is still open, then finish with EOF
+        column = size - start
+        while len(indent_stack) > 1:
+            indent_stack.pop()
+            yield Token(DEDENT, None, self.line, column)
+        yield Token(TOKEN_TYPES['EOF'], None, self.line, column)
+
+    def tokenize(self):
+        return list(self)
+
+    def get_next_token(self):
+        # Same pull interface as Lexer; keeps returning EOF once exhausted
+        if self._stream is None:
+            self._stream = iter(self)
+        token = next(self._stream, None)
+        if token is None:
+            return Token(TOKEN_TYPES['EOF'], None, self.line)
+        return token
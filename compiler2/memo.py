@@ -0,0 +1,196 @@
+# compiler/memo.py
+#
+# Opt-in memoization of pure user functions.
+#
+#     purity = PurityAnalysis(ast)
+#     memo = MemoCache(purity.pure, maxsize=4096)
+#     Interpreter(parser, memo=memo).visit(ast)
+#     print(memo.stats())
+#
+# A function is pure when its result depends only on its arguments: it
+# doesn't print, doesn't read or write globals, and only calls builtins
+# without side effects or other pure functions. Recursion is fine. A local
+# counts as a global read wherever some path reaches it unassigned, since
+# Interpreter then reads the global of that name.
+
+from collections import OrderedDict
+
+from .ast1 import *
+
+MISSING = object()  # MemoCache.get() result when there is no cached value
+
+PURE_BUILTINS = ('range',)
+
+
+class PurityAnalysis:
+    def __init__(self, tree):
+        self.functions = {}  # name -> FunctionDef, for names defined exactly once
+        self.reasons = {}  # function name -> why it is not pure
+        self.pure = set()  # pure FunctionDef nodes
+
+        definitions = []
+        self.collect(tree, definitions)
+        counts = {}
+        for func in definitions:
+            counts[func.name] = counts.get(func.name, 0) + 1
+        for func in definitions:
+            if counts[func.name] == 1:
+                self.functions[func.name] = func
+            else:
+                self.reasons[func.name] = "defined more than once"
+
+        calls = {}
+        for name, func in self.functions.items():
+            local_names = set(func.params)
+            self.collect_locals(func.body, local_names)
+            called = set()
+            reason = self.check(func.body, local_names, set(func.params), called)
+            if reason is not None:
+                self.reasons[name] = reason
+            calls[name] = called
+
+        # Only calls to pure functions keep a function pure; repeat until
+        # nothing else turns impure
+        changed = True
+        while changed:
+            changed = False
+            for name, called in calls.items():
+                if name in self.reasons:
+                    continue
+                for callee in called:
+                    if callee in self.reasons or callee not in self.functions:
+                        self.reasons[name] = f"calls impure function {callee}"
+                        changed = True
+                        break
+
+        self.pure = {func for name, func in self.functions.items() if name not in self.reasons}
+
+    def is_pure(self, name):
+        return name in self.functions and name not in self.reasons
+
+    def collect(self, node, definitions):
+        if isinstance(node, FunctionDef):
+            definitions.append(node)
+        elif isinstance(node, Block):
+            for stmt in node.body:
+                self.collect(stmt, definitions)
+        elif isinstance(node, (If, While, For)):
+            self.collect(node.body, definitions)
+
+    def collect_locals(self, node, local_names):
+        if isinstance(node, Block):
+            for stmt in node.body:
+                self.collect_locals(stmt, local_names)
+        elif isinstance(node, Assign):
+            local_names.add(node.target)
+        elif isinstance(node, For):
+            local_names.add(node.var.name)
+            self.collect_locals(node.body, local_names)
+        elif isinstance(node, (If, While)):
+            self.collect_locals(node.body, local_names)
+        elif isinstance(node, FunctionDef):
+            local_names.add(node.name)
+
+    def check(self, node, local_names, assigned, called):
+        # Returns the first reason the subtree is impure, or None. `assigned`
+        # holds the locals assigned on every path so far and grows as a
+        # Block is walked; a local read before that still sees the global.
+        if isinstance(node, Block):
+            for stmt in node.body:
+                reason = self.check(stmt, local_names, assigned, called)
+                if reason is not None:
+                    return reason
+        elif isinstance(node, Var):
+            if node.name not in assigned:
+                if node.name in local_names:
+                    return f"may read global {node.name} before assigning it"
+                return f"reads global {node.name}"
+        elif isinstance(node, Assign):
+            if node.target not in local_names:
+                return f"writes global {node.target}"
+            reason = self.check(node.value, local_names, assigned, called)
+            assigned.add(node.target)
+            return reason
+        elif isinstance(node, FunctionCall):
+            if node.name == 'print':
+                return "calls print"
+            if node.name not in PURE_BUILTINS:
+                if node.name in local_names:
+                    return f"calls local function {node.name}"
+                called.add(node.name)
+            for arg in node.args:
+                reason = self.check(arg, local_names, assigned, called)
+                if reason is not None:
+                    return reason
+        elif isinstance(node, BinOp):
+            return (self.check(node.left, local_names, assigned, called)
+                    or self.check(node.right, local_names, assigned, called))
+        elif isinstance(node, (If, While)):
+            # The body may not run, so what it assigns isn't assigned after it
+            return (self.check(node.condition, local_names, assigned, called)
+                    or self.check(node.body, local_names, set(assigned), called))
+        elif isinstance(node, For):
+            return (self.check(node.iterable, local_names, assigned, called)
+                    or self.check(node.body, local_names, assigned | {node.var.name}, called))
+        elif isinstance(node, Return):
+            return self.check(node.value, local_names, assigned, called)
+        elif isinstance(node, FunctionDef):
+            return "defines a nested function"
+        return None
+
+class MemoCache:
+    """Bounded LRU cache of (function, arguments) -> result for pure functions."""
+
+    def __init__(self, pure_functions, maxsize=1024):
+        self.pure = set(pure_functions)
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = {}
+        self.misses = {}
+        self.evictions = 0
+
+    def get(self, func, args):
+        if func not in self.pure:
+            return MISSING
+        key = memo_key(func, args)
+        try:
+            result = self.entries[key]
+        except KeyError:
+            self.misses[func.name] = self.misses.get(func.name, 0) + 1
+            return MISSING
+        except TypeError:
+            return MISSING  # Unhashable argument; just run the call
+        self.entries.move_to_end(key)
+        self.hits[func.name] = self.hits.get(func.name, 0) + 1
+        return result
+
+    def store(self, func, args, result):
+        if func not in self.pure:
+            return
+        try:
+            self.entries[memo_key(func, args)] = result
+        except TypeError:
+            return
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        names = sorted(set(self.hits) | set(self.misses))
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'evictions': self.evictions,
+            'functions': {
+                name: {'hits': self.hits.get(name, 0), 'misses': self.misses.get(name, 0)}
+                for name in names
+            },
+        }
+
+
+def memo_key(func, args):
+    # Keep 1 and True apart, as ASTArena does: they hash and compare equal
+    return (func, tuple((type(arg), arg) for arg in args))
@@ -0,0 +1,219 @@
+# compiler/optimizer.py
+#
+# Tree-to-tree optimizer run between Parser.parse and the backends:
+#
+#   - constant folding: BinOp over two Num operands becomes a Num;
+#   - constant propagation: a Var read after `name = <constant>` becomes
+#     that constant, until a branch or loop may have reassigned it;
+#   - dead code elimination: If/While with a constant condition are
+#     resolved at compile time, and stores overwritten before any read
+#     (or never read before a function returns) are dropped.
+#
+# The input tree is never modified; optimize() returns a new one. Every
+# pass can be switched off, and `stats` counts what each pass did.
+#
+# Assignments inside a function always create locals, so a call can never
+# change a global behind the optimizer's back.
+
+from .ast1 import *
+
+FOLDABLE = {
+    'PLUS': lambda a, b: a + b,
+    'MINUS': lambda a, b: a - b,
+    'MUL': lambda a, b: a * b,
+    'DIV': lambda a, b: a // b,
+    'GT': lambda a, b: a > b,
+    'LT': lambda a, b: a < b,
+    'EQEQ': lambda a, b: a == b,
+}
+
+# Operators that can't raise, so an unused result can be dropped
+SIDE_EFFECT_FREE_OPS = ('PLUS', 'MINUS', 'MUL', 'GT', 'LT', 'EQEQ')
+
+
+class Optimizer:
+    def __init__(self, fold=True, propagate=True, eliminate=True):
+        self.fold = fold
+        self.propagate = propagate
+        self.eliminate = eliminate
+        self.stats = {
+            'constants_folded': 0,
+            'constants_propagated': 0,
+            'dead_branches_removed': 0,
+            'dead_stores_removed': 0,
+        }
+
+    def optimize(self, tree):
+        tree = Block(self.statements(tree.body, {}))
+        if self.eliminate:
+            tree = Block(self.remove_dead_stores(tree.body, set(), in_function=False))
+        return tree
+
+    # Folding and propagation
+
+    def statements(self, statements, env):
+        # env maps variable name -> known constant value, updated in order
+        result = []
+        for stmt in statements:
+            result.extend(self.statement(stmt, env))
+        return result
+
+    def statement(self, node, env):
+        if isinstance(node, Assign):
+            value = self.expression(node.value, env)
+            if self.propagate and isinstance(value, Num):
+                env[node.target] = value.value
+            else:
+                env.pop(node.target, None)
+            return [Assign(node.target, value)]
+
+        if isinstance(node, If):
+            condition = self.expression(node.condition, env)
+            if self.eliminate and isinstance(condition, Num):
+                self.stats['dead_branches_removed'] += 1
+                if condition.value:
+                    # Always taken: the body runs in line
+                    return self.statements(node.body.body, env)
+                return []
+            body = Block(self.statements(node.body.body, dict(env)))
+            self.forget(assigned_names(node.body), env)
+            return [If(condition, body)]
+
+        if isinstance(node, While):
+            # Anything the body assigns may differ on the next test
+            self.forget(assigned_names(node.body), env)
+            condition = self.expression(node.condition, env)
+            if self.eliminate and isinstance(condition, Num) and not condition.value:
+                self.stats['dead_branches_removed'] += 1
+                return []
+            body = Block(self.statements(node.body.body, dict(env)))
+            return [While(condition, body)]
+
+        if isinstance(node, For):
+            iterable = self.expression(node.iterable, env)
+            self.forget(assigned_names(node.body) | {node.var.name}, env)
+            body = Block(self.statements(node.body.body, dict(env)))
+            return [For(Var(node.var.name), iterable, body)]
+
+        if isinstance(node, FunctionDef):
+            env.pop(node.name, None)
+            body = Block(self.statements(node.body.body, {}))
+            return [FunctionDef(node.name, list(node.params), body)]
+
+        if isinstance(node, Return):
+            return [Return(self.expression(node.value, env))]
+
+        return [self.expression(node, env)]
+
+    def forget(self, names, env):
+        for name in names:
+            env.pop(name, None)
+
+    def expression(self, node, env):
+        if isinstance(node, Num):
+            return Num(node.value)
+
+        if isinstance(node, Str):
+            return Str(node.value)
+
+        if isinstance(node, Var):
+            if self.propagate and node.name in env:
+                self.stats['constants_propagated'] += 1
+                return Num(env[node.name])
+            return Var(node.name)
+
+        if isinstance(node, BinOp):
+            left = self.expression(node.left, env)
+            right = self.expression(node.right, env)
+            if (self.fold and isinstance(left, Num) and isinstance(right, Num)
+                    and node.op in FOLDABLE
+                    and not (node.op == 'DIV' and right.value == 0)):
+                self.stats['constants_folded'] += 1
+                return Num(FOLDABLE[node.op](left.value, right.value))
+            return BinOp(left, node.op, right)
+
+        if isinstance(node, FunctionCall):
+            return FunctionCall(node.name, [self.expression(arg, env) for arg in node.args])
+
+        raise Exception(f"Unknown node type: {type(node)}")
+
+    # Dead stores
+
+    def remove_dead_stores(self, statements, dead, in_function):
+        # Walks the block backwards. `dead` holds names that are certain to
+        # be assigned again before anything reads them.
+        dead = set(dead)
+        kept = []
+        for stmt in reversed(statements):
+            if isinstance(stmt, Assign):
+                if stmt.target in dead and is_side_effect_free(stmt.value):
+                    self.stats['dead_stores_removed'] += 1
+                    continue
+                dead.add(stmt.target)
+                dead -= read_names(stmt.value)
+                if not in_function and calls_user_function(stmt.value):
+                    dead.clear()  # The callee may read any global
+                kept.append(stmt)
+                continue
+
+            # Any other statement may read names or leave the block early
+            dead.clear()
+            if isinstance(stmt, FunctionDef):
+                locals_ = set(stmt.params) | assigned_names(stmt.body)
+                stmt = FunctionDef(stmt.name, stmt.params, Block(self.remove_dead_stores(stmt.body.body, locals_, True)))
+            elif isinstance(stmt, If):
+                stmt = If(stmt.condition, Block(self.remove_dead_stores(stmt.body.body, set(), in_function)))
+            elif isinstance(stmt, While):
+                stmt = While(stmt.condition, Block(self.remove_dead_stores(stmt.body.body, set(), in_function)))
+            elif isinstance(stmt, For):
+                stmt = For(stmt.var, stmt.iterable, Block(self.remove_dead_stores(stmt.body.body, set(), in_function)))
+            kept.append(stmt)
+        kept.reverse()
+        return kept
+
+
+def assigned_names(node):
+    # Names a statement or block may assign, not counting nested functions
+    names = set()
+    if isinstance(node, Block):
+        for stmt in node.body:
+            names |= assigned_names(stmt)
+    elif isinstance(node, Assign):
+        names.add(node.target)
+    elif isinstance(node, For):
+        names.add(node.var.name)
+        names |= assigned_names(node.body)
+    elif isinstance(node, (If, While)):
+        names |= assigned_names(node.body)
+    elif isinstance(node, FunctionDef):
+        names.add(node.name)
+    return names
+
+
+def read_names(node):
+    if isinstance(node, Var):
+        return {node.name}
+    if isinstance(node, BinOp):
+        return read_names(node.left) | read_names(node.right)
+    if isinstance(node, FunctionCall):
+        names = set()
+        for arg in node.args:
+            names |= read_names(arg)
+        return names
+    return set()
+
+
+def calls_user_function(node):
+    if isinstance(node, FunctionCall):
+        return node.name not in ('print', 'range') or any(calls_user_function(arg) for arg in node.args)
+    if isinstance(node, BinOp):
+        return calls_user_function(node.left) or calls_user_function(node.right)
+    return False
+
+
+def is_side_effect_free(node):
+    if isinstance(node, (Num, Var, Str)):
+        return True
+    if isinstance(node, BinOp):
+        return node.op in SIDE_EFFECT_FREE_OPS and is_side_effect_free(node.left) and is_side_effect_free(node.right)
+    return False
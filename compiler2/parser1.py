@@ -1,20 +1,44 @@
 # compiler/parser.py
 
+from collections import deque
+
 from .lexer import TOKEN_TYPES
 from .ast1 import *
+from .trace import get_tracer
 
 class Parser:
-    def __init__(self, tokens):
-        self.tokens = tokens
+    def __init__(self, tokens, tracer=None):
+        # Any iterable of tokens works: a list, a Lexer or a Scanner. Only the
+        # lookahead buffer is kept, so a streamed source is never held in full.
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.tokens = iter(tokens)
+        self.lookahead = deque()
         self.pos = 0
-        self.current_token = self.tokens[self.pos]
+        self.lines = {}  # Statement node -> source line, for the profiler
+        self.current_token = next(self.tokens)
+
+    def peek(self, offset=1):
+        # Token `offset` places after current_token, or None past the end
+        while len(self.lookahead) < offset:
+            token = next(self.tokens, None)
+            if token is None:
+                return None
+            self.lookahead.append(token)
+        return self.lookahead[offset - 1]
+
+    def advance(self):
+        if self.lookahead:
+            self.current_token = self.lookahead.popleft()
+        else:
+            # Past the end of the stream the last token (EOF) stays current
+            self.current_token = next(self.tokens, self.current_token)
 
     def eat(self, token_type):
-        print(f"Eating token: {self.current_token}, expecting: {token_type}")  # Debugging
+        if self.tracer is not None:
+            self.tracer.emit('parse', 'eat', token=repr(self.current_token), expected=token_type)
         if self.current_token.type == token_type:
             self.pos += 1
-            if self.pos < len(self.tokens):
-                self.current_token = self.tokens[self.pos]
+            self.advance()
         else:
             raise SyntaxError(f"Expected {token_type} but got {self.current_token.type}")
 
@@ -28,19 +52,23 @@ class Parser:
         return Block(statements)
 
     def parse_statement(self):
+        line = self.current_token.line
         if self.current_token.type == TOKEN_TYPES['DEF']:
-            return self.parse_function_definition()
+            node = self.parse_function_definition()
         elif self.current_token.type == TOKEN_TYPES['IF']:
-            return self.parse_if_statement()
+            node = self.parse_if_statement()
+        elif self.current_token.type == TOKEN_TYPES['WHILE']:
+            node = self.parse_while_statement()
         elif self.current_token.type == TOKEN_TYPES['FOR']:
-            return self.parse_for_statement()
+            node = self.parse_for_statement()
         elif self.current_token.type == TOKEN_TYPES['RETURN']:
-            return self.parse_return_statement()
+            node = self.parse_return_statement()
         else:
-            expr = self.parse_expression()
+            node = self.parse_expression()
             if self.current_token.type == TOKEN_TYPES['EQUAL']:
-                return self.parse_assignment(expr)
-            return expr
+                node = self.parse_assignment(node)
+        self.lines[node] = line
+        return node
 
     def parse_function_definition(self):
         self.eat(TOKEN_TYPES['DEF'])  # Consume 'def'
@@ -85,6 +113,13 @@ class Parser:
         body = self.parse_block()  # Ensure body is parsed as a Block
         return If(condition, body)
 
+    def parse_while_statement(self):
+        self.eat(TOKEN_TYPES['WHILE'])
+        condition = self.parse_expression()
+        self.eat(TOKEN_TYPES['COLON'])
+        body = self.parse_block()  # Ensure body is parsed as a Block
+        return While(condition, body)
+
     def parse_for_statement(self):
         self.eat(TOKEN_TYPES['FOR'])
         var = self.parse_primary()
@@ -110,19 +145,44 @@ class Parser:
         return self.parse_binary_operation()
 
     def parse_binary_operation(self, precedence=0):
-        left = self.parse_primary()
-
+        # Operator-precedence parsing with explicit stacks, so long operator
+        # chains and deeply parenthesized expressions don't recurse
+        operands = []
+        operators = []  # (op, precedence), or None for an open parenthesis
+        open_parens = 0
         while True:
-            op = self.current_token
-            op_prec = self.get_operator_precedence(op)
-            if op_prec < precedence:
+            while self.current_token.type == TOKEN_TYPES['LPAREN']:
+                self.eat(TOKEN_TYPES['LPAREN'])
+                operators.append(None)
+                open_parens += 1
+            operands.append(self.parse_primary())
+
+            while True:
+                op = self.current_token
+                if op.type == TOKEN_TYPES['RPAREN'] and open_parens:
+                    self.reduce(operands, operators, 0)
+                    operators.pop()  # The matching open parenthesis
+                    open_parens -= 1
+                    self.eat(TOKEN_TYPES['RPAREN'])
+                    continue
+                op_prec = self.get_operator_precedence(op)
+                if op_prec < (0 if open_parens else precedence):
+                    if open_parens:
+                        self.eat(TOKEN_TYPES['RPAREN'])  # Raises: unclosed parenthesis
+                    self.reduce(operands, operators, precedence)
+                    return operands[0]
                 break
 
+            # Left associative: apply whatever binds at least as tightly first
+            self.reduce(operands, operators, op_prec)
             self.eat(op.type)
-            right = self.parse_binary_operation(op_prec + 1)
-            left = BinOp(left, op.type, right)
+            operators.append((op.type, op_prec))
 
-        return left
+    def reduce(self, operands, operators, precedence):
+        while operators and operators[-1] is not None and operators[-1][1] >= precedence:
+            op, _ = operators.pop()
+            right = operands.pop()
+            operands[-1] = BinOp(operands[-1], op, right)
 
     def get_operator_precedence(self, token):
         if token.type in (TOKEN_TYPES['PLUS'], TOKEN_TYPES['MINUS']):
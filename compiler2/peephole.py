@@ -0,0 +1,177 @@
+# compiler/peephole.py
+#
+# Peephole optimizer over CodeGen.asm_code.
+#
+#     peephole = PeepholeOptimizer()
+#     asm_code = peephole.optimize(codegen.asm_code)
+#     print(peephole.stats)  # rule name -> instructions removed
+#
+# Each rule in RULES is (name, window size, function). The function gets
+# a window of consecutive instructions as (op, operands) tuples and returns
+# the replacement list, or None when it doesn't apply. Windows never span
+# a label or directive, since a label may be jumped to from elsewhere.
+# The pass repeats until no rule fires.
+
+import re
+
+JUMPS = ('jmp', 'je', 'jne', 'jg', 'jge', 'jl', 'jle', 'ja', 'jae', 'jb', 'jbe', 'jz', 'jnz', 'js', 'jns')
+FLAG_READERS = JUMPS[1:] + ('setg', 'setl', 'sete', 'setne', 'setge', 'setle', 'adc', 'sbb', 'cmovg', 'cmovl', 'cmove')
+
+REGISTER_NAMES = {
+    'eax': ('eax', 'ax', 'al', 'ah'),
+    'ebx': ('ebx', 'bx', 'bl', 'bh'),
+    'ecx': ('ecx', 'cx', 'cl', 'ch'),
+    'edx': ('edx', 'dx', 'dl', 'dh'),
+    'esi': ('esi', 'si'),
+    'edi': ('edi', 'di'),
+    'ebp': ('ebp', 'bp'),
+    'esp': ('esp', 'sp'),
+}
+
+
+def parse(line):
+    # (op, operands) for an instruction line, None for labels and directives
+    if not line.startswith("    "):
+        return None
+    op, _, rest = line.strip().partition(" ")
+    operands = tuple(part.strip() for part in rest.split(",")) if rest else ()
+    return (op, operands)
+
+
+def format_instruction(instruction):
+    op, operands = instruction
+    if operands:
+        return f"    {op} {', '.join(operands)}"
+    return f"    {op}"
+
+
+def is_register(operand):
+    return operand in REGISTER_NAMES
+
+
+def is_immediate(operand):
+    return operand.lstrip('-').isdigit()
+
+
+def mentions(operand, register):
+    return any(re.search(rf"\b{name}\b", operand) for name in REGISTER_NAMES[register])
+
+
+# Rules
+
+def push_pop(window):
+    # push X; pop Y  ->  mov Y, X
+    (op1, operands1), (op2, operands2) = window
+    if op1 != 'push' or op2 != 'pop':
+        return None
+    source, target = operands1[0], operands2[0]
+    if mentions(source, 'esp') or mentions(target, 'esp'):
+        return None
+    if source == target:
+        return []
+    if not is_register(target) and not is_register(source):
+        return None  # No memory-to-memory mov
+    return [('mov', (target, source))]
+
+
+def redundant_mov(window):
+    # mov R, X; mov R, Y  ->  mov R, Y  when Y doesn't read R
+    (op1, operands1), (op2, operands2) = window
+    if op1 != 'mov' or op2 != 'mov':
+        return None
+    target = operands1[0]
+    if not is_register(target) or operands2[0] != target or mentions(operands2[1], target):
+        return None
+    return [window[1]]
+
+
+def store_reload(window):
+    # mov A, B; mov B, A  ->  mov A, B
+    (op1, operands1), (op2, operands2) = window
+    if op1 != 'mov' or op2 != 'mov' or operands1 != operands2[::-1]:
+        return None
+    a, b = operands1
+    if (is_register(a) and mentions(b, a)) or (is_register(b) and mentions(a, b)):
+        return None  # The first mov changed the address
+    return [window[0]]
+
+
+def mov_imul(window):
+    # mov R, S; imul R, R, N  ->  imul R, S, N
+    (op1, operands1), (op2, operands2) = window
+    if op1 != 'mov' or op2 != 'imul' or len(operands2) != 3:
+        return None
+    target, source = operands1
+    if not is_register(target) or operands2[:2] != (target, target) or is_immediate(source):
+        return None
+    return [('imul', (target, source, operands2[2]))]
+
+
+def self_mov(window):
+    # mov R, R
+    op, operands = window[0]
+    if op == 'mov' and operands[0] == operands[1]:
+        return []
+    return None
+
+
+def zero_adjust(window):
+    # add X, 0 / sub X, 0, unless the next instruction reads the flags
+    (op, operands), (next_op, _) = window
+    if op in ('add', 'sub') and operands[1] == '0' and next_op not in FLAG_READERS:
+        return [window[1]]
+    return None
+
+
+def unreachable(window):
+    # Nothing after ret or jmp runs until the next label
+    if window[0][0] in ('ret', 'jmp'):
+        return [window[0]]
+    return None
+
+
+RULES = [
+    ('push_pop', 2, push_pop),
+    ('redundant_mov', 2, redundant_mov),
+    ('store_reload', 2, store_reload),
+    ('mov_imul', 2, mov_imul),
+    ('self_mov', 1, self_mov),
+    ('zero_adjust', 2, zero_adjust),
+    ('unreachable', 2, unreachable),
+]
+
+
+class PeepholeOptimizer:
+    def __init__(self, rules=None):
+        self.rules = list(RULES if rules is None else rules)
+        self.stats = {name: 0 for name, _, _ in self.rules}
+        self.passes = 0
+
+    def optimize(self, asm_code):
+        # Instructions as (op, operands); labels and directives stay strings
+        code = [parse(line) or line for line in asm_code]
+        changed = True
+        while changed:
+            self.passes += 1
+            changed = self.run_pass(code)
+        return [line if isinstance(line, str) else format_instruction(line) for line in code]
+
+    def run_pass(self, code):
+        changed = False
+        i = 0
+        while i < len(code):
+            for name, size, rule in self.rules:
+                window = code[i:i + size]
+                if len(window) < size or any(isinstance(line, str) for line in window):
+                    continue
+                replacement = rule(window)
+                if replacement is None:
+                    continue
+                code[i:i + size] = replacement
+                self.stats[name] += size - len(replacement)
+                changed = True
+                i = max(i - 1, 0)  # The previous instruction may match now
+                break
+            else:
+                i += 1
+        return changed
@@ -0,0 +1,49 @@
+# compiler/pipeline.py
+#
+# The compiler from tokens to final x86 assembly, as batch and CompileCache
+# run it:
+#
+#     asm_code = compile_source(source, optimize=True, use_ir=False)
+#
+# With optimize, the tree goes through Inliner -> Optimizer -> LoopOptimizer
+# first and the assembly through PeepholeOptimizer last. CodeGen generates
+# straight from the tree by default. With use_ir the tree is lowered to the
+# IR, optimized there and emitted by X86Emitter instead, which usually
+# takes longer to compile (up to about twice as long), so it is opt-in.
+
+from .dataflow import IROptimizer
+from .emitter import X86Emitter
+from .generator import CodeGen
+from .inliner import Inliner
+from .ir import Lowering
+from .loops import LoopOptimizer
+from .optimizer import Optimizer
+from .parser1 import Parser
+from .peephole import PeepholeOptimizer
+from .scanner import Scanner
+
+
+def compile_source(source, optimize=True, use_ir=False):
+    return compile_tokens(Scanner(source), optimize, use_ir)
+
+
+def compile_tokens(tokens, optimize=True, use_ir=False):
+    return compile_ast(Parser(tokens).parse(), optimize, use_ir)
+
+
+def compile_ast(ast, optimize=True, use_ir=False):
+    # Every pass returns a new tree, so `ast` itself is left as parsed
+    if optimize:
+        ast = LoopOptimizer().optimize(Optimizer().optimize(Inliner().inline(ast)))
+    if use_ir:
+        program = Lowering().lower(ast)
+        if optimize:
+            IROptimizer().optimize(program)
+        asm_code = X86Emitter().generate(program)
+    else:
+        codegen = CodeGen()
+        codegen.generate(ast)
+        asm_code = codegen.asm_code
+    if optimize:
+        asm_code = PeepholeOptimizer().optimize(asm_code)
+    return asm_code
@@ -0,0 +1,162 @@
+# compiler/profiler.py
+#
+# Execution profiler for Interpreter.
+#
+#     parser = Parser(Scanner(source))
+#     ast = parser.parse()
+#     profiler = Profiler(parser.lines)
+#     profiler.run(Interpreter(parser, profiler=profiler), ast)
+#     print(json.dumps(profiler.report(), indent=2))
+#     open("profile.folded", "w").write(profiler.collapsed())  # flamegraph.pl input
+#
+# While running, the interpreter does two things per node: one counter
+# bump keyed by the node itself, and a clock read on entry to and exit
+# from each user function. Everything else is worked out from those in
+# report():
+#
+#   - node type counts sum the per-node counts by class;
+#   - line counts sum them over statements, using Parser.lines;
+#   - a For loop's trip count is how often its body Block ran;
+#   - inclusive time per function counts only the outermost active call,
+#     so recursion isn't counted twice; exclusive time leaves out callees.
+#
+# collapsed() gives one line per call stack with its exclusive time in
+# microseconds, the format flamegraph.pl and speedscope read.
+
+import time
+from collections import defaultdict
+
+from .ast1 import *
+
+ROOT = '<module>'
+
+
+class FunctionStats:
+    __slots__ = ('calls', 'inclusive', 'exclusive', 'active')
+
+    def __init__(self):
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.active = 0  # Calls currently on the stack, for recursion
+
+
+class CallPath:
+    # One node of the call tree: a function reached through a particular stack
+    __slots__ = ('name', 'parent', 'children', 'seconds')
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = {}
+        self.seconds = 0.0  # Exclusive time
+
+    def child(self, name):
+        path = self.children.get(name)
+        if path is None:
+            path = self.children[name] = CallPath(name, self)
+        return path
+
+    def names(self):
+        names = []
+        path = self
+        while path is not None:
+            names.append(path.name)
+            path = path.parent
+        return names[::-1]
+
+
+class Profiler:
+    def __init__(self, lines=None, clock=time.perf_counter):
+        self.lines = lines or {}  # Statement node -> source line (Parser.lines)
+        self.clock = clock
+        self.visits = defaultdict(int)  # Node -> times visited
+        self.functions = defaultdict(FunctionStats)  # Function name -> stats
+        self.root = CallPath(ROOT)
+        self.definitions = {}  # Function name -> FunctionDef
+        self.frames = []  # [stats, CallPath, start, time spent in callees]
+        self.total = 0.0
+
+    def enter(self, func):
+        stats = self.functions[func.name]
+        stats.calls += 1
+        stats.active += 1
+        self.definitions[func.name] = func
+        path = (self.frames[-1][1] if self.frames else self.root).child(func.name)
+        self.frames.append([stats, path, self.clock(), 0.0])
+
+    def exit(self):
+        stats, path, start, callees = self.frames.pop()
+        elapsed = self.clock() - start
+        stats.active -= 1
+        if stats.active == 0:
+            stats.inclusive += elapsed
+        stats.exclusive += elapsed - callees
+        path.seconds += elapsed - callees
+        if self.frames:
+            self.frames[-1][3] += elapsed
+
+    def run(self, interpreter, tree):
+        """Runs `tree` on `interpreter` and records the time spent outside any function."""
+        start = self.clock()
+        try:
+            return interpreter.visit(tree)
+        finally:
+            elapsed = self.clock() - start
+            self.total += elapsed
+            self.root.seconds = self.total - sum(stats.exclusive for stats in self.functions.values())
+
+    def node_counts(self):
+        counts = defaultdict(int)
+        for node, count in self.visits.items():
+            counts[type(node).__name__] += count
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def line_counts(self):
+        counts = defaultdict(int)
+        for node, count in self.visits.items():
+            line = self.lines.get(node)
+            if line is not None:
+                counts[line] += count
+        return dict(sorted(counts.items()))
+
+    def loops(self):
+        loops = []
+        for node, count in self.visits.items():
+            if isinstance(node, For):
+                loops.append({
+                    'line': self.lines.get(node),
+                    'var': node.var.name,
+                    'runs': count,
+                    'trips': self.visits.get(node.body, 0),
+                })
+        loops.sort(key=lambda loop: (loop['line'] is None, loop['line']))
+        return loops
+
+    def report(self):
+        functions = {}
+        for name, stats in sorted(self.functions.items(), key=lambda item: -item[1].inclusive):
+            functions[name] = {
+                'line': self.lines.get(self.definitions.get(name)),
+                'calls': stats.calls,
+                'inclusive_seconds': stats.inclusive,
+                'exclusive_seconds': stats.exclusive,
+            }
+        return {
+            'total_seconds': self.total,
+            'functions': functions,
+            'node_types': self.node_counts(),
+            'lines': self.line_counts(),
+            'loops': self.loops(),
+        }
+
+    def collapsed(self):
+        lines = []
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            microseconds = round(path.seconds * 1e6)
+            if microseconds > 0:
+                lines.append(f"{';'.join(path.names())} {microseconds}")
+            stack.extend(path.children.values())
+        return "\n".join(sorted(lines)) + "\n"
@@ -0,0 +1,233 @@
+# compiler/regalloc.py
+#
+# Frame layout and register allocation for CodeGen.
+#
+# Every FunctionDef gets a FunctionFrame. Its locals (parameters plus every
+# name it assigns) get a live interval over the function body, numbered in
+# source order. A local referenced inside a loop is live for the whole loop.
+# A linear scan then hands the callee-saved registers to the intervals.
+# When the registers run out, the interval with the lowest weight is
+# spilled. Weight is the number of references, scaled by 10 for each
+# enclosing loop, so hot loop variables are the last to leave a register.
+#
+# Frame layout (cdecl, stack grows down):
+#
+#     [ebp + 8 + 4*i]     parameter i
+#     [ebp + 4]           return address
+#     [ebp]               caller's ebp
+#     [ebp - 4*k]         saved callee-saved registers, k = 1..saved
+#     below that          spilled locals, 4 bytes each
+#
+# Names that are not locals of a function are globals and live in .bss.
+
+from .ast1 import *
+
+CALLEE_SAVED = ('ebx', 'esi', 'edi')  # Homes for locals; preserved across calls
+SCRATCH = ('eax', 'ecx', 'edx')  # Expression temporaries; clobbered by calls
+
+# A register costs a push and a pop in the function, so a local touched
+# fewer times than this stays on the stack
+MIN_WEIGHT = 3
+
+# FunctionFrame.scan work stack actions
+SCAN = 0  # Number a node and its children
+REFERENCE = 1  # Reference a loop variable
+LOOP_END = 2  # Close a loop opened at the given position
+
+
+class Interval:
+    def __init__(self, name, position):
+        self.name = name
+        self.start = position
+        self.end = position
+        self.weight = 0
+        self.register = None
+
+    def __repr__(self):
+        return f"Interval({self.name}, {self.start}-{self.end}, weight={self.weight}, {self.register})"
+
+
+class FunctionFrame:
+    def __init__(self, node, registers=CALLEE_SAVED):
+        self.name = node.name
+        self.params = list(node.params)
+        self.intervals = {}
+        self.loops = []  # (start, end) positions of every loop in the body
+        self.position = 0
+
+        for param in self.params:
+            self.reference(param, 0)
+        local_names = set(self.params)
+        collect_assigned(node.body, local_names)
+        self.scan(node.body, local_names, 0)
+        self.extend_over_loops()
+        self.allocate(registers)
+
+        # Callee-saved registers in use are pushed in the prologue, spilled
+        # locals live below them
+        self.saved = [reg for reg in registers if any(iv.register == reg for iv in self.intervals.values())]
+        spilled = [name for name, iv in self.intervals.items() if iv.register is None and name not in self.params]
+        self.slots = {name: -4 * (len(self.saved) + index + 1) for index, name in enumerate(spilled)}
+        self.frame_size = 4 * len(spilled)
+
+    def reference(self, name, depth):
+        interval = self.intervals.get(name)
+        if interval is None:
+            interval = self.intervals[name] = Interval(name, self.position)
+        interval.end = self.position
+        interval.weight += 10 ** depth
+
+    def scan(self, node, local_names, depth):
+        # Number references in source order; loop bodies count one level
+        # deeper. Walks an explicit stack of (action, node or name, depth),
+        # children pushed in reverse, so deep trees don't recurse.
+        work = [(SCAN, node, depth)]
+        while work:
+            action, node, depth = work.pop()
+            if action == REFERENCE:
+                self.reference(node, depth)
+                continue
+            if action == LOOP_END:
+                self.position += 1
+                self.loops.append((node, self.position))  # node is the loop's start
+                continue
+            self.position += 1
+            if isinstance(node, Block):
+                for stmt in reversed(node.body):
+                    work.append((SCAN, stmt, depth))
+            elif isinstance(node, Var):
+                if node.name in local_names:
+                    self.reference(node.name, depth)
+            elif isinstance(node, Assign):
+                # The target is live from the start of the statement: CodeGen
+                # may compute the value straight into its register
+                self.reference(node.target, depth)
+                work.append((SCAN, node.value, depth))
+            elif isinstance(node, BinOp):
+                work.append((SCAN, node.right, depth))
+                work.append((SCAN, node.left, depth))
+            elif isinstance(node, FunctionCall):
+                for arg in reversed(node.args):
+                    work.append((SCAN, arg, depth))
+            elif isinstance(node, Return):
+                work.append((SCAN, node.value, depth))
+            elif isinstance(node, If):
+                work.append((SCAN, node.body, depth))
+                work.append((SCAN, node.condition, depth))
+            elif isinstance(node, (While, For)):
+                work.append((LOOP_END, self.position, None))
+                work.append((SCAN, node.body, depth + 1))
+                if isinstance(node, For):
+                    work.append((REFERENCE, node.var.name, depth + 1))
+                    work.append((SCAN, node.iterable, depth))
+                else:
+                    work.append((SCAN, node.condition, depth + 1))
+
+    def extend_over_loops(self):
+        # A value may flow around the back edge, so anything used inside a
+        # loop stays live for all of it. Inner loops come first.
+        for start, end in sorted(self.loops, key=lambda loop: loop[1] - loop[0]):
+            for interval in self.intervals.values():
+                if interval.start <= end and interval.end >= start:
+                    interval.start = min(interval.start, start)
+                    interval.end = max(interval.end, end)
+
+    def allocate(self, registers):
+        free = list(registers)
+        active = []
+        for interval in sorted(self.intervals.values(), key=lambda iv: (iv.start, -iv.weight)):
+            if interval.weight < MIN_WEIGHT:
+                continue
+            for old in [iv for iv in active if iv.end < interval.start]:
+                active.remove(old)
+                free.append(old.register)
+            if free:
+                interval.register = free.pop(0)
+                active.append(interval)
+                continue
+            coldest = min(active, key=lambda iv: iv.weight)
+            if coldest.weight < interval.weight:
+                interval.register = coldest.register
+                coldest.register = None
+                active.remove(coldest)
+                active.append(interval)
+
+    def location(self, name):
+        # Operand for a local, or None if the name is not a local
+        interval = self.intervals.get(name)
+        if interval is None:
+            return None
+        if interval.register is not None:
+            return interval.register
+        if name in self.params:
+            return f"dword [ebp + {8 + 4 * self.params.index(name)}]"
+        return f"dword [ebp - {-self.slots[name]}]"
+
+
+class ProgramLayout:
+    def __init__(self, tree, registers=CALLEE_SAVED):
+        self.frames = {}  # FunctionDef node -> FunctionFrame
+        self.globals = []  # Names that need a .bss slot, in first-seen order
+        self.collect(tree, None, registers)
+
+    def collect(self, node, frame, registers):
+        # Globals are noted in first-seen order, so children are pushed in reverse
+        work = [(node, frame)]
+        while work:
+            node, frame = work.pop()
+            if isinstance(node, FunctionDef):
+                frame = self.frames[node] = FunctionFrame(node, registers)
+                work.append((node.body, frame))
+            elif isinstance(node, Block):
+                for stmt in reversed(node.body):
+                    work.append((stmt, frame))
+            elif isinstance(node, Var):
+                self.note_global(node.name, frame)
+            elif isinstance(node, Assign):
+                self.note_global(node.target, frame)
+                work.append((node.value, frame))
+            elif isinstance(node, BinOp):
+                work.append((node.right, frame))
+                work.append((node.left, frame))
+            elif isinstance(node, FunctionCall):
+                for arg in reversed(node.args):
+                    work.append((arg, frame))
+            elif isinstance(node, Return):
+                work.append((node.value, frame))
+            elif isinstance(node, (If, While)):
+                work.append((node.body, frame))
+                work.append((node.condition, frame))
+            elif isinstance(node, For):
+                self.note_global(node.var.name, frame)
+                work.append((node.body, frame))
+                work.append((node.iterable, frame))
+
+    def note_global(self, name, frame):
+        if (frame is None or frame.location(name) is None) and name not in self.globals:
+            self.globals.append(name)
+
+    def location(self, frame, name):
+        if frame is not None:
+            location = frame.location(name)
+            if location is not None:
+                return location
+        return f"dword [{global_label(name)}]"
+
+
+def global_label(name):
+    return f"g_{name}"
+
+
+def collect_assigned(node, names):
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Block):
+            work.extend(node.body)
+        elif isinstance(node, Assign):
+            names.add(node.target)
+        elif isinstance(node, For):
+            names.add(node.var.name)
+            work.append(node.body)
+        elif isinstance(node, (If, While)):
+            work.append(node.body)
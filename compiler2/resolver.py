@@ -0,0 +1,157 @@
+# compiler/resolver.py
+#
+# Semantic analysis: binds every variable reference, assignment target,
+# loop variable, function name and call to a slot before the program runs.
+#
+#   - names assigned at the top level (Assign, For, FunctionDef) are
+#     globals and get an index into the global slot array;
+#   - parameters and names assigned inside a FunctionDef are locals of that
+#     function and get an index into its frame; parameters come first, in
+#     order, so a call can fill the frame front to back;
+#   - any other name inside a function refers to a global.
+#
+# Scoping is static: a name is local to a function if it is assigned
+# anywhere in it. Unlike Python, reading such a name before the function
+# assigns it isn't an error; it sees the global of that name (or 0), as in
+# Interpreter, so engines running on slots have to allow for that.
+# References that bind to nothing are collected and reported together as a
+# NameError.
+
+from .ast1 import *
+
+LOCAL = 0
+GLOBAL = 1
+
+BUILTINS = ('print', 'range')
+
+
+class FunctionScope:
+    def __init__(self, name, params):
+        self.name = name
+        self.params = list(params)
+        self.locals = {}  # name -> frame slot
+        for param in self.params:
+            self.declare(param)
+
+    def declare(self, name):
+        return self.locals.setdefault(name, len(self.locals))
+
+    @property
+    def size(self):
+        return len(self.locals)
+
+
+class Resolution:
+    def __init__(self, global_slots):
+        self.globals = global_slots  # name -> global slot
+        self.scopes = {}  # FunctionDef node -> FunctionScope
+        self.slots = {}  # Var/Assign/For/FunctionDef/FunctionCall node -> (LOCAL or GLOBAL, slot)
+
+    def global_names(self):
+        names = [None] * len(self.globals)
+        for name, slot in self.globals.items():
+            names[slot] = name
+        return names
+
+
+class Resolver:
+    def __init__(self):
+        # Kept across resolve() calls so later programs extend the same globals
+        self.globals = {}
+
+    def resolve(self, node):
+        self.resolution = Resolution(self.globals)
+        self.errors = []
+        self.declare(node, None)
+        self.visit(node, None)
+        if self.errors:
+            raise NameError("\n".join(self.errors))
+        return self.resolution
+
+    def declare(self, node, scope):
+        # First pass over one scope: every name the scope assigns. Nested
+        # FunctionDef bodies are separate scopes and are skipped here.
+        if isinstance(node, Block):
+            for stmt in node.body:
+                self.declare(stmt, scope)
+        elif isinstance(node, Compound):
+            for stmt in node.statements:
+                self.declare(stmt, scope)
+        elif isinstance(node, Assign):
+            self.bind(node.target, scope)
+        elif isinstance(node, For):
+            self.bind(node.var.name, scope)
+            self.declare(node.body, scope)
+        elif isinstance(node, (If, While)):
+            self.declare(node.body, scope)
+        elif isinstance(node, FunctionDef):
+            self.bind(node.name, scope)
+
+    def bind(self, name, scope):
+        if scope is not None:
+            scope.declare(name)
+        elif name not in self.globals:
+            self.globals[name] = len(self.globals)
+
+    def lookup(self, name, scope):
+        if scope is not None and name in scope.locals:
+            return (LOCAL, scope.locals[name])
+        if name in self.globals:
+            return (GLOBAL, self.globals[name])
+        return None
+
+    def visit(self, node, scope):
+        # Second pass: attach a slot to every node that names a variable
+        slots = self.resolution.slots
+        where = f" in function {scope.name}" if scope is not None else ""
+
+        if isinstance(node, Block):
+            for stmt in node.body:
+                self.visit(stmt, scope)
+
+        elif isinstance(node, Compound):
+            for stmt in node.statements:
+                self.visit(stmt, scope)
+
+        elif isinstance(node, FunctionDef):
+            slots[node] = self.lookup(node.name, scope)
+            function_scope = FunctionScope(node.name, node.params)
+            self.resolution.scopes[node] = function_scope
+            self.declare(node.body, function_scope)
+            self.visit(node.body, function_scope)
+
+        elif isinstance(node, Assign):
+            slots[node] = self.lookup(node.target, scope)
+            self.visit(node.value, scope)
+
+        elif isinstance(node, For):
+            slots[node] = self.lookup(node.var.name, scope)
+            slots[node.var] = slots[node]
+            self.visit(node.iterable, scope)
+            self.visit(node.body, scope)
+
+        elif isinstance(node, (If, While)):
+            self.visit(node.condition, scope)
+            self.visit(node.body, scope)
+
+        elif isinstance(node, Return):
+            self.visit(node.value, scope)
+
+        elif isinstance(node, BinOp):
+            self.visit(node.left, scope)
+            self.visit(node.right, scope)
+
+        elif isinstance(node, FunctionCall):
+            if node.name not in BUILTINS:
+                slot = self.lookup(node.name, scope)
+                if slot is None:
+                    self.errors.append(f"Function {node.name} is not defined{where}")
+                slots[node] = slot
+            for arg in node.args:
+                self.visit(arg, scope)
+
+        elif isinstance(node, Var):
+            slot = self.lookup(node.name, scope)
+            if slot is None:
+                self.errors.append(f"Name {node.name} is not defined{where}")
+            slots[node] = slot
@@ -0,0 +1,244 @@
+# compiler/scanner.py
+
+import re
+from bisect import bisect_right
+
+from .lexer import Token, TOKEN_TYPES
+from .trace import get_tracer
+
+# Keyword lookup replaces the if/elif chain in Lexer.identifier()
+KEYWORDS = {
+    'if': TOKEN_TYPES['IF'],
+    'while': TOKEN_TYPES['WHILE'],
+    'for': TOKEN_TYPES['FOR'],
+    'in': TOKEN_TYPES['IN'],
+    'def': TOKEN_TYPES['DEF'],
+    'return': TOKEN_TYPES['RETURN'],
+}
+
+OPERATORS = {
+    '==': TOKEN_TYPES['EQEQ'],
+    '>=': TOKEN_TYPES['GTE'],
+    '<=': TOKEN_TYPES['LTE'],
+    '=': TOKEN_TYPES['EQUAL'],
+    '>': TOKEN_TYPES['GT'],
+    '<': TOKEN_TYPES['LT'],
+    '+': TOKEN_TYPES['PLUS'],
+    '-': TOKEN_TYPES['MINUS'],
+    '*': TOKEN_TYPES['MUL'],
+    '/': TOKEN_TYPES['DIV'],
+    '%': TOKEN_TYPES['MOD'],
+    '|': TOKEN_TYPES['OR'],
+    '&': TOKEN_TYPES['AND'],
+    '^': TOKEN_TYPES['XOR'],
+    ':': TOKEN_TYPES['COLON'],
+    ',': TOKEN_TYPES['COMMA'],
+    '(': TOKEN_TYPES['LPAREN'],
+    ')': TOKEN_TYPES['RPAREN'],
+}
+
+# One alternation for every lexeme in the language. Whitespace never
+# matches, so findall() skips it; anything else that isn't a valid lexeme is
+# caught by the trailing \S and reported as an unexpected character.
+# Two-character operators have to be tried before their prefixes.
+MASTER_PATTERN = re.compile(r"[^\W\d]\w*|\d+|==|>=|<=|[=><+\-*/%|&^:,()]|\S")
+
+NEWLINE_PAIR = ((TOKEN_TYPES['NEWLINE'], '\n'),)
+INDENT_PAIR = ((TOKEN_TYPES['INDENT'], None),)
+DEDENT_PAIR = ((TOKEN_TYPES['DEDENT'], None),)
+EOF_PAIR = ((TOKEN_TYPES['EOF'], None),)
+
+
+class Scanner:
+    """Table-driven replacement for Lexer.
+
+    Produces the same Token stream as Lexer, but works a line at a time:
+    MASTER_PATTERN splits each line into lexemes in one call, and every
+    distinct lexeme is classified once and then looked up in a table.
+    Iterating streams Tokens as the lines are scanned; tokenize() goes
+    further and classifies every distinct line once, so lexing a whole
+    text does no work per token.
+    """
+
+    def __init__(self, text, tracer=None, first_line=1):
+        self.text = text
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.first_line = first_line  # Line number of the text's first line
+        self.line = first_line
+        self.indent_stack = [0]  # Open indentation levels, innermost last
+        self.lexemes = {}  # lexeme -> (token type, token value)
+        self.line_tokens = {}  # line -> (indentation, (type, value) pairs), for tokenize()
+        self._stream = None
+
+    def error(self, message):
+        raise Exception(f"Lexer Error: {message}")
+
+    def classify(self, lexeme):
+        if lexeme[0].isdigit():
+            info = (TOKEN_TYPES['NUMBER'], int(lexeme))
+        elif lexeme[0].isalpha() or lexeme[0] == '_':
+            info = (KEYWORDS.get(lexeme, TOKEN_TYPES['IDENTIFIER']), lexeme)
+        elif lexeme in OPERATORS:
+            info = (OPERATORS[lexeme], lexeme)
+        else:
+            self.error(f"Unexpected character: {lexeme}")
+        self.lexemes[lexeme] = info
+        return info
+
+    def __iter__(self):
+        if self.tracer is None:
+            return self.scan()
+        return self.traced(self.scan())
+
+    def traced(self, tokens):
+        # Only wrapped around the stream when tracing, so the plain scan
+        # loop carries no per-token hook
+        tracer = self.tracer
+        for token in tokens:
+            tracer.emit('lex', 'token', type=token.type, value=token.value, line=token.line)
+            yield token
+
+    def scan(self):
+        lines = self.text.split('\n')
+        last = len(lines) - 1
+        indent_stack = self.indent_stack
+        lexemes = self.lexemes
+        findall = MASTER_PATTERN.findall
+        NEWLINE = TOKEN_TYPES['NEWLINE']
+        INDENT = TOKEN_TYPES['INDENT']
+        DEDENT = TOKEN_TYPES['DEDENT']
+
+        first_line = self.first_line
+        for index, text in enumerate(lines):
+            line = index + first_line
+            self.line = line
+            if index:
+                # Every line after the first starts right after a '\n'
+                stripped = text.lstrip(' ')
+                if not stripped and index < last:
+                    # Blank lines don't change indentation
+                    yield Token(NEWLINE, '\n', line)
+                    continue
+                current_indent = len(text) - len(stripped)
+                if current_indent > indent_stack[-1]:
+                    indent_stack.append(current_indent)
+                    yield Token(INDENT, None, line)
+                elif current_indent < indent_stack[-1]:
+                    while indent_stack[-1] > current_indent:
+                        indent_stack.pop()
+                        yield Token(DEDENT, None, line)
+                    if indent_stack[-1] != current_indent:
+                        self.error(f"Unindent does not match any outer indentation level on line {line}")
+                else:
+                    yield Token(NEWLINE, '\n', line)
+                text = stripped
+
+            for lexeme in findall(text):
+                info = lexemes.get(lexeme)
+                if info is None:
+                    info = self.classify(lexeme)
+                yield Token(info[0], info[1], line)
+
+        # Close every block that is still open, then finish with EOF
+        while len(indent_stack) > 1:
+            indent_stack.pop()
+            yield Token(DEDENT, None, self.line)
+        yield Token(TOKEN_TYPES['EOF'], None, self.line)
+
+    def tokenize(self):
+        """Lexes the whole text at once; returns a TokenList of the same Tokens iterating would give."""
+        if self.tracer is not None:
+            return list(self)
+        lines = self.text.split('\n')
+        last = len(lines) - 1
+        indent_stack = self.indent_stack
+        line_tokens = self.line_tokens
+        pairs = []  # (type, value) of every token, in order
+        line_starts = []  # Index in pairs of every line's first token
+        extend = pairs.extend
+        mark = line_starts.append
+
+        for index, text in enumerate(lines):
+            self.line = index + self.first_line
+            mark(len(pairs))
+            entry = line_tokens.get(text)
+            if entry is None:
+                # Lexemes are classified once the indentation has been
+                # checked, so errors come in the order scan() raises them
+                stripped = text.lstrip(' ')
+                entry = (len(text) - len(stripped) if stripped else None, None)
+            width, tokens = entry
+            if index:
+                if width is None and index < last:
+                    extend(NEWLINE_PAIR)  # Blank lines don't change indentation
+                    continue
+                indent = len(text) if width is None else width
+                if indent == indent_stack[-1]:
+                    extend(NEWLINE_PAIR)
+                elif indent > indent_stack[-1]:
+                    indent_stack.append(indent)
+                    extend(INDENT_PAIR)
+                else:
+                    while indent_stack[-1] > indent:
+                        indent_stack.pop()
+                        extend(DEDENT_PAIR)
+                    if indent_stack[-1] != indent:
+                        self.error(f"Unindent does not match any outer indentation level on line {self.line}")
+            if tokens is None:
+                tokens = self.classify_line(text, width)
+            extend(tokens)
+
+        extend(DEDENT_PAIR * (len(indent_stack) - 1))
+        del indent_stack[1:]
+        extend(EOF_PAIR)
+        return TokenList(pairs, line_starts, self.first_line)
+
+    def classify_line(self, text, width):
+        # Every line's lexemes are classified once, as every lexeme is; the
+        # entry is (indentation, or None for spaces only, (type, value) pairs)
+        lexemes = self.lexemes
+        found = MASTER_PATTERN.findall(text)
+        tokens = tuple(map(lexemes.get, found))
+        if None in tokens:
+            tokens = tuple(info or self.classify(lexeme) for info, lexeme in zip(tokens, found))
+        self.line_tokens[text] = (width, tokens)
+        return tokens
+
+class TokenList:
+    """Scanner.tokenize() result: a token stream kept as (type, value) pairs.
+
+    Every pair comes from the Scanner's tables, so lexing allocates nothing
+    per token; the Token for a pair is made when it is asked for, with its
+    line found from `line_starts`.
+    """
+
+    def __init__(self, pairs, line_starts, first_line=1):
+        self.pairs = pairs
+        self.line_starts = line_starts
+        self.first_line = first_line
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.pairs)
+        if not 0 <= index < len(self.pairs):
+            raise IndexError("token index out of range")
+        token_type, value = self.pairs[index]
+        return Token(token_type, value, self.line(index))
+
+    def line(self, index):
+        # A line without tokens starts where the next one does, so the
+        # last line starting at or before the token is the token's
+        return bisect_right(self.line_starts, index) - 1 + self.first_line
+
+    def __iter__(self):
+        starts = self.line_starts
+        line = self.first_line - 1
+        following = 0  # Index into starts of the next line to reach
+        for index, (token_type, value) in enumerate(self.pairs):
+            while following < len(starts) and starts[following] <= index:
+                following += 1
+                line += 1
+            yield Token(token_type, value, line)
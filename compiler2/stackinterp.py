@@ -0,0 +1,282 @@
+# compiler/stackinterp.py
+#
+# Explicit-stack execution mode.
+#
+#     interpreter = StackInterpreter(parser)
+#     interpreter.visit(ast)
+#
+# Interpreter.visit recurses in Python for every node and every user call,
+# so a program recursing a thousand calls deep hits RecursionError. This
+# interpreter walks the tree with its own work stack instead: each entry is
+# a node still to evaluate or a continuation waiting for the values above
+# it on the value stack. User calls push a frame marker rather than a
+# Python frame, so the depth a program can reach is bounded by memory.
+#
+# Nothing is pushed to run the last statement of a Block or the body of an
+# If, since their result is the Block's result either way. So when a call
+# is about to start and the entry on top of the work stack is the
+# caller's frame marker, nothing in the caller is left to run: the callee
+# takes over the caller's frame (tail-call elimination). That covers
+# `return f(...)` as the last statement of a function, or of an `if` that
+# is itself last, at any depth, in constant space. A `return f(...)` with
+# more statements after it keeps its frame, because the interpreter only
+# returns from a Block on a value that isn't None.
+#
+# Semantics, tracer events and memo/profiler hooks match Interpreter.visit.
+# This is for depth, not speed: on shallow programs it runs at about 0.7x
+# of Interpreter (see benchmarks/interpreter_bench.py).
+
+from .ast1 import *
+from .interpreter import Interpreter
+from .memo import MISSING
+
+# Work stack entries are (action, node, extra)
+EVAL = 0  # Evaluate node
+NEXT = 1  # Block statement finished; extra is the index of the next one
+APPLY = 2  # BinOp operands are on the value stack
+ASSIGN = 3
+IF = 4
+WHILE_TEST = 5  # Condition is on the value stack
+WHILE_BODY = 6  # Body result is on the value stack
+FOR_START = 7  # Iterable is on the value stack
+FOR_NEXT = 8  # Body result is on the value stack; extra is the iterator
+PRINT = 9
+RANGE = 10
+CALL = 11  # extra is the FunctionDef
+RETURN = 12  # Frame marker; node is the caller's symbol table, extra the memo keys
+
+BINARY_OPS = {
+    'PLUS': lambda left, right: left + right,
+    'MINUS': lambda left, right: left - right,
+    'MUL': lambda left, right: left * right,
+    'DIV': lambda left, right: left // right,
+    'GT': lambda left, right: left > right,
+    'LT': lambda left, right: left < right,
+    'EQEQ': lambda left, right: left == right,
+}
+
+
+def pop_values(values, count):
+    if count == 0:
+        return []
+    popped = values[-count:]
+    del values[-count:]
+    return popped
+
+
+class StackInterpreter(Interpreter):
+    """Drop-in Interpreter that runs without Python recursion and eliminates tail calls."""
+
+    def __init__(self, parser, tracer=None, memo=None, profiler=None):
+        super().__init__(parser, tracer, memo, profiler)
+        self.max_depth = 0  # Deepest frame stack seen, for checking tail calls
+
+    def visit(self, node):
+        work = [(EVAL, node, None)]
+        values = []
+        depth = 0
+        try:
+            while work:
+                action, node, extra = work.pop()
+                if action == EVAL:
+                    self.evaluate(node, work, values)
+                elif action == NEXT:
+                    result = values.pop()
+                    if result is not None:  # Handle return values
+                        values.append(result)
+                    else:
+                        body = node.body
+                        if extra + 1 < len(body):
+                            work.append((NEXT, node, extra + 1))
+                        work.append((EVAL, body[extra], None))
+                elif action == APPLY:
+                    right = values.pop()
+                    left = values.pop()
+                    apply = BINARY_OPS.get(node.op)
+                    values.append(apply(left, right) if apply is not None else None)
+                elif action == ASSIGN:
+                    self.symbol_table[node.target] = values.pop()
+                    values.append(None)
+                elif action == IF:
+                    if values.pop():
+                        work.append((EVAL, node.body, None))
+                    else:
+                        values.append(None)
+                elif action == WHILE_TEST:
+                    if values.pop():
+                        work.append((WHILE_BODY, node, None))
+                        work.append((EVAL, node.body, None))
+                    else:
+                        values.append(None)
+                elif action == WHILE_BODY:
+                    result = values.pop()
+                    if result is not None:  # Handle return values inside loops
+                        values.append(result)
+                    else:
+                        work.append((WHILE_TEST, node, None))
+                        work.append((EVAL, node.condition, None))
+                elif action == FOR_START:
+                    # Consumed lazily, like Interpreter
+                    work.append((FOR_NEXT, node, iter(values.pop())))
+                    values.append(None)
+                elif action == FOR_NEXT:
+                    result = values.pop()
+                    if result is not None:  # Handle return values inside loops
+                        values.append(result)
+                        continue
+                    value = next(extra, MISSING)
+                    if value is MISSING:
+                        values.append(None)
+                    else:
+                        self.symbol_table[node.var.name] = value
+                        work.append((FOR_NEXT, node, extra))
+                        work.append((EVAL, node.body, None))
+                elif action == PRINT:
+                    print(*pop_values(values, len(node.args)))
+                    values.append(None)
+                elif action == RANGE:
+                    values.append(range(*pop_values(values, len(node.args))))
+                elif action == CALL:
+                    depth = self.call(node, extra, work, values, depth)
+                elif action == RETURN:
+                    # The function's result stays on the value stack
+                    self.symbol_table = node
+                    depth -= 1
+                    if extra:
+                        for func, arg_values in reversed(extra):  # Innermost first
+                            self.memo.store(func, arg_values, values[-1])
+                    if self.profiler is not None:
+                        self.profiler.exit()
+        except BaseException:
+            # Unwind the frames still open, innermost first, as Interpreter's
+            # finally blocks would
+            for action, node, extra in reversed(work):
+                if action == RETURN:
+                    self.symbol_table = node
+                    if self.profiler is not None:
+                        self.profiler.exit()
+            raise
+        return values.pop()
+
+    def evaluate(self, node, work, values):
+        if self.tracer is not None:
+            self.tracer.emit('interpret', 'visit', node=type(node).__name__)
+        if self.profiler is not None:
+            self.profiler.visits[node] += 1
+
+        if isinstance(node, BinOp):
+            left, right = node.left, node.right
+            if (self.tracer is None and self.profiler is None
+                    and isinstance(left, (Num, Var)) and isinstance(right, (Num, Var))):
+                # No events to report, so leaf operands needn't go through
+                # the work stack
+                apply = BINARY_OPS.get(node.op)
+                values.append(apply(self.leaf(left), self.leaf(right)) if apply is not None else None)
+                return
+            work.append((APPLY, node, None))
+            work.append((EVAL, node.right, None))
+            work.append((EVAL, node.left, None))
+
+        elif isinstance(node, Var):
+            # Locals first, then globals
+            if node.name in self.symbol_table:
+                value = self.symbol_table[node.name]
+            else:
+                value = self.globals.get(node.name, 0)
+            if self.tracer is not None:
+                self.tracer.emit('interpret', 'var', name=node.name, value=value)
+            values.append(value)
+
+        elif isinstance(node, Num):
+            values.append(node.value)
+
+        elif isinstance(node, Block):
+            if not node.body:
+                values.append(None)
+                return
+            if len(node.body) > 1:
+                work.append((NEXT, node, 1))
+            work.append((EVAL, node.body[0], None))
+
+        elif isinstance(node, Assign):
+            work.append((ASSIGN, node, None))
+            work.append((EVAL, node.value, None))
+
+        elif isinstance(node, If):
+            work.append((IF, node, None))
+            work.append((EVAL, node.condition, None))
+
+        elif isinstance(node, While):
+            work.append((WHILE_TEST, node, None))
+            work.append((EVAL, node.condition, None))
+
+        elif isinstance(node, For):
+            work.append((FOR_START, node, None))
+            work.append((EVAL, node.iterable, None))
+
+        elif isinstance(node, Return):
+            work.append((EVAL, node.value, None))
+
+        elif isinstance(node, FunctionCall):
+            if node.name == "print":
+                work.append((PRINT, node, None))
+            elif node.name == "range":
+                if not 1 <= len(node.args) <= 3:
+                    raise Exception(f"range() expects 1 to 3 arguments, got {len(node.args)}")
+                work.append((RANGE, node, None))
+            else:
+                func = self.symbol_table.get(node.name) or self.globals.get(node.name)
+                if not func:
+                    raise Exception(f"Function {node.name} is not defined")
+                work.append((CALL, node, func))
+            # Arguments are evaluated left to right
+            for arg in reversed(node.args):
+                work.append((EVAL, arg, None))
+
+        elif isinstance(node, FunctionDef):
+            self.symbol_table[node.name] = node
+            values.append(None)
+
+        else:
+            raise Exception(f"Unknown node type: {type(node)}")
+
+    def leaf(self, node):
+        if isinstance(node, Num):
+            return node.value
+        if node.name in self.symbol_table:
+            return self.symbol_table[node.name]
+        return self.globals.get(node.name, 0)
+
+    def call(self, node, func, work, values, depth):
+        arg_values = pop_values(values, len(node.args))
+        if self.tracer is not None:
+            self.tracer.emit('interpret', 'call', name=node.name, args=arg_values)
+        if self.memo is not None:
+            result = self.memo.get(func, arg_values)
+            if result is not MISSING:
+                values.append(result)
+                return depth
+        local_symbol_table = {}
+        for param, arg in zip(func.params, arg_values):
+            local_symbol_table[param] = arg
+        memo_keys = [(func, arg_values)] if self.memo is not None else None
+
+        if work and work[-1][0] == RETURN:
+            # Tail call: the caller has nothing left to run, so the callee
+            # returns straight to the caller's caller
+            _, caller_table, caller_keys = work.pop()
+            if caller_keys:
+                memo_keys = caller_keys + memo_keys  # The callee's result is theirs too
+            if self.profiler is not None:
+                self.profiler.exit()
+            work.append((RETURN, caller_table, memo_keys))
+        else:
+            work.append((RETURN, self.symbol_table, memo_keys))
+            depth += 1
+            if depth > self.max_depth:
+                self.max_depth = depth
+        if self.profiler is not None:
+            self.profiler.enter(func)
+        self.symbol_table = local_symbol_table
+        work.append((EVAL, func.body, None))
+        return depth
@@ -0,0 +1,264 @@
+# compiler/tiering.py
+#
+# Tiered execution: hot user functions are translated to CPython code.
+#
+#     tier = NativeTier(threshold=50)
+#     Interpreter(parser, tier=tier).visit(ast)
+#     print(tier.stats())
+#
+# Interpreter counts calls per FunctionDef through native_for(). Once a
+# function has been called `threshold` times, its body is translated into
+# a Python `ast` tree, compiled, and every later call runs the compiled
+# function instead of walking the tree. Calls from native code to other
+# user functions go through invoke(), straight to their native code when
+# they have some.
+#
+# The translation keeps Interpreter's semantics:
+# - Any statement whose value isn't None returns it from the function,
+#   not just `return`, so each one is checked
+# - A name that isn't a parameter reads the global of that name (or 0)
+#   until the function assigns it. Only top-level code writes globals,
+#   and it can't run during a call, so such names are loaded once on entry.
+# - DIV is floor division
+#
+# Functions using anything else (a nested def, a call through a local
+# name, strings, operators Interpreter doesn't evaluate) fall back: they
+# stay interpreted, and stats() says why. fallback() sends a compiled
+# function back to the tree-walker, and `enabled = False` turns the tier
+# off. Native code reports no tracer or profiler events, so Interpreter
+# only uses it when neither is attached.
+
+import ast as pyast
+
+from .ast1 import *
+
+ARITHMETIC = {
+    'PLUS': pyast.Add,
+    'MINUS': pyast.Sub,
+    'MUL': pyast.Mult,
+    'DIV': pyast.FloorDiv,
+}
+
+COMPARISONS = {
+    'GT': pyast.Gt,
+    'LT': pyast.Lt,
+    'EQEQ': pyast.Eq,
+}
+
+
+class Unsupported(Exception):
+    """The function uses something the translation doesn't handle."""
+
+
+class NativeTier:
+    def __init__(self, threshold=50, enabled=True):
+        self.threshold = threshold
+        self.enabled = enabled
+        self.interpreter = None
+        self.calls = {}  # FunctionDef -> interpreted calls so far
+        self.compiled = {}  # FunctionDef -> native function
+        self.trees = {}  # FunctionDef -> Python ast.Module it was compiled from
+        self.rejected = {}  # FunctionDef -> reason it stays interpreted
+
+    def bind(self, interpreter):
+        # Native code reads this interpreter's globals and calls back into it
+        self.interpreter = interpreter
+
+    def native_for(self, func):
+        """The native function for `func`, compiling it once it is hot; None to interpret."""
+        if not self.enabled or not isinstance(func, FunctionDef):
+            return None
+        native = self.compiled.get(func)
+        if native is not None or func in self.rejected:
+            return native
+        count = self.calls[func] = self.calls.get(func, 0) + 1
+        if count < self.threshold:
+            return None
+        return self.compile(func)
+
+    def fallback(self, func, reason="fallback requested"):
+        # Drop the native code; the function is interpreted from now on
+        self.compiled.pop(func, None)
+        self.trees.pop(func, None)
+        self.rejected[func] = reason
+
+    def invoke(self, name, *args):
+        # A call from native code; the callee can only be a global
+        func = self.interpreter.globals.get(name)
+        if not func:
+            raise Exception(f"Function {name} is not defined")
+        native = self.compiled.get(func) if self.enabled and isinstance(func, FunctionDef) else None
+        if native is not None and self.interpreter.memo is None and len(args) == len(func.params):
+            return native(*args)
+        return self.interpreter.call_function(func, list(args))
+
+    def compile(self, func):
+        try:
+            tree = FunctionTranslator(func).translate()
+            namespace = {
+                '_g': self.interpreter.globals,
+                '_invoke': self.invoke,
+                '_print': print,
+                '_range': range,
+            }
+            exec(compile(tree, f"<native {func.name}>", 'exec'), namespace)
+        except (Unsupported, SyntaxError, RecursionError) as e:
+            self.rejected[func] = str(e)
+            return None
+        native = self.compiled[func] = namespace['native']
+        self.trees[func] = tree
+        return native
+
+    def source(self, func):
+        # Python source of a compiled function, for debugging
+        tree = self.trees.get(func)
+        return pyast.unparse(tree) if tree is not None else None
+
+    def stats(self):
+        names = sorted({func.name for func in self.calls})
+        return {
+            'threshold': self.threshold,
+            'enabled': self.enabled,
+            'compiled': sorted(func.name for func in self.compiled),
+            'fallbacks': {func.name: reason for func, reason in self.rejected.items()},
+            'interpreted_calls': {
+                name: sum(count for func, count in self.calls.items() if func.name == name)
+                for name in names
+            },
+        }
+
+
+class FunctionTranslator:
+    """Builds `def native(<params>): ...` for one FunctionDef.
+
+    User names become `v_<name>`, so they can't collide with Python
+    keywords or the helpers (_g, _invoke, _print, _range, _t).
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.params = list(func.params)
+        self.assigned = set()
+        self.read = set()
+        self.collect(func.body)
+        self.locals = set(self.params) | self.assigned
+
+    def collect(self, node):
+        work = [node]
+        while work:
+            node = work.pop()
+            if isinstance(node, Block):
+                work.extend(node.body)
+            elif isinstance(node, Assign):
+                self.assigned.add(node.target)
+                work.append(node.value)
+            elif isinstance(node, For):
+                self.assigned.add(node.var.name)
+                work.extend((node.iterable, node.body))
+            elif isinstance(node, (If, While)):
+                work.extend((node.condition, node.body))
+            elif isinstance(node, Return):
+                work.append(node.value)
+            elif isinstance(node, BinOp):
+                work.extend((node.left, node.right))
+            elif isinstance(node, FunctionCall):
+                work.extend(node.args)
+            elif isinstance(node, Var):
+                self.read.add(node.name)
+
+    def translate(self):
+        # Non-parameters start out as the global of the same name
+        body = [
+            pyast.Assign(targets=[self.store(name)], value=self.load_global(name))
+            for name in sorted((self.assigned | self.read) - set(self.params))
+        ]
+        body.extend(self.block(self.func.body))
+        function = pyast.FunctionDef(
+            name='native',
+            args=pyast.arguments(
+                posonlyargs=[], args=[pyast.arg(arg=f"v_{param}") for param in self.params],
+                vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None, defaults=[],
+            ),
+            body=body or [pyast.Pass()],
+            decorator_list=[],
+            returns=None,
+        )
+        if 'type_params' in pyast.FunctionDef._fields:
+            function.type_params = []
+        return pyast.fix_missing_locations(pyast.Module(body=[function], type_ignores=[]))
+
+    def load_global(self, name):
+        get = pyast.Attribute(value=pyast.Name(id='_g', ctx=pyast.Load()), attr='get', ctx=pyast.Load())
+        return pyast.Call(func=get, args=[pyast.Constant(name), pyast.Constant(0)], keywords=[])
+
+    def store(self, name):
+        return pyast.Name(id=f"v_{name}", ctx=pyast.Store())
+
+    # Statements
+
+    def block(self, node):
+        statements = []
+        for stmt in node.body:
+            statements.extend(self.statement(stmt))
+        return statements or [pyast.Pass()]
+
+    def statement(self, node):
+        if isinstance(node, Block):
+            return self.block(node)
+        if isinstance(node, Assign):
+            return [pyast.Assign(targets=[self.store(node.target)], value=self.expression(node.value))]
+        if isinstance(node, If):
+            return [pyast.If(test=self.expression(node.condition), body=self.block(node.body), orelse=[])]
+        if isinstance(node, While):
+            return [pyast.While(test=self.expression(node.condition), body=self.block(node.body), orelse=[])]
+        if isinstance(node, For):
+            return [pyast.For(target=self.store(node.var.name), iter=self.expression(node.iterable),
+                              body=self.block(node.body), orelse=[])]
+        if isinstance(node, FunctionDef):
+            raise Unsupported(f"defines {node.name} inside a function")
+        if isinstance(node, Return):
+            node = node.value
+        # Return or expression statement: any value but None ends the call
+        value = self.expression(node)
+        if isinstance(node, FunctionCall) and node.name == "print":
+            return [pyast.Expr(value=value)]
+        if isinstance(node, (Num, BinOp)) or (isinstance(node, FunctionCall) and node.name == "range"):
+            return [pyast.Return(value=value)]  # Never None
+        result = pyast.Name(id='_t', ctx=pyast.Load())
+        return [
+            pyast.Assign(targets=[pyast.Name(id='_t', ctx=pyast.Store())], value=value),
+            pyast.If(
+                test=pyast.Compare(left=result, ops=[pyast.IsNot()], comparators=[pyast.Constant(None)]),
+                body=[pyast.Return(value=result)],
+                orelse=[],
+            ),
+        ]
+
+    # Expressions
+
+    def expression(self, node):
+        if isinstance(node, Num):
+            return pyast.Constant(node.value)
+        if isinstance(node, Var):
+            return pyast.Name(id=f"v_{node.name}", ctx=pyast.Load())
+        if isinstance(node, BinOp):
+            left = self.expression(node.left)
+            right = self.expression(node.right)
+            if node.op in ARITHMETIC:
+                return pyast.BinOp(left=left, op=ARITHMETIC[node.op](), right=right)
+            if node.op in COMPARISONS:
+                return pyast.Compare(left=left, ops=[COMPARISONS[node.op]()], comparators=[right])
+            raise Unsupported(f"uses operator {node.op}")
+        if isinstance(node, FunctionCall):
+            args = [self.expression(arg) for arg in node.args]
+            if node.name == "print":
+                return pyast.Call(func=pyast.Name(id='_print', ctx=pyast.Load()), args=args, keywords=[])
+            if node.name == "range":
+                if not 1 <= len(args) <= 3:
+                    raise Unsupported(f"calls range() with {len(args)} arguments")
+                return pyast.Call(func=pyast.Name(id='_range', ctx=pyast.Load()), args=args, keywords=[])
+            if node.name in self.locals:
+                raise Unsupported(f"calls local name {node.name}")
+            invoke = pyast.Name(id='_invoke', ctx=pyast.Load())
+            return pyast.Call(func=invoke, args=[pyast.Constant(node.name)] + args, keywords=[])
+        raise Unsupported(f"uses {type(node).__name__}")
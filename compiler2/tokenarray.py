@@ -0,0 +1,221 @@
+# compiler/tokenarray.py
+#
+# Struct-of-arrays token stream. Every token is one row across three
+# `array` buffers instead of a Token object:
+#
+#     kinds[i]            token kind, an index into KIND_NAMES (one byte)
+#     starts[i], ends[i]  source offsets of the lexeme; INDENT, DEDENT and
+#                         EOF are empty spans where they occur
+#
+# plus `line_starts`, the offset of every line, from which lines and
+# columns are found by bisection. Values are not stored: a token's text is
+# the slice text[start:end], and it is only made (and a NUMBER converted)
+# when something asks for it.
+#
+#     tokens = TokenArray.scan(source)
+#     ast = Parser(tokens).parse()
+#
+# Iterating a TokenArray hands out TokenViews, which have the same type,
+# value and line as Scanner's Tokens, so Parser and the rest of the
+# pipeline accept them unchanged. Views are created on access.
+
+from array import array
+from bisect import bisect_right
+
+from .lexer import TOKEN_TYPES
+from .scanner import KEYWORDS, MASTER_PATTERN, OPERATORS
+from .trace import get_tracer
+
+KIND_NAMES = tuple(TOKEN_TYPES.values())
+KIND_OF = {name: kind for kind, name in enumerate(KIND_NAMES)}
+
+NUMBER = KIND_OF[TOKEN_TYPES['NUMBER']]
+NEWLINE = KIND_OF[TOKEN_TYPES['NEWLINE']]
+INDENT = KIND_OF[TOKEN_TYPES['INDENT']]
+DEDENT = KIND_OF[TOKEN_TYPES['DEDENT']]
+EOF = KIND_OF[TOKEN_TYPES['EOF']]
+NO_VALUE = (INDENT, DEDENT, EOF)
+
+
+class TokenArray:
+    def __init__(self, text, tracer=None):
+        self.text = text
+        self.tracer = tracer if tracer is not None else get_tracer()
+        self.kinds = array('B')
+        self.starts = array('i')
+        self.ends = array('i')
+        self.line_starts = array('i', [0])
+
+    @classmethod
+    def scan(cls, text, tracer=None):
+        tokens = cls(text, tracer)
+        tokens.tokenize()
+        return tokens
+
+    def error(self, message):
+        raise Exception(f"Lexer Error: {message}")
+
+    def tokenize(self):
+        # Scanner.scan over offsets instead of line copies: the same
+        # indentation rules, the same lexemes, the same token order
+        text = self.text
+        kinds, starts, ends = self.kinds, self.starts, self.ends
+        line_starts = self.line_starts
+        indent_stack = [0]
+        lexemes = {}  # lexeme -> kind
+        finditer = MASTER_PATTERN.finditer
+
+        def add(kind, start, end):
+            kinds.append(kind)
+            starts.append(start)
+            ends.append(end)
+
+        start = 0
+        line = 1
+        while True:
+            end = text.find('\n', start)
+            last = end == -1
+            if last:
+                end = len(text)
+            if line > 1:
+                # start is right after a '\n'
+                newline = start - 1
+                first = start
+                while first < end and text[first] == ' ':
+                    first += 1
+                if first == end and not last:
+                    # Blank lines don't change indentation
+                    add(NEWLINE, newline, start)
+                    line_starts.append(end + 1)
+                    start = end + 1
+                    line += 1
+                    continue
+                current_indent = first - start
+                if current_indent > indent_stack[-1]:
+                    indent_stack.append(current_indent)
+                    add(INDENT, first, first)
+                elif current_indent < indent_stack[-1]:
+                    while indent_stack[-1] > current_indent:
+                        indent_stack.pop()
+                        add(DEDENT, first, first)
+                    if indent_stack[-1] != current_indent:
+                        self.error(f"Unindent does not match any outer indentation level on line {line}")
+                else:
+                    add(NEWLINE, newline, start)
+                start = first
+
+            for match in finditer(text, start, end):
+                lexeme = match.group()
+                kind = lexemes.get(lexeme)
+                if kind is None:
+                    kind = lexemes[lexeme] = self.classify(lexeme)
+                add(kind, match.start(), match.end())
+
+            if last:
+                break
+            line_starts.append(end + 1)
+            start = end + 1
+            line += 1
+
+        # Close every block that is still open, then finish with EOF
+        while len(indent_stack) > 1:
+            indent_stack.pop()
+            add(DEDENT, len(text), len(text))
+        add(EOF, len(text), len(text))
+
+    def classify(self, lexeme):
+        if lexeme[0].isdigit():
+            return NUMBER
+        if lexeme[0].isalpha() or lexeme[0] == '_':
+            return KIND_OF[KEYWORDS.get(lexeme, TOKEN_TYPES['IDENTIFIER'])]
+        if lexeme in OPERATORS:
+            return KIND_OF[OPERATORS[lexeme]]
+        self.error(f"Unexpected character: {lexeme}")
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.kinds)
+        if not 0 <= index < len(self.kinds):
+            raise IndexError("token index out of range")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        tracer = self.tracer
+        for index in range(len(self.kinds)):
+            token = TokenView(self, index)
+            if tracer is not None:
+                tracer.emit('lex', 'token', type=token.type, value=token.value, line=token.line)
+            yield token
+
+    def lexeme(self, index):
+        return self.text[self.starts[index]:self.ends[index]]
+
+    def value(self, index):
+        # The same values Scanner puts in its Tokens
+        kind = self.kinds[index]
+        if kind in NO_VALUE:
+            return None
+        if kind == NUMBER:
+            return int(self.lexeme(index))
+        return self.lexeme(index)
+
+    def line(self, index):
+        # A NEWLINE belongs to the line it starts, as in Scanner
+        offset = self.ends[index] if self.kinds[index] == NEWLINE else self.starts[index]
+        return bisect_right(self.line_starts, offset)
+
+    def column(self, index):
+        # 0-based column of the token's first character on its own line
+        start = self.starts[index]
+        return start - self.line_starts[bisect_right(self.line_starts, start) - 1]
+
+    def nbytes(self):
+        # Bytes held by the token buffers; the source text is shared
+        buffers = (self.kinds, self.starts, self.ends, self.line_starts)
+        return sum(len(buf) * buf.itemsize for buf in buffers)
+
+
+class TokenView:
+    """One row of a TokenArray, with the attributes of a Token."""
+
+    __slots__ = ('tokens', 'index')
+
+    def __init__(self, tokens, index):
+        self.tokens = tokens
+        self.index = index
+
+    @property
+    def kind(self):
+        return self.tokens.kinds[self.index]
+
+    @property
+    def type(self):
+        return KIND_NAMES[self.tokens.kinds[self.index]]
+
+    @property
+    def value(self):
+        return self.tokens.value(self.index)
+
+    @property
+    def line(self):
+        return self.tokens.line(self.index)
+
+    @property
+    def column(self):
+        return self.tokens.column(self.index)
+
+    @property
+    def span(self):
+        return self.tokens.starts[self.index], self.tokens.ends[self.index]
+
+    def __eq__(self, other):
+        return isinstance(other, TokenView) and other.tokens is self.tokens and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.tokens), self.index))
+
+    def __repr__(self):
+        return f"Token({self.type}, {repr(self.value)}, {self.line})"
@@ -0,0 +1,86 @@
+# compiler/trace.py
+#
+# Event hooks for the compiler stages. Every stage keeps a `tracer`
+# attribute that is None unless tracing was asked for, and each hook is
+# guarded by `if self.tracer is not None`, so a disabled tracer costs one
+# attribute check and never formats or allocates anything.
+#
+#     tracer = Tracer(CounterSink(), JSONLinesSink(open("trace.jsonl", "w")))
+#     set_tracer(tracer)            # picked up by every stage created later
+#     ...
+#     print(tracer.sinks[0].counts)
+
+import json
+import sys
+from collections import Counter
+
+_default_tracer = None
+
+
+def set_tracer(tracer):
+    # Install the tracer new Lexer/Scanner/Parser/Interpreter/CodeGen
+    # instances use when none is passed in. Pass None to turn tracing off.
+    global _default_tracer
+    _default_tracer = tracer
+
+
+def get_tracer():
+    return _default_tracer
+
+
+class Tracer:
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+        return sink
+
+    def emit(self, stage, event, **fields):
+        for sink in self.sinks:
+            sink.handle(stage, event, fields)
+
+    def close(self):
+        for sink in self.sinks:
+            close = getattr(sink, 'close', None)
+            if close is not None:
+                close()
+
+
+class CounterSink:
+    """Counts events per (stage, event) pair."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def handle(self, stage, event, fields):
+        self.counts[(stage, event)] += 1
+
+    def report(self):
+        return {f"{stage}.{event}": count for (stage, event), count in sorted(self.counts.items())}
+
+
+class JSONLinesSink:
+    """Writes one JSON object per event to a text stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def handle(self, stage, event, fields):
+        record = {'stage': stage, 'event': event}
+        record.update(fields)
+        self.stream.write(json.dumps(record, default=repr) + "\n")
+
+    def close(self):
+        self.stream.flush()
+
+
+class PrintSink:
+    """Human-readable debugging output, like the old print() calls."""
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def handle(self, stage, event, fields):
+        details = ", ".join(f"{key}={value!r}" for key, value in fields.items())
+        print(f"[{stage}] {event}: {details}", file=self.stream)
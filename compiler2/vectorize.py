@@ -0,0 +1,324 @@
+# compiler/vectorize.py
+#
+# Runs simple counted loops as NumPy array operations.
+#
+#     vectorizer = LoopVectorizer()
+#     Interpreter(parser, vectorizer=vectorizer).visit(ast)
+#     print(vectorizer.stats())
+#
+# A For loop qualifies when its body is nothing but assignments of
+# arithmetic on numbers and names (no calls, no control flow) and every
+# assigned name is either
+#   a temporary   assigned once, and only read after that assignment in
+#                 the body (so no value is carried between iterations), or
+#   a reduction   `acc = acc + e`, `acc = e + acc`, `acc = acc * e`,
+#                 `acc = e * acc`, or a chain like `acc = acc + a - b`,
+#                 where acc appears nowhere else in the body.
+# Everything else the body reads is loop-invariant.
+#
+# For such a loop over a range, the loop variable becomes an int64 array,
+# temporaries are computed elementwise, and each reduction is a single sum
+# or product. Afterwards the loop variable and the temporaries hold their
+# values from the last iteration, as if the loop had run.
+#
+# Python ints never overflow and int64s do, so before anything runs every
+# subexpression gets an exact interval from the range bounds and the
+# invariants' values. If any interval (or a sum) could leave int64, a
+# divisor interval contains 0, or an invariant isn't an int, the loop runs
+# one iteration at a time as usual. NumPy's // on int64 floors like
+# Python's, and comparisons are turned back into 0/1 ints before any
+# arithmetic, as Python's bools behave. Without NumPy nothing is
+# vectorized.
+
+import math
+
+from .ast1 import *
+
+try:
+    import numpy as np
+except ImportError:  # Optional; every loop runs in the interpreter
+    np = None
+
+INT64_MAX = 2 ** 63 - 1
+INT64_MIN = -2 ** 63
+
+MIN_ITERATIONS = 64  # Shorter loops aren't worth setting up arrays for
+
+ARITHMETIC = ('PLUS', 'MINUS', 'MUL', 'DIV')
+COMPARISONS = ('GT', 'LT', 'EQEQ')
+
+
+class NotVectorizable(Exception):
+    pass
+
+
+class LoopPlan:
+    """What a vectorizable loop body does, worked out once per For node."""
+
+    def __init__(self, var, temporaries, reductions, invariants):
+        self.var = var  # Loop variable name
+        self.temporaries = temporaries  # Assign nodes, in body order
+        self.reductions = reductions  # (name, op, term, Assign node), in body order
+        self.invariants = invariants  # Names read but never assigned
+
+
+def analyze(node):
+    """LoopPlan for a For node, or raises NotVectorizable with the reason."""
+    var = node.var.name
+    statements = node.body.body if isinstance(node.body, Block) else [node.body]
+    if not statements:
+        raise NotVectorizable("empty body")
+    for stmt in statements:
+        if not isinstance(stmt, Assign):
+            raise NotVectorizable(f"body has a {type(stmt).__name__}")
+        check_expression(stmt.value)
+
+    targets = [stmt.target for stmt in statements]
+    if var in targets:
+        raise NotVectorizable(f"body assigns the loop variable {var}")
+    reductions = []
+    reduction_names = set()
+    for stmt in statements:
+        reduction = match_reduction(stmt)
+        if reduction is not None and targets.count(stmt.target) == 1:
+            name, op, term = reduction
+            if not reads(term, name):
+                reductions.append((name, op, term, stmt))
+                reduction_names.add(name)
+
+    temporaries = []
+    defined = set()
+    invariants = set()
+    for stmt in statements:
+        if stmt.target in reduction_names:
+            term = next(term for name, _, term, _ in reductions if name == stmt.target)
+            names = read_names(term)
+        else:
+            names = read_names(stmt.value)
+        for name in names:
+            if name in reduction_names:
+                raise NotVectorizable(f"reduction {name} is read in the body")
+            if name in targets and name not in defined:
+                raise NotVectorizable(f"{name} is carried from one iteration to the next")
+            if name != var and name not in targets:
+                invariants.add(name)
+        if stmt.target not in reduction_names:
+            if stmt.target in defined:
+                raise NotVectorizable(f"{stmt.target} is assigned more than once")
+            defined.add(stmt.target)
+            temporaries.append(stmt)
+    if not reductions:
+        raise NotVectorizable("no reduction")  # Only the last iteration would matter
+    return LoopPlan(var, temporaries, reductions, sorted(invariants))
+
+
+def check_expression(node):
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, BinOp):
+            if node.op not in ARITHMETIC and node.op not in COMPARISONS:
+                raise NotVectorizable(f"operator {node.op}")
+            work.extend((node.left, node.right))
+        elif isinstance(node, FunctionCall):
+            raise NotVectorizable(f"body calls {node.name}")
+        elif not isinstance(node, (Num, Var)):
+            raise NotVectorizable(f"body uses {type(node).__name__}")
+
+
+def match_reduction(stmt):
+    # (name, 'PLUS' or 'MUL', term) if stmt is acc = acc + term or
+    # acc = acc * term, else None. `acc = acc + a - b` parses as
+    # ((acc + a) - b), so whole +/- (or *) chains down the left spine count,
+    # with acc replaced by 0 (or 1) to make the term.
+    value = stmt.value
+    if not isinstance(value, BinOp) or value.op not in ('PLUS', 'MINUS', 'MUL'):
+        return None
+    op = 'MUL' if value.op == 'MUL' else 'PLUS'
+    if value.op != 'MINUS' and isinstance(value.right, Var) and value.right.name == stmt.target:
+        return stmt.target, op, value.left
+    family = ('MUL',) if op == 'MUL' else ('PLUS', 'MINUS')
+    spine = []
+    node = value
+    while isinstance(node, BinOp) and node.op in family:
+        spine.append(node)
+        node = node.left
+    if not (isinstance(node, Var) and node.name == stmt.target):
+        return None
+    term = Num(1 if op == 'MUL' else 0)
+    for link in reversed(spine):
+        term = BinOp(term, link.op, link.right)
+    return stmt.target, op, term
+
+
+def read_names(node):
+    names = []
+    work = [node]
+    while work:
+        node = work.pop()
+        if isinstance(node, Var):
+            names.append(node.name)
+        elif isinstance(node, BinOp):
+            work.extend((node.right, node.left))
+    return names
+
+
+def reads(node, name):
+    return name in read_names(node)
+
+
+class LoopVectorizer:
+    def __init__(self, min_iterations=MIN_ITERATIONS):
+        self.min_iterations = min_iterations
+        self.plans = {}  # For node -> LoopPlan, or the reason it has none
+        self.vectorized = 0
+        self.fallbacks = {}  # reason -> count
+
+    def plan(self, node):
+        plan = self.plans.get(node)
+        if plan is None:
+            try:
+                plan = analyze(node)
+            except NotVectorizable as e:
+                plan = str(e)
+            self.plans[node] = plan
+        return plan
+
+    def run(self, node, iterable, interpreter):
+        """Runs the For loop `node` over `iterable` as array operations.
+
+        Returns False, having done nothing, if the loop has to run in the
+        interpreter instead.
+        """
+        if np is None or not isinstance(iterable, range) or len(iterable) < self.min_iterations:
+            return False
+        plan = self.plan(node)
+        if isinstance(plan, str):
+            return False
+        try:
+            values = self.invariant_values(plan, interpreter)
+            results = self.evaluate(plan, iterable, values)
+        except NotVectorizable as e:
+            reason = str(e)
+            self.fallbacks[reason] = self.fallbacks.get(reason, 0) + 1
+            return False
+
+        # The loop variable and temporaries keep their last iteration's
+        # values; the interpreter computes those exactly
+        interpreter.symbol_table[plan.var] = iterable[-1]
+        for stmt in plan.temporaries:
+            interpreter.visit(stmt)
+        for name, value in results.items():
+            interpreter.symbol_table[name] = value
+        self.vectorized += 1
+        return True
+
+    def invariant_values(self, plan, interpreter):
+        values = {}
+        names = plan.invariants + [name for name, _, _, _ in plan.reductions]
+        for name in names:
+            # Same lookup as Interpreter's Var: locals, then globals, then 0
+            if name in interpreter.symbol_table:
+                value = interpreter.symbol_table[name]
+            else:
+                value = interpreter.globals.get(name, 0)
+            if type(value) not in (int, bool):
+                raise NotVectorizable(f"{name} is not an int")
+            values[name] = value
+        return values
+
+    def evaluate(self, plan, iterable, values):
+        # Bounds first, so nothing runs unless every step fits in int64
+        bounds = {name: (int(value), int(value)) for name, value in values.items()}
+        bounds[plan.var] = (min(iterable), max(iterable))
+        for stmt in plan.temporaries:
+            bounds[stmt.target] = interval(stmt.value, bounds)
+        count = len(iterable)
+        for name, op, term, _ in plan.reductions:
+            low, high = interval(term, bounds)
+            if op == 'PLUS' and max(abs(low), abs(high)) * count > INT64_MAX:
+                raise NotVectorizable("sum may overflow int64")
+
+        arrays = dict(values)
+        arrays[plan.var] = np.arange(iterable.start, iterable.stop, iterable.step, dtype=np.int64)
+        for stmt in plan.temporaries:
+            arrays[stmt.target] = array_value(stmt.value, arrays)
+        results = {}
+        for name, op, term, _ in plan.reductions:
+            terms = np.broadcast_to(np.asarray(array_value(term, arrays), dtype=np.int64), (count,))
+            start = values[name]
+            if op == 'PLUS':
+                results[name] = start + int(terms.sum())
+            else:
+                results[name] = start * math.prod(terms.tolist())  # Exact, however large
+        return results
+
+    def stats(self):
+        return {
+            'vectorized': self.vectorized,
+            'loops': {
+                'vectorizable': sum(1 for plan in self.plans.values() if isinstance(plan, LoopPlan)),
+                'not vectorizable': sorted({plan for plan in self.plans.values() if isinstance(plan, str)}),
+            },
+            'fallbacks': dict(self.fallbacks),
+        }
+
+
+def interval(node, bounds):
+    """Exact (low, high) of `node` over the loop; raises if a step may leave int64."""
+    if isinstance(node, Num):
+        low = high = int(node.value)
+    elif isinstance(node, Var):
+        low, high = bounds[node.name]
+    elif node.op in COMPARISONS:
+        interval(node.left, bounds)
+        interval(node.right, bounds)
+        return 0, 1
+    else:
+        a, b = interval(node.left, bounds)
+        c, d = interval(node.right, bounds)
+        if node.op == 'PLUS':
+            low, high = a + c, b + d
+        elif node.op == 'MINUS':
+            low, high = a - d, b - c
+        elif node.op == 'MUL':
+            corners = (a * c, a * d, b * c, b * d)
+            low, high = min(corners), max(corners)
+        else:
+            if c <= 0 <= d:
+                raise NotVectorizable("divisor may be 0")
+            # Floor division is monotonic in each argument once the
+            # divisor's sign is fixed, so the corners bound it
+            corners = (a // c, a // d, b // c, b // d)
+            low, high = min(corners), max(corners)
+    if low < INT64_MIN or high > INT64_MAX:
+        raise NotVectorizable("value may overflow int64")
+    return low, high
+
+
+def array_value(node, arrays):
+    # Scalars stay Python ints; anything touching the loop variable is an
+    # int64 array
+    if isinstance(node, Num):
+        return node.value
+    if isinstance(node, Var):
+        return arrays[node.name]
+    left = array_value(node.left, arrays)
+    right = array_value(node.right, arrays)
+    if node.op == 'PLUS':
+        return left + right
+    if node.op == 'MINUS':
+        return left - right
+    if node.op == 'MUL':
+        return left * right
+    if node.op == 'DIV':
+        return left // right
+    if node.op == 'GT':
+        result = left > right
+    elif node.op == 'LT':
+        result = left < right
+    else:
+        result = left == right
+    if isinstance(result, np.ndarray):
+        return result.astype(np.int64)  # numpy bools don't add like Python's
+    return result
@@ -0,0 +1,167 @@
+# compiler/vm.py
+
+from .bytecode import *
+from .trace import get_tracer
+
+
+class VM:
+    """Dispatch-loop virtual machine for compiler2 bytecode.
+
+    User function calls push a frame onto an explicit frame stack instead
+    of recursing in Python. Globals live in `symbol_table`, as in
+    Interpreter.
+    """
+
+    def __init__(self, tracer=None):
+        self.symbol_table = {}
+        self.globals = self.symbol_table
+        self.tracer = tracer if tracer is not None else get_tracer()
+
+    def visit(self, node):
+        # Same entry point as Interpreter.visit: compile the tree, then run it
+        return self.run(BytecodeCompiler().compile(node))
+
+    def run(self, code):
+        globals_ = self.globals
+        tracer = self.tracer
+        frames = []  # Saved callers: (instructions, constants, names, pc, env, stack)
+
+        instructions = code.code
+        constants = code.constants
+        names = code.names
+        env = globals_
+        stack = []
+        pc = 0
+
+        while True:
+            op = instructions[pc]
+            arg = instructions[pc + 1]
+            pc += 2
+
+            if op == LOAD_NAME:
+                name = names[arg]
+                # Locals first, then globals
+                if name in env:
+                    stack.append(env[name])
+                else:
+                    stack.append(globals_.get(name, 0))
+
+            elif op == LOAD_CONST:
+                stack.append(constants[arg])
+
+            elif op == STORE_NAME:
+                env[names[arg]] = stack.pop()
+
+            elif op == BINARY_ADD:
+                right = stack.pop()
+                stack[-1] = stack[-1] + right
+
+            elif op == BINARY_SUB:
+                right = stack.pop()
+                stack[-1] = stack[-1] - right
+
+            elif op == BINARY_MUL:
+                right = stack.pop()
+                stack[-1] = stack[-1] * right
+
+            elif op == BINARY_FLOORDIV:
+                right = stack.pop()
+                stack[-1] = stack[-1] // right
+
+            elif op == COMPARE_GT:
+                right = stack.pop()
+                stack[-1] = stack[-1] > right
+
+            elif op == COMPARE_LT:
+                right = stack.pop()
+                stack[-1] = stack[-1] < right
+
+            elif op == COMPARE_EQ:
+                right = stack.pop()
+                stack[-1] = stack[-1] == right
+
+            elif op == FOR_ITER:
+                value = next(stack[-1], _EXHAUSTED)
+                if value is _EXHAUSTED:
+                    stack.pop()
+                    pc = arg << 1
+                else:
+                    stack.append(value)
+
+            elif op == JUMP:
+                pc = arg << 1
+
+            elif op == POP_JUMP_IF_FALSE:
+                if not stack.pop():
+                    pc = arg << 1
+
+            elif op == RETURN_IF_VALUE:
+                value = stack.pop()
+                if value is not None:
+                    if not frames:
+                        return value
+                    instructions, constants, names, pc, env, stack = frames.pop()
+                    stack.append(value)
+
+            elif op == RETURN_NONE:
+                if not frames:
+                    return None
+                instructions, constants, names, pc, env, stack = frames.pop()
+                stack.append(None)
+
+            elif op == LOAD_FUNCTION:
+                name = names[arg]
+                func = env.get(name) or globals_.get(name)
+                if not func:
+                    raise Exception(f"Function {name} is not defined")
+                stack.append(func)
+
+            elif op == CALL_FUNCTION:
+                if arg:
+                    args = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    args = []
+                func = stack.pop()
+                if tracer is not None:
+                    tracer.emit('interpret', 'call', name=func.name, args=args)
+                frames.append((instructions, constants, names, pc, env, stack))
+                callee = func.code
+                instructions = callee.code
+                constants = callee.constants
+                names = callee.names
+                env = dict(zip(func.params, args))
+                stack = []
+                pc = 0
+
+            elif op == CALL_PRINT:
+                if arg:
+                    values = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    values = []
+                print(*values)
+                stack.append(None)
+
+            elif op == CALL_RANGE:
+                if not 1 <= arg <= 3:
+                    raise Exception(f"range() expects 1 to 3 arguments, got {arg}")
+                values = stack[-arg:]
+                del stack[-arg:]
+                stack.append(range(*values))
+
+            elif op == GET_ITER:
+                stack[-1] = iter(stack[-1])
+
+            elif op == MAKE_FUNCTION:
+                stack.append(Function(constants[arg]))
+
+            elif op == BINARY_NONE:
+                stack.pop()
+                stack[-1] = None
+
+            else:
+                raise Exception(f"Unknown opcode: {op}")
+
+
+_EXHAUSTED = object()
@@ -1,52 +1,86 @@
-from compiler2.lexer import Lexer, TOKEN_TYPES
+import argparse
+import json
+
+from compiler2.scanner import Scanner
+from compiler2.mapped import MappedScanner
 from compiler2.parser1 import Parser
 from compiler2.generator import CodeGen
 from compiler2.interpreter import Interpreter
+from compiler2.profiler import Profiler
+from compiler2.tiering import NativeTier
+from compiler2.vectorize import LoopVectorizer
+from compiler2.inliner import Inliner
+from compiler2.optimizer import Optimizer
+from compiler2.loops import LoopOptimizer
+from compiler2.peephole import PeepholeOptimizer
+from compiler2.ir import Lowering, format_ir
+from compiler2.dataflow import IROptimizer
+from compiler2.emitter import X86Emitter
+from compiler2.batch import find_sources, compile_batch, format_summary
 from compiler2.ast1 import *
 
 def print_ast(node, indent=0):
-    prefix = " " * indent
-    if isinstance(node, Block):
-        print(f"{prefix}Block:")
-        for stmt in node.body:
-            print_ast(stmt, indent + 2)
-    elif isinstance(node, FunctionDef):
-        print(f"{prefix}FunctionDef(name={node.name}, params={node.params}):")
-        print_ast(node.body, indent + 2)
-    elif isinstance(node, Assign):
-        print(f"{prefix}Assign(target={node.target}, value=):")
-        print_ast(node.value, indent + 2)
-    elif isinstance(node, If):
-        print(f"{prefix}If(condition=):")
-        print_ast(node.condition, indent + 2)
-        print(f"{prefix}Body:")
-        print_ast(node.body, indent + 2)
-    elif isinstance(node, For):
-        print(f"{prefix}For(var={node.var}, iterable=):")
-        print_ast(node.iterable, indent + 2)
-        print(f"{prefix}Body:")
-        print_ast(node.body, indent + 2)
-    elif isinstance(node, FunctionCall):
-        print(f"{prefix}FunctionCall(name={node.name}, args=):")
-        for arg in node.args:
-            print_ast(arg, indent + 2)
-    elif isinstance(node, Return):
-        print(f"{prefix}Return(value=):")
-        print_ast(node.value, indent + 2)
-    elif isinstance(node, BinOp):
-        print(f"{prefix}BinOp(op={node.op}):")
-        print(f"{prefix}  Left:")
-        print_ast(node.left, indent + 4)
-        print(f"{prefix}  Right:")
-        print_ast(node.right, indent + 4)
-    elif isinstance(node, Num):
-        print(f"{prefix}Num(value={node.value})")
-    elif isinstance(node, Var):
-        print(f"{prefix}Var(name={node.name})")
-    else:
-        print(f"{prefix}Unknown node type: {type(node)}")
-
-def main():
+    # Walks with an explicit stack, so deep trees don't hit the recursion
+    # limit. Entries are (node, indent), or (text, None) for a ready line;
+    # children are pushed in reverse so they print in order.
+    stack = [(node, indent)]
+    while stack:
+        node, indent = stack.pop()
+        if indent is None:
+            print(node)
+            continue
+        prefix = " " * indent
+        if isinstance(node, Block):
+            print(f"{prefix}Block:")
+            for stmt in reversed(node.body):
+                stack.append((stmt, indent + 2))
+        elif isinstance(node, FunctionDef):
+            print(f"{prefix}FunctionDef(name={node.name}, params={node.params}):")
+            stack.append((node.body, indent + 2))
+        elif isinstance(node, Assign):
+            print(f"{prefix}Assign(target={node.target}, value=):")
+            stack.append((node.value, indent + 2))
+        elif isinstance(node, If):
+            print(f"{prefix}If(condition=):")
+            stack.append((node.body, indent + 2))
+            stack.append((f"{prefix}Body:", None))
+            stack.append((node.condition, indent + 2))
+        elif isinstance(node, While):
+            print(f"{prefix}While(condition=):")
+            stack.append((node.body, indent + 2))
+            stack.append((f"{prefix}Body:", None))
+            stack.append((node.condition, indent + 2))
+        elif isinstance(node, For):
+            print(f"{prefix}For(var={node.var}, iterable=):")
+            stack.append((node.body, indent + 2))
+            stack.append((f"{prefix}Body:", None))
+            stack.append((node.iterable, indent + 2))
+        elif isinstance(node, FunctionCall):
+            print(f"{prefix}FunctionCall(name={node.name}, args=):")
+            for arg in reversed(node.args):
+                stack.append((arg, indent + 2))
+        elif isinstance(node, Return):
+            print(f"{prefix}Return(value=):")
+            stack.append((node.value, indent + 2))
+        elif isinstance(node, BinOp):
+            print(f"{prefix}BinOp(op={node.op}):")
+            stack.append((node.right, indent + 4))
+            stack.append((f"{prefix}  Right:", None))
+            stack.append((node.left, indent + 4))
+            stack.append((f"{prefix}  Left:", None))
+        elif isinstance(node, Num):
+            print(f"{prefix}Num(value={node.value})")
+        elif isinstance(node, Var):
+            print(f"{prefix}Var(name={node.name})")
+        else:
+            print(f"{prefix}Unknown node type: {type(node)}")
+
+def echo_tokens(tokens):
+    for token in tokens:
+        print(f"Token: {token}")
+        yield token
+
+def main(optimize=True, use_ir=False, profile=False):
     code = """
 def add(a, b):
     return a + b
@@ -62,22 +96,35 @@ for i in range(0, 5):
         print(i + 100)
 """
     
-    lexer = Lexer(code)
-    tokens = []
-    while True:
-        token = lexer.get_next_token()
-        print(f"Token: {token}")
-        tokens.append(token)
-        if token.type == TOKEN_TYPES['EOF']:  # Stop when EOF token is reached
-            break
-    parser = Parser(tokens)
+    lexer = Scanner(code)
+    parser = Parser(echo_tokens(lexer))  # Tokens are lexed as the parser asks for them
     interpreter = Interpreter(parser)
-    codegen = CodeGen()
     
     try:
         ast = parser.parse()  # Start parsing the code
+        parsed = ast
 
         print_ast(ast)
+
+        if optimize:
+            inliner = Inliner()
+            ast = inliner.inline(ast)  # Calls to small functions become their bodies, then get folded
+            print("\n--- Inliner Report ---")
+            for line in inliner.report():
+                print(line)
+
+            optimizer = Optimizer()
+            ast = optimizer.optimize(ast)  # Both the interpreter and CodeGen get the optimized tree
+            print("\n--- Optimizer Statistics ---")
+            for name, count in optimizer.stats.items():
+                print(f"{name}: {count}")
+
+            loops = LoopOptimizer()
+            ast = loops.optimize(ast)
+            print("\n--- Loop Optimizer Statistics ---")
+            for name, count in loops.stats.items():
+                print(f"{name}: {count}")
+
         print("\n--- Python Code Execution Output ---")
         try:
             exec(code)  # Execute the code string directly
@@ -85,14 +132,41 @@ for i in range(0, 5):
             print(f"Error during execution: {e}")
         
         print("Program output:", interpreter.symbol_table)
+
+        if profile:
+            # Parser.lines only knows the nodes of the tree before optimization
+            profiler = Profiler(parser.lines)
+            profiler.run(Interpreter(parser, profiler=profiler), parsed)
+            print("\n--- Profile ---")
+            print(json.dumps(profiler.report(), indent=2))
+            print("\n--- Collapsed Stacks ---")
+            print(profiler.collapsed(), end="")
         
         # Generate the x86 code for the functions and expressions
-        if isinstance(ast, Block):  # Ensure the AST is a Block
-           # print(f"Block body: {ast.body}")  # Debugging output
-            codegen.generate(ast)  # Pass the entire Block to the CodeGen
+        if use_ir:
+            program = Lowering().lower(ast)
+            if optimize:
+                ir_optimizer = IROptimizer()
+                ir_optimizer.optimize(program)
+                print("\n--- IR Optimizer Statistics ---")
+                for name, count in ir_optimizer.stats.items():
+                    print(f"{name}: {count}")
+            print("\n--- IR ---")
+            print(format_ir(program))
+            asm_code = X86Emitter().generate(program)
+        else:
+            codegen = CodeGen()
+            codegen.generate(ast)  # Straight from the AST, no IR
+            asm_code = codegen.asm_code
+        if optimize:
+            peephole = PeepholeOptimizer()
+            asm_code = peephole.optimize(asm_code)
+            print("\n--- Peephole Statistics ---")
+            for name, removed in peephole.stats.items():
+                print(f"{name}: {removed}")
         
         print("\n--- Generated x86 Assembly ---")
-        print("\n".join(codegen.asm_code))
+        print("\n".join(asm_code))
         
         print("\n--- AST Structure ---")
         print_ast(ast)  # Print the AST structure
@@ -100,5 +174,40 @@ for i in range(0, 5):
     except Exception as e:
         print(f"Error: {e}")
 
+def run_file(path, native=True):
+    # The source is lexed from a memory-mapped file, so it can be far
+    # larger than the demo's inline string. Hot functions are compiled to
+    # CPython code and simple counted loops run on NumPy (when installed)
+    # unless native is off.
+    with MappedScanner(path) as scanner:
+        ast = Parser(scanner).parse()
+    vectorizer = LoopVectorizer() if native else None
+    interpreter = Interpreter(None, tier=NativeTier(enabled=native), vectorizer=vectorizer)
+    interpreter.visit(ast)
+    print("Program output:", interpreter.symbol_table)
+
+def batch(args):
+    paths = find_sources(args.paths)
+    report = compile_batch(paths, output_dir=args.output, workers=args.jobs,
+                           optimize=not args.no_optimize, use_ir=args.ir, cache_dir=args.cache)
+    print(format_summary(report))
+    return 1 if report['errors'] else 0
+
 if __name__ == "__main__":
-    main()
+    arg_parser = argparse.ArgumentParser(description="Compile to x86. Without paths, runs the built-in demo.")
+    arg_parser.add_argument("paths", nargs="*", help="source files or directories to compile to .asm")
+    arg_parser.add_argument("-o", "--output", help="directory for .asm files (default: next to each source)")
+    arg_parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per CPU)")
+    arg_parser.add_argument("--no-optimize", action="store_true")
+    arg_parser.add_argument("--cache", metavar="DIR",
+                            help="reuse the assembly of unchanged files from DIR (entries are unpickled: trusted DIR only)")
+    arg_parser.add_argument("--ir", action="store_true", help="generate through the IR instead of with CodeGen (slower to compile)")
+    arg_parser.add_argument("--profile", action="store_true", help="run the demo under the profiler")
+    arg_parser.add_argument("--run", metavar="FILE", help="interpret FILE instead of compiling")
+    arg_parser.add_argument("--no-native", action="store_true", help="with --run, never compile hot functions or vectorize loops")
+    args = arg_parser.parse_args()
+    if args.run:
+        raise SystemExit(run_file(args.run, native=not args.no_native))
+    if args.paths:
+        raise SystemExit(batch(args))
+    main(optimize=not args.no_optimize, use_ir=args.ir, profile=args.profile)